@@ -1,57 +1,103 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import uuid
 
-from database import get_db
+from database import get_async_db
 from models import models, schemas
 from core import security
-from services import analysis_service, paper_service
+from core.responses import ORJSONResponse
+from services import analysis_service, paper_service, quota_service
+from utils import field_utils, pagination_utils
 
 router = APIRouter()
 
-@router.get("", response_model=schemas.DataResponse)
+@router.get("", response_model=schemas.DataResponse[List[schemas.Analysis]])
 async def list_analyses(
-    page: int = 1,
-    limit: int = 20,
+    request: Request,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    total: Optional[schemas.TotalMode] = None,
     status: Optional[str] = None,
     paper_id: Optional[uuid.UUID] = None,
+    min_score: Optional[float] = None,
+    fields: Optional[field_utils.FieldSet] = Depends(field_utils.fields_param(schemas.Analysis)),
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(security.get_async_read_db)
 ):
-    """获取分析列表"""
-    analyses, total = analysis_service.get_analyses(
+    """
+    获取分析列表
+    
+    传入cursor时使用游标分页，否则按页码分页。两种模式都在links中返回前后页的游标链接。
+    total控制总数的获取方式：cached（页码分页默认，读缓存）、exact（精确统计）、
+    estimate（按查询计划估算）、none（游标分页默认，不返回总数）。
+    """
+    if cursor:
+        try:
+            result = await analysis_service.get_analyses_page_async(
+                db, 
+                user_id=current_user.id, 
+                limit=limit, 
+                cursor=cursor, 
+                status=status, 
+                paper_id=paper_id, 
+                min_score=min_score, 
+                total_mode=total or schemas.TotalMode.none
+            )
+        except ValueError as e:
+            # status参数覆盖了fastapi.status模块
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        pagination = {
+            "total": result.total,
+            "total_estimated": result.total_estimated if result.total is not None else None,
+            "count": len(result.items),
+            "per_page": limit,
+            "links": pagination_utils.pagination_links(request.url, result)
+        }
+        
+        response = schemas.DataResponse[List[schemas.Analysis]](data=result.items, meta={"pagination": pagination})
+        
+        return ORJSONResponse(field_utils.select_fields(response, fields))
+    
+    result = await analysis_service.get_analyses_async(
         db, 
         user_id=current_user.id, 
         page=page, 
         limit=limit, 
         status=status, 
-        paper_id=paper_id
+        paper_id=paper_id, 
+        min_score=min_score, 
+        total_mode=total or schemas.TotalMode.cached
     )
     
     # 构建分页元数据
     pagination = {
-        "total": total,
-        "count": len(analyses),
+        "total": result.total,
+        "total_estimated": result.total_estimated if result.total is not None else None,
+        "count": len(result.items),
         "per_page": limit,
         "current_page": page,
-        "total_pages": (total + limit - 1) // limit
+        "total_pages": (result.total + limit - 1) // limit if result.total is not None else None,
+        "links": pagination_utils.pagination_links(
+            request.url, pagination_utils.offset_page_cursors(result, page, "created_at")
+        )
     }
     
-    return {
-        "success": True,
-        "data": analyses,
-        "meta": {"pagination": pagination}
-    }
+    response = schemas.DataResponse[List[schemas.Analysis]](data=result.items, meta={"pagination": pagination})
+    
+    return ORJSONResponse(field_utils.select_fields(response, fields))
 
-@router.get("/{analysis_id}", response_model=schemas.DataResponse)
+@router.get("/{analysis_id}", response_model=schemas.DataResponse[schemas.Analysis])
 async def get_analysis(
     analysis_id: uuid.UUID,
+    fields: Optional[field_utils.FieldSet] = Depends(field_utils.fields_param(schemas.Analysis)),
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取分析状态"""
-    analysis = analysis_service.get_analysis(db, analysis_id, current_user.id)
+    analysis = await analysis_service.get_analysis_async(db, analysis_id, current_user.id)
     
     if not analysis:
         raise HTTPException(
@@ -59,19 +105,21 @@ async def get_analysis(
             detail="分析不存在或无权访问"
         )
     
-    return {
-        "success": True,
-        "data": analysis
-    }
+    response = schemas.DataResponse[schemas.Analysis](data=analysis)
+    
+    return ORJSONResponse(field_utils.select_fields(response, fields))
 
-@router.get("/{analysis_id}/results", response_model=schemas.DataResponse)
+@router.get("/{analysis_id}/results", response_model=schemas.DataResponse[schemas.AnalysisDetail])
 async def get_analysis_results(
     analysis_id: uuid.UUID,
+    fields: Optional[field_utils.FieldSet] = Depends(field_utils.fields_param(schemas.AnalysisDetail)),
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取分析结果"""
-    analysis = analysis_service.get_analysis_with_results(db, analysis_id, current_user.id)
+    # 不返回raw_analysis时不从存储补回已归档的原文
+    rehydrate = field_utils.includes(fields, "result_data", "raw_analysis")
+    analysis = await analysis_service.get_analysis_with_results_async(db, analysis_id, current_user.id, rehydrate=rehydrate)
     
     if not analysis:
         raise HTTPException(
@@ -85,20 +133,19 @@ async def get_analysis_results(
             detail=f"分析尚未完成，当前状态: {analysis.status}"
         )
     
-    return {
-        "success": True,
-        "data": analysis
-    }
+    response = schemas.DataResponse[schemas.AnalysisDetail](data=analysis)
+    
+    return ORJSONResponse(field_utils.select_fields(response, fields))
 
-@router.post("/{analysis_id}/feedback", response_model=schemas.DataResponse)
+@router.post("/{analysis_id}/feedback", response_model=schemas.DataResponse[schemas.Message])
 async def provide_analysis_feedback(
     analysis_id: uuid.UUID,
     feedback: dict,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """提供分析反馈"""
-    analysis = analysis_service.add_feedback(db, analysis_id, current_user.id, feedback)
+    analysis = await analysis_service.add_feedback_async(db, analysis_id, current_user.id, feedback)
     
     if not analysis:
         raise HTTPException(
@@ -106,21 +153,18 @@ async def provide_analysis_feedback(
             detail="分析不存在或无权访问"
         )
     
-    return {
-        "success": True,
-        "data": {"message": "反馈已成功提交"}
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.Message](data={"message": "反馈已成功提交"}))
 
-@router.post("/{analysis_id}/reports", response_model=schemas.DataResponse)
+@router.post("/{analysis_id}/reports", response_model=schemas.DataResponse[schemas.Report])
 async def generate_report(
     analysis_id: uuid.UUID,
     report_create: schemas.ReportCreate,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """生成报告"""
     # 检查分析是否存在且属于当前用户
-    analysis = analysis_service.get_analysis(db, analysis_id, current_user.id)
+    analysis = await analysis_service.get_analysis_async(db, analysis_id, current_user.id)
     if not analysis:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -134,11 +178,9 @@ async def generate_report(
             detail=f"分析尚未完成，当前状态: {analysis.status}"
         )
     
-    # 创建报告
+    # 创建报告，超出本月配额时拒绝
     from services import report_service
-    report = report_service.create_report(db, analysis_id, report_create)
+    async with quota_service.reserve_async(db, current_user.id, quota_service.REPORTS):
+        report = await report_service.create_report_async(db, analysis_id, report_create)
     
-    return {
-        "success": True,
-        "data": report
-    }
\ No newline at end of file
+    return ORJSONResponse(schemas.DataResponse[schemas.Report](data=report))
\ No newline at end of file
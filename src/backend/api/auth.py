@@ -1,24 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
-from database import get_db
+from database import get_async_db
 from models import models, schemas
 from core import security, config
+from core.responses import ORJSONResponse
 from services import user_service
 
 router = APIRouter()
 
-@router.post("/token", response_model=schemas.DataResponse)
+@router.post("/token", response_model=schemas.DataResponse[schemas.Token])
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取访问令牌
     """
-    user = user_service.authenticate_user(db, form_data.username, form_data.password)
+    user = await user_service.authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -27,7 +28,7 @@ async def login_for_access_token(
         )
     
     # 更新最后登录时间
-    user_service.update_last_login(db, user.id)
+    await user_service.update_last_login_async(user.id)
     
     # 创建访问令牌
     access_token_expires = timedelta(minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -35,19 +36,16 @@ async def login_for_access_token(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
     )
     
-    return {
-        "success": True,
-        "data": {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "expires_in": config.ACCESS_TOKEN_EXPIRE_MINUTES * 60
-        }
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.Token](data={
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": config.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }))
 
-@router.post("/refresh", response_model=schemas.DataResponse)
+@router.post("/refresh", response_model=schemas.DataResponse[schemas.Token])
 async def refresh_token(
     current_user: models.User = Depends(security.get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     刷新访问令牌
@@ -58,25 +56,22 @@ async def refresh_token(
         data={"sub": str(current_user.id)}, expires_delta=access_token_expires
     )
     
-    return {
-        "success": True,
-        "data": {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "expires_in": config.ACCESS_TOKEN_EXPIRE_MINUTES * 60
-        }
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.Token](data={
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": config.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }))
 
-@router.post("/register", response_model=schemas.DataResponse)
+@router.post("/register", response_model=schemas.DataResponse[schemas.TokenWithUser])
 async def register_user(
     user_create: schemas.UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     注册新用户
     """
     # 检查邮箱是否已存在
-    db_user = user_service.get_user_by_email(db, email=user_create.email)
+    db_user = await user_service.get_user_by_email_async(db, email=user_create.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -84,7 +79,7 @@ async def register_user(
         )
     
     # 创建新用户
-    user = user_service.create_user(db, user_create)
+    user = await user_service.create_user_async(db, user_create)
     
     # 创建访问令牌
     access_token_expires = timedelta(minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -92,12 +87,9 @@ async def register_user(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
     )
     
-    return {
-        "success": True,
-        "data": {
-            "user": user,
-            "access_token": access_token,
-            "token_type": "bearer",
-            "expires_in": config.ACCESS_TOKEN_EXPIRE_MINUTES * 60
-        }
-    }
\ No newline at end of file
+    return ORJSONResponse(schemas.DataResponse[schemas.TokenWithUser](data={
+        "user": user,
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": config.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    }))
\ No newline at end of file
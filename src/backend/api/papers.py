@@ -1,92 +1,214 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, UploadFile, File, Form
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 import uuid
 
-from database import get_db
+from database import get_async_db
 from models import models, schemas
 from core import security
-from services import paper_service
+from core.responses import ORJSONResponse
+from services import paper_service, similarity_service, quota_service
+from utils import field_utils, pagination_utils
 
 router = APIRouter()
 
-@router.post("", response_model=schemas.DataResponse)
+@router.post("", response_model=schemas.DataResponse[schemas.Paper])
 async def upload_paper(
     file: UploadFile = File(...),
     title: Optional[str] = Form(None),
     authors: Optional[str] = Form(None),
     tags: Optional[str] = Form(None),
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """上传论文"""
     # 处理可选参数
     authors_list = authors.split(",") if authors else None
     tags_list = tags.split(",") if tags else None
     
-    # 上传论文
-    paper = await paper_service.upload_paper(
-        db, 
-        current_user.id, 
-        file, 
-        title=title, 
-        authors=authors_list, 
-        tags=tags_list
-    )
+    # 上传论文，超出本月配额时拒绝（上传失败时撤回占用的配额）
+    async with quota_service.reserve_async(db, current_user.id, quota_service.PAPERS):
+        paper = await paper_service.upload_paper_async(
+            db, 
+            current_user.id, 
+            file, 
+            title=title, 
+            authors=authors_list, 
+            tags=tags_list
+        )
     
-    return {
-        "success": True,
-        "data": paper
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.Paper](data=paper))
 
-@router.get("", response_model=schemas.DataResponse)
+@router.get("", response_model=schemas.DataResponse[List[schemas.Paper]])
 async def list_papers(
-    page: int = 1,
-    limit: int = 20,
+    request: Request,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    total: Optional[schemas.TotalMode] = None,
     status: Optional[str] = None,
     tags: Optional[str] = None,
+    author: Optional[str] = None,
     search: Optional[str] = None,
+    fields: Optional[field_utils.FieldSet] = Depends(field_utils.fields_param(schemas.Paper)),
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(security.get_async_read_db)
 ):
-    """获取论文列表"""
+    """
+    获取论文列表
+    
+    传入cursor时使用游标分页，否则按页码分页。两种模式都在links中返回前后页的游标链接。
+    total控制总数的获取方式：cached（页码分页默认，读缓存）、exact（精确统计）、
+    estimate（按查询计划估算）、none（游标分页默认，不返回总数）。
+    """
     # 处理标签过滤
     tags_list = tags.split(",") if tags else None
     
-    # 获取论文列表
-    papers, total = paper_service.get_papers(
+    if cursor:
+        try:
+            result = await paper_service.get_papers_page_async(
+                db, 
+                user_id=current_user.id, 
+                limit=limit, 
+                cursor=cursor, 
+                status=status, 
+                tags=tags_list, 
+                author=author, 
+                search=search, 
+                total_mode=total or schemas.TotalMode.none
+            )
+        except ValueError as e:
+            # status参数覆盖了fastapi.status模块
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        pagination = {
+            "total": result.total,
+            "total_estimated": result.total_estimated if result.total is not None else None,
+            "count": len(result.items),
+            "per_page": limit,
+            "links": pagination_utils.pagination_links(request.url, result)
+        }
+        
+        response = schemas.DataResponse[List[schemas.Paper]](data=result.items, meta={"pagination": pagination})
+        
+        return ORJSONResponse(field_utils.select_fields(response, fields))
+    
+    result = await paper_service.get_papers_async(
         db, 
         user_id=current_user.id, 
         page=page, 
         limit=limit, 
         status=status, 
         tags=tags_list, 
-        search=search
+        author=author, 
+        search=search, 
+        total_mode=total or schemas.TotalMode.cached
     )
     
     # 构建分页元数据
     pagination = {
-        "total": total,
-        "count": len(papers),
+        "total": result.total,
+        "total_estimated": result.total_estimated if result.total is not None else None,
+        "count": len(result.items),
         "per_page": limit,
         "current_page": page,
-        "total_pages": (total + limit - 1) // limit
+        "total_pages": (result.total + limit - 1) // limit if result.total is not None else None,
+        "links": pagination_utils.pagination_links(
+            request.url, pagination_utils.offset_page_cursors(result, page, "upload_date")
+        )
     }
     
-    return {
-        "success": True,
-        "data": papers,
-        "meta": {"pagination": pagination}
+    response = schemas.DataResponse[List[schemas.Paper]](data=result.items, meta={"pagination": pagination})
+    
+    return ORJSONResponse(field_utils.select_fields(response, fields))
+
+@router.get("/search", response_model=schemas.DataResponse[List[schemas.PaperSearchResult]])
+async def search_papers(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=50),
+    total: Optional[schemas.TotalMode] = None,
+    fields: Optional[field_utils.FieldSet] = Depends(field_utils.fields_param(schemas.PaperSearchResult)),
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(security.get_async_read_db)
+):
+    """
+    全文检索论文
+    
+    检索标题、作者、标签、摘要和正文，按相关度排序，只支持页码分页。
+    q支持websearch语法：引号短语、OR、-排除词。
+    """
+    result = await paper_service.search_papers_async(
+        db, 
+        user_id=current_user.id, 
+        query=q, 
+        page=page, 
+        limit=limit, 
+        total_mode=total or schemas.TotalMode.cached
+    )
+    
+    pagination = {
+        "total": result.total,
+        "total_estimated": result.total_estimated if result.total is not None else None,
+        "count": len(result.items),
+        "per_page": limit,
+        "current_page": page,
+        "total_pages": (result.total + limit - 1) // limit if result.total is not None else None,
+        "links": pagination_utils.page_number_links(request.url, result, page)
     }
+    
+    response = schemas.DataResponse[List[schemas.PaperSearchResult]](data=result.items, meta={"pagination": pagination})
+    
+    return ORJSONResponse(field_utils.select_fields(response, fields))
+
+@router.get("/semantic-search", response_model=schemas.DataResponse[List[schemas.PaperSimilarity]])
+async def semantic_search_papers(
+    q: str = Query(..., min_length=1, max_length=500),
+    limit: int = Query(10, ge=1, le=50),
+    fields: Optional[field_utils.FieldSet] = Depends(field_utils.fields_param(schemas.PaperSimilarity)),
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(security.get_async_read_db)
+):
+    """按语义检索自己的论文和公开论文，按相似度排序"""
+    papers = await similarity_service.semantic_search_async(db, current_user.id, q, limit)
+    
+    response = schemas.DataResponse[List[schemas.PaperSimilarity]](data=papers)
+    
+    return ORJSONResponse(field_utils.select_fields(response, fields))
 
-@router.get("/{paper_id}", response_model=schemas.DataResponse)
+@router.get("/{paper_id}/similar", response_model=schemas.DataResponse[List[schemas.PaperSimilarity]])
+async def get_similar_papers(
+    paper_id: uuid.UUID,
+    limit: int = Query(10, ge=1, le=50),
+    fields: Optional[field_utils.FieldSet] = Depends(field_utils.fields_param(schemas.PaperSimilarity)),
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(security.get_async_read_db)
+):
+    """获取相似论文，范围为自己的论文和公开论文；论文的向量尚未生成时返回空列表"""
+    papers = await similarity_service.get_similar_papers_async(db, paper_id, current_user.id, limit)
+    
+    if papers is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="论文不存在"
+        )
+    
+    response = schemas.DataResponse[List[schemas.PaperSimilarity]](data=papers)
+    
+    return ORJSONResponse(field_utils.select_fields(response, fields))
+
+@router.get("/{paper_id}", response_model=schemas.DataResponse[schemas.PaperDetail])
 async def get_paper(
     paper_id: uuid.UUID,
+    fields: Optional[field_utils.FieldSet] = Depends(field_utils.fields_param(schemas.PaperDetail)),
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取论文详情"""
-    paper = paper_service.get_paper(db, paper_id, current_user.id)
+    # 不返回extracted_text时不从存储补回已归档的正文
+    rehydrate = field_utils.includes(fields, "extracted_text")
+    paper = await paper_service.get_paper_async(db, paper_id, current_user.id, rehydrate=rehydrate)
     
     if not paper:
         raise HTTPException(
@@ -94,20 +216,19 @@ async def get_paper(
             detail="论文不存在或无权访问"
         )
     
-    return {
-        "success": True,
-        "data": paper
-    }
+    response = schemas.DataResponse[schemas.PaperDetail](data=paper)
+    
+    return ORJSONResponse(field_utils.select_fields(response, fields))
 
-@router.patch("/{paper_id}", response_model=schemas.DataResponse)
+@router.patch("/{paper_id}", response_model=schemas.DataResponse[schemas.PaperDetail])
 async def update_paper(
     paper_id: uuid.UUID,
     paper_update: schemas.PaperUpdate,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新论文信息"""
-    paper = paper_service.update_paper(db, paper_id, current_user.id, paper_update)
+    paper = await paper_service.update_paper_async(db, paper_id, current_user.id, paper_update)
     
     if not paper:
         raise HTTPException(
@@ -115,19 +236,16 @@ async def update_paper(
             detail="论文不存在或无权访问"
         )
     
-    return {
-        "success": True,
-        "data": paper
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.PaperDetail](data=paper))
 
-@router.delete("/{paper_id}", response_model=schemas.DataResponse)
+@router.delete("/{paper_id}", response_model=schemas.DataResponse[schemas.Message])
 async def delete_paper(
     paper_id: uuid.UUID,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """删除论文"""
-    result = paper_service.delete_paper(db, paper_id, current_user.id)
+    result = await paper_service.delete_paper_async(db, paper_id, current_user.id)
     
     if not result:
         raise HTTPException(
@@ -135,32 +253,28 @@ async def delete_paper(
             detail="论文不存在或无权访问"
         )
     
-    return {
-        "success": True,
-        "data": {"message": "论文已成功删除"}
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.Message](data={"message": "论文已成功删除"}))
 
-@router.post("/{paper_id}/analysis", response_model=schemas.DataResponse)
+@router.post("/{paper_id}/analysis", response_model=schemas.DataResponse[schemas.Analysis])
 async def start_analysis(
     paper_id: uuid.UUID,
     analysis_create: schemas.AnalysisCreate,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """开始论文分析"""
     # 检查论文是否存在且属于当前用户
-    paper = paper_service.get_paper(db, paper_id, current_user.id)
-    if not paper:
+    if not await paper_service.paper_exists_async(db, paper_id, current_user.id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="论文不存在或无权访问"
         )
     
-    # 创建分析任务
+    # 创建分析任务，超出本月分析次数或模型token配额时拒绝
     from services import analysis_service
-    analysis = analysis_service.create_analysis(db, paper_id, analysis_create)
+    async with quota_service.reserve_async(
+        db, current_user.id, quota_service.ANALYSES, require=(quota_service.TOKENS,)
+    ):
+        analysis = await analysis_service.create_analysis_async(db, paper_id, analysis_create)
     
-    return {
-        "success": True,
-        "data": analysis
-    }
\ No newline at end of file
+    return ORJSONResponse(schemas.DataResponse[schemas.Analysis](data=analysis))
\ No newline at end of file
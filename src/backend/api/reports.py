@@ -1,57 +1,136 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from datetime import datetime
 import uuid
 
-from database import get_db
+from database import get_async_db
 from models import models, schemas
 from core import security
-from services import report_service
+from core.responses import ORJSONResponse
+from services import report_service, export_service
+from utils import download_utils, field_utils, pagination_utils
 
 router = APIRouter()
 
-@router.get("", response_model=schemas.DataResponse)
+@router.get("", response_model=schemas.DataResponse[List[schemas.Report]])
 async def list_reports(
-    page: int = 1,
-    limit: int = 20,
+    request: Request,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    total: Optional[schemas.TotalMode] = None,
     analysis_id: Optional[uuid.UUID] = None,
     paper_id: Optional[uuid.UUID] = None,
+    fields: Optional[field_utils.FieldSet] = Depends(field_utils.fields_param(schemas.Report)),
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(security.get_async_read_db)
 ):
-    """获取报告列表"""
-    reports, total = report_service.get_reports(
+    """
+    获取报告列表
+    
+    传入cursor时使用游标分页，否则按页码分页。两种模式都在links中返回前后页的游标链接。
+    total控制总数的获取方式：cached（页码分页默认，读缓存）、exact（精确统计）、
+    estimate（按查询计划估算）、none（游标分页默认，不返回总数）。
+    """
+    if cursor:
+        try:
+            result = await report_service.get_reports_page_async(
+                db, 
+                user_id=current_user.id, 
+                limit=limit, 
+                cursor=cursor, 
+                analysis_id=analysis_id, 
+                paper_id=paper_id, 
+                total_mode=total or schemas.TotalMode.none
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        
+        pagination = {
+            "total": result.total,
+            "total_estimated": result.total_estimated if result.total is not None else None,
+            "count": len(result.items),
+            "per_page": limit,
+            "links": pagination_utils.pagination_links(request.url, result)
+        }
+        
+        response = schemas.DataResponse[List[schemas.Report]](data=result.items, meta={"pagination": pagination})
+        
+        return ORJSONResponse(field_utils.select_fields(response, fields))
+    
+    result = await report_service.get_reports_async(
         db, 
         user_id=current_user.id, 
         page=page, 
         limit=limit, 
-        analysis_id=analysis_id,
-        paper_id=paper_id
+        analysis_id=analysis_id, 
+        paper_id=paper_id, 
+        total_mode=total or schemas.TotalMode.cached
     )
     
     # 构建分页元数据
     pagination = {
-        "total": total,
-        "count": len(reports),
+        "total": result.total,
+        "total_estimated": result.total_estimated if result.total is not None else None,
+        "count": len(result.items),
         "per_page": limit,
         "current_page": page,
-        "total_pages": (total + limit - 1) // limit
+        "total_pages": (result.total + limit - 1) // limit if result.total is not None else None,
+        "links": pagination_utils.pagination_links(
+            request.url, pagination_utils.offset_page_cursors(result, page, "created_at")
+        )
     }
     
-    return {
-        "success": True,
-        "data": reports,
-        "meta": {"pagination": pagination}
-    }
+    response = schemas.DataResponse[List[schemas.Report]](data=result.items, meta={"pagination": pagination})
+    
+    return ORJSONResponse(field_utils.select_fields(response, fields))
+
+@router.get("/export")
+async def export_reports(
+    paper_ids: Optional[str] = None,
+    tags: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    current_user: models.User = Depends(security.get_current_active_user)
+):
+    """批量导出报告文件及分析结果（ZIP）"""
+    try:
+        paper_id_list = [uuid.UUID(paper_id) for paper_id in paper_ids.split(",")] if paper_ids else None
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的论文ID"
+        )
+    
+    export_filter = schemas.ReportExportFilter(
+        paper_ids=paper_id_list,
+        tags=tags.split(",") if tags else None,
+        created_from=created_from,
+        created_to=created_to
+    )
+    
+    filename = f"paperal-export-{datetime.utcnow():%Y%m%d%H%M%S}.zip"
+    
+    return StreamingResponse(
+        export_service.stream_export(current_user.id, export_filter),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
-@router.get("/{report_id}", response_model=schemas.DataResponse)
+@router.get("/{report_id}", response_model=schemas.DataResponse[schemas.ReportDetail])
 async def get_report(
     report_id: uuid.UUID,
+    fields: Optional[field_utils.FieldSet] = Depends(field_utils.fields_param(schemas.ReportDetail)),
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取报告详情"""
-    report = report_service.get_report(db, report_id, current_user.id)
+    report = await report_service.get_report_async(db, report_id, current_user.id)
     
     if not report:
         raise HTTPException(
@@ -59,20 +138,38 @@ async def get_report(
             detail="报告不存在或无权访问"
         )
     
-    return {
-        "success": True,
-        "data": report
-    }
+    response = schemas.DataResponse[schemas.ReportDetail](data=report)
+    
+    return ORJSONResponse(field_utils.select_fields(response, fields))
 
-@router.patch("/{report_id}", response_model=schemas.DataResponse)
+@router.get("/{report_id}/download")
+@router.head("/{report_id}/download")
+async def download_report(
+    report_id: uuid.UUID,
+    request: Request,
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """下载报告文件"""
+    report = await report_service.get_report_async(db, report_id, current_user.id)
+    
+    if not report:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="报告不存在或无权访问"
+        )
+    
+    return download_utils.report_file_response(request, report)
+
+@router.patch("/{report_id}", response_model=schemas.DataResponse[schemas.ReportDetail])
 async def update_report(
     report_id: uuid.UUID,
     report_update: schemas.ReportUpdate,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """更新报告信息"""
-    report = report_service.update_report(db, report_id, current_user.id, report_update)
+    report = await report_service.update_report_async(db, report_id, current_user.id, report_update)
     
     if not report:
         raise HTTPException(
@@ -80,45 +177,89 @@ async def update_report(
             detail="报告不存在或无权访问"
         )
     
-    return {
-        "success": True,
-        "data": report
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.ReportDetail](data=report))
 
-@router.post("/{report_id}/share", response_model=schemas.DataResponse)
+@router.post("/{report_id}/share", response_model=schemas.DataResponse[schemas.ShareLink])
 async def share_report(
     report_id: uuid.UUID,
     share_create: schemas.ShareCreate,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """分享报告"""
     # 检查报告是否存在且属于当前用户
-    report = report_service.get_report(db, report_id, current_user.id)
+    report = await report_service.get_report_async(db, report_id, current_user.id)
     if not report:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="报告不存在或无权访问"
         )
     
+    # 分享码无需认证即可访问，无法限制为指定收件人，只支持链接分享
+    if share_create.access_type != schemas.ShareType.link:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="暂不支持按邮箱分享，请使用链接分享"
+        )
+    
     # 创建分享链接
-    share = report_service.share_report(db, report_id, share_create)
+    share = await report_service.share_report_async(db, report_id, current_user.id, share_create)
     
-    return {
-        "success": True,
-        "data": share
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.ShareLink](data=share))
 
-@router.post("/{report_id}/comments", response_model=schemas.DataResponse)
+@router.get("/{report_id}/shares", response_model=schemas.DataResponse[List[schemas.ShareLink]])
+async def list_shares(
+    report_id: uuid.UUID,
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取报告的分享链接"""
+    report = await report_service.get_report_async(db, report_id, current_user.id)
+    if not report:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="报告不存在或无权访问"
+        )
+    
+    shares = await report_service.get_share_links_async(db, report_id)
+    
+    return ORJSONResponse(schemas.DataResponse[List[schemas.ShareLink]](data=shares))
+
+@router.delete("/{report_id}/shares/{share_id}", response_model=schemas.DataResponse[schemas.Message])
+async def revoke_share(
+    report_id: uuid.UUID,
+    share_id: uuid.UUID,
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """撤销分享链接"""
+    report = await report_service.get_report_async(db, report_id, current_user.id)
+    if not report:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="报告不存在或无权访问"
+        )
+    
+    result = await report_service.revoke_share_link_async(db, report_id, share_id)
+    
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="分享链接不存在"
+        )
+    
+    return ORJSONResponse(schemas.DataResponse[schemas.Message](data={"message": "分享链接已撤销"}))
+
+@router.post("/{report_id}/comments", response_model=schemas.DataResponse[schemas.Comment])
 async def add_comment(
     report_id: uuid.UUID,
     comment_create: schemas.CommentBase,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """添加评论"""
     # 检查报告是否存在且当前用户有权访问
-    report = report_service.get_report(db, report_id, current_user.id)
+    report = await report_service.get_report_async(db, report_id, current_user.id)
     if not report:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -126,27 +267,34 @@ async def add_comment(
         )
     
     # 创建评论
-    comment = report_service.add_comment(
+    comment = await report_service.add_comment_async(
         db, 
         report_id=report_id, 
         user_id=current_user.id, 
-        content=comment_create.content
+        content=comment_create.content,
+        parent_id=comment_create.parent_id
     )
     
-    return {
-        "success": True,
-        "data": comment
-    }
+    if not comment:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="回复的评论不存在"
+        )
+    
+    return ORJSONResponse(schemas.DataResponse[schemas.Comment](data=comment))
 
-@router.get("/{report_id}/comments", response_model=schemas.DataResponse)
+@router.get("/{report_id}/comments", response_model=schemas.DataResponse[List[schemas.CommentThread]])
 async def get_comments(
     report_id: uuid.UUID,
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(security.get_async_read_db)
 ):
     """获取报告评论"""
     # 检查报告是否存在且当前用户有权访问
-    report = report_service.get_report(db, report_id, current_user.id)
+    report = await report_service.get_report_async(db, report_id, current_user.id)
     if not report:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -154,9 +302,22 @@ async def get_comments(
         )
     
     # 获取评论
-    comments = report_service.get_comments(db, report_id)
+    try:
+        comments, next_cursor = await report_service.get_comments_async(db, report_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    # 构建分页元数据
+    pagination = {
+        "count": len(comments),
+        "per_page": limit,
+        "links": {
+            "next": pagination_utils.cursor_link(request.url, next_cursor),
+            "prev": None
+        }
+    }
     
-    return {
-        "success": True,
-        "data": comments
-    }
\ No newline at end of file
+    return ORJSONResponse(schemas.DataResponse[List[schemas.CommentThread]](data=comments, meta={"pagination": pagination}))
\ No newline at end of file
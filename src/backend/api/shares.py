@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_db
+from models import schemas
+from core.responses import ORJSONResponse
+from services import report_service
+from utils import download_utils
+
+router = APIRouter()
+
+async def _resolve_or_404(db: AsyncSession, code: str) -> schemas.ResolvedShare:
+    """解析分享码，不存在、已撤销或已过期时返回404"""
+    share = await report_service.resolve_share_async(db, code)
+    
+    if not share:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="分享链接不存在或已失效"
+        )
+    
+    return share
+
+@router.get("/{code}", response_model=schemas.DataResponse[schemas.PublicShare])
+async def get_shared_report(
+    code: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """通过分享码获取报告信息"""
+    share = await _resolve_or_404(db, code)
+    
+    return ORJSONResponse(schemas.DataResponse[schemas.PublicShare](data=share.dict(exclude={"report": {"file_path"}})))
+
+@router.get("/{code}/download")
+@router.head("/{code}/download")
+async def download_shared_report(
+    code: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """通过分享码下载报告文件"""
+    share = await _resolve_or_404(db, code)
+    
+    return download_utils.report_file_response(request, share.report)
@@ -1,131 +1,128 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from database import get_db
+from database import get_async_db
 from models import models, schemas
 from core import security
-from services import user_service, subscription_service
+from core.responses import ORJSONResponse
+from services import user_service, subscription_service, quota_service
 
 router = APIRouter()
 
-@router.get("/me", response_model=schemas.DataResponse)
+@router.get("/me", response_model=schemas.DataResponse[schemas.UserProfile])
 async def read_users_me(
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(security.get_async_read_db)
 ):
     """
     获取当前用户信息
     """
     # 获取用户订阅信息
-    subscription = subscription_service.get_active_subscription(db, current_user.id)
+    subscription = await subscription_service.get_active_subscription_async(db, current_user.id)
     
     # 构建用户信息响应
-    user_data = schemas.User.from_orm(current_user).dict()
-    user_data["subscription"] = subscription.dict() if subscription else None
+    user_data = schemas.UserProfile(
+        **schemas.User.from_orm(current_user).dict(),
+        subscription=schemas.Subscription.from_orm(subscription) if subscription else None
+    )
     
-    return {
-        "success": True,
-        "data": user_data
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.UserProfile](data=user_data))
 
-@router.patch("/me", response_model=schemas.DataResponse)
+@router.patch("/me", response_model=schemas.DataResponse[schemas.User])
 async def update_user_me(
     user_update: schemas.UserUpdate,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     更新当前用户信息
     """
-    updated_user = user_service.update_user(db, current_user.id, user_update)
+    updated_user = await user_service.update_user_async(db, current_user.id, user_update)
     
-    return {
-        "success": True,
-        "data": updated_user
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.User](data=updated_user))
 
-@router.get("/me/subscriptions", response_model=schemas.DataResponse)
+@router.get("/me/subscriptions", response_model=schemas.DataResponse[List[schemas.Subscription]])
 async def read_user_subscriptions(
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(security.get_async_read_db)
 ):
     """
     获取当前用户的订阅历史
     """
-    subscriptions = subscription_service.get_user_subscriptions(db, current_user.id)
+    subscriptions = await subscription_service.get_user_subscriptions_async(db, current_user.id)
     
-    return {
-        "success": True,
-        "data": subscriptions
-    }
+    return ORJSONResponse(schemas.DataResponse[List[schemas.Subscription]](data=subscriptions))
 
-@router.post("/me/change-password", response_model=schemas.DataResponse)
+@router.get("/me/usage", response_model=schemas.DataResponse[schemas.Usage])
+async def read_user_usage(
+    current_user: models.User = Depends(security.get_current_active_user),
+    db: AsyncSession = Depends(security.get_async_read_db)
+):
+    """
+    获取当前用户本月的用量和配额
+    """
+    usage = await quota_service.get_usage_async(db, current_user.id)
+    
+    return ORJSONResponse(schemas.DataResponse[schemas.Usage](data=usage))
+
+@router.post("/me/change-password", response_model=schemas.DataResponse[schemas.Message])
 async def change_password(
     old_password: str,
     new_password: str,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     修改当前用户密码
     """
     # 验证旧密码
-    if not security.verify_password(old_password, current_user.password_hash):
+    if not await security.verify_password_async(old_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="旧密码不正确"
         )
     
     # 更新密码
-    user_service.update_password(db, current_user.id, new_password)
+    await user_service.update_password_async(db, current_user.id, new_password)
     
-    return {
-        "success": True,
-        "data": {"message": "密码已成功更新"}
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.Message](data={"message": "密码已成功更新"}))
 
-@router.get("/me/api-keys", response_model=schemas.DataResponse)
+@router.get("/me/api-keys", response_model=schemas.DataResponse[List[schemas.APIKey]])
 async def read_user_api_keys(
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取当前用户的API密钥
     """
-    api_keys = user_service.get_user_api_keys(db, current_user.id)
+    api_keys = await user_service.get_user_api_keys_async(db, current_user.id)
     
-    return {
-        "success": True,
-        "data": api_keys
-    }
+    return ORJSONResponse(schemas.DataResponse[List[schemas.APIKey]](data=api_keys))
 
-@router.post("/me/api-keys", response_model=schemas.DataResponse)
+@router.post("/me/api-keys", response_model=schemas.DataResponse[schemas.APIKeyWithValue])
 async def create_api_key(
     api_key_create: schemas.APIKeyBase,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     创建新的API密钥
     """
-    api_key = user_service.create_api_key(db, current_user.id, api_key_create)
+    api_key = await user_service.create_api_key_async(db, current_user.id, api_key_create)
     
-    return {
-        "success": True,
-        "data": api_key
-    }
+    return ORJSONResponse(schemas.DataResponse[schemas.APIKeyWithValue](data=api_key))
 
-@router.delete("/me/api-keys/{api_key_id}", response_model=schemas.DataResponse)
+@router.delete("/me/api-keys/{api_key_id}", response_model=schemas.DataResponse[schemas.Message])
 async def delete_api_key(
     api_key_id: str,
     current_user: models.User = Depends(security.get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     删除API密钥
     """
-    result = user_service.delete_api_key(db, current_user.id, api_key_id)
+    result = await user_service.delete_api_key_async(db, current_user.id, api_key_id)
     
     if not result:
         raise HTTPException(
@@ -133,7 +130,4 @@ async def delete_api_key(
             detail="API密钥不存在或不属于当前用户"
         )
     
-    return {
-        "success": True,
-        "data": {"message": "API密钥已成功删除"}
-    }
\ No newline at end of file
+    return ORJSONResponse(schemas.DataResponse[schemas.Message](data={"message": "API密钥已成功删除"}))
\ No newline at end of file
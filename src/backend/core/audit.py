@@ -0,0 +1,186 @@
+from collections import deque
+from datetime import datetime
+import logging
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from core import config, metrics
+from database import SessionLocal
+from services import audit_service
+
+logger = logging.getLogger(__name__)
+
+# 请求结束时记录的原始信息，转换为审计记录的工作留给后台线程：
+# (时间, 方法, 路径, 端点函数名, 路径参数, 状态码, 用户id, 客户端地址, 请求头)
+RawEvent = Tuple[datetime, str, str, Optional[str], Dict[str, Any], int, Any, Optional[str], List[Tuple[bytes, bytes]]]
+
+def _entity_type(path: str) -> str:
+    """实体类型取API路径的第一段，如 /api/papers/... -> papers"""
+    parts = path.strip("/").split("/")
+    if len(parts) > 1 and parts[0] == "api":
+        return parts[1]
+    return parts[0] or "root"
+
+def _entity_id(path_params: Dict[str, Any]) -> Optional[uuid.UUID]:
+    """实体id取第一个UUID格式的路径参数"""
+    for value in path_params.values():
+        try:
+            return uuid.UUID(str(value))
+        except ValueError:
+            continue
+    return None
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def to_row(event: RawEvent) -> Dict[str, Any]:
+    """将原始事件转换为audit_logs记录"""
+    timestamp, method, path, endpoint, path_params, status_code, user_id, client, headers = event
+    return {
+        "id": uuid.uuid4(),
+        "user_id": user_id,
+        "action": endpoint or f"{method} {path}",
+        "entity_type": _entity_type(path),
+        "entity_id": _entity_id(path_params),
+        "timestamp": timestamp,
+        "ip_address": client,
+        "user_agent": _header(headers, b"user-agent"),
+        "details": {"method": method, "path": path, "status_code": status_code},
+    }
+
+class AuditWriter:
+    """
+    审计事件的进程内缓冲区和后台写入线程
+    
+    缓冲区是定长deque（环形缓冲区）：请求路径上只做一次追加，写满后丢弃最早的事件，
+    不会阻塞请求。后台线程按固定间隔或积累满一批时取出事件，批量写入数据库。
+    """
+    
+    def __init__(self, capacity: int, batch_size: int, interval: float):
+        self._buffer = deque(maxlen=capacity)
+        self._batch_size = batch_size
+        self._interval = interval
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def record(self, event: RawEvent):
+        """放入一个事件"""
+        if len(self._buffer) == self._buffer.maxlen:
+            metrics.AUDIT_EVENTS_DROPPED.labels("buffer_full").inc()
+        self._buffer.append(event)
+        if len(self._buffer) >= self._batch_size:
+            self._wakeup.set()
+    
+    def pending(self) -> int:
+        return len(self._buffer)
+    
+    def start(self):
+        """启动后台写入线程（每个进程一个）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 10):
+        """停止后台线程，退出前写入缓冲区中剩余的事件"""
+        if not self._thread:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self._interval)
+            self._wakeup.clear()
+            self.flush()
+        self.flush()
+    
+    def _take_batch(self) -> List[RawEvent]:
+        batch = []
+        while len(batch) < self._batch_size:
+            try:
+                batch.append(self._buffer.popleft())
+            except IndexError:
+                break
+        return batch
+    
+    def flush(self) -> int:
+        """写入缓冲区中的全部事件，返回写入条数；写入失败的批次丢弃并记录指标"""
+        written = 0
+        batch = self._take_batch()
+        if not batch:
+            return 0
+    
+        db = SessionLocal()
+        try:
+            while batch:
+                try:
+                    written += audit_service.write_events(db, [to_row(event) for event in batch])
+                    metrics.AUDIT_EVENTS_WRITTEN.inc(len(batch))
+                except Exception as e:
+                    db.rollback()
+                    metrics.AUDIT_EVENTS_DROPPED.labels("write_failed").inc(len(batch))
+                    logger.error(f"写入审计日志失败，丢弃{len(batch)}条: {e}")
+                batch = self._take_batch()
+        finally:
+            db.close()
+    
+        return written
+
+audit_writer = AuditWriter(
+    config.AUDIT_LOG_BUFFER_SIZE,
+    config.AUDIT_LOG_BATCH_SIZE,
+    config.AUDIT_LOG_FLUSH_INTERVAL_SECONDS
+)
+
+class AuditMiddleware:
+    """
+    审计中间件（ASGI）
+    
+    对AUDIT_LOG_METHODS中的请求，在响应结束后把原始事件交给AuditWriter。用户id由
+    security.get_current_user写入request.state；端点函数名作为action。
+    """
+    
+    def __init__(self, app, writer: AuditWriter = audit_writer):
+        self.app = app
+        self.writer = writer
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in config.AUDIT_LOG_METHODS:
+            await self.app(scope, receive, send)
+            return
+    
+        # 预先创建state，路由和依赖写入的是同一个字典
+        state = scope.setdefault("state", {})
+        status_code = 500
+    
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+    
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            endpoint = scope.get("endpoint")
+            client = scope.get("client")
+            self.writer.record((
+                datetime.utcnow(),
+                scope["method"],
+                scope["path"],
+                getattr(endpoint, "__name__", None),
+                scope.get("path_params", {}),
+                status_code,
+                state.get("user_id"),
+                client[0] if client else None,
+                scope["headers"],
+            ))
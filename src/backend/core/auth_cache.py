@@ -0,0 +1,198 @@
+from collections import OrderedDict
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import redis
+
+from core import cache, config, metrics
+from models import models
+
+logger = logging.getLogger(__name__)
+
+# 用户信息变更（资料、密码）或API密钥删除时发布 user:<用户id> / api_key:<密钥前缀>，
+# 各API进程收到后删除本地缓存
+INVALIDATION_CHANNEL = "auth_cache:invalidate"
+# 订阅断开后的重连间隔
+RECONNECT_SECONDS = 5
+
+class LocalCache:
+    """进程内的键值缓存（LRU淘汰，条目有TTL）"""
+    
+    def __init__(self, max_size: int, ttl: float):
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._max_size = max_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # 每次失效自增，查询数据库期间发生过失效时不写入缓存，避免写入旧值
+        self._generation = 0
+    
+    def generation(self) -> int:
+        return self._generation
+    
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def put(self, key: Hashable, values: Dict[str, Any], generation: Optional[int] = None):
+        """写入缓存，generation为查询数据库前的失效计数，期间发生过失效时不写入"""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self._ttl, values)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+    
+    def evict(self, key: Hashable):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+class AuthCache:
+    """
+    认证信息的进程内缓存：按用户id缓存users行，按前缀缓存api_keys行
+    
+    缓存的是各列的值，命中时构建一个不属于任何会话的ORM对象返回，请求之间不共享ORM对象。
+    只有订阅失效频道期间才使用缓存：订阅断开时可能错过失效消息，此时清空缓存并直接
+    查询数据库，直到重新订阅。
+    """
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.users = LocalCache(max_size, ttl)
+        self.api_keys = LocalCache(max_size, ttl)
+        self._configured = ttl > 0 and max_size > 0
+        self._listening = False
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def enabled(self) -> bool:
+        return self._configured and self._listening
+    
+    def _get(self, name: str, local: LocalCache, model, key: Hashable):
+        if not self.enabled():
+            metrics.AUTH_CACHE_LOOKUPS.labels(name, "bypass").inc()
+            return None
+        values = local.get(key)
+        metrics.AUTH_CACHE_LOOKUPS.labels(name, "miss" if values is None else "hit").inc()
+        return model(**values) if values is not None else None
+    
+    def _put(self, local: LocalCache, key: Hashable, row, generation: int):
+        if not self.enabled():
+            return
+        values = {attr.key: getattr(row, attr.key) for attr in type(row).__mapper__.column_attrs}
+        local.put(key, values, generation)
+    
+    def get_user(self, user_id: uuid.UUID) -> Optional[models.User]:
+        """读取缓存的用户，未命中、已过期或缓存未启用时返回None"""
+        return self._get("user", self.users, models.User, user_id)
+    
+    def put_user(self, user: models.User, generation: int):
+        """写入从数据库读取的用户，generation为查询前users.generation()的值"""
+        self._put(self.users, user.id, user, generation)
+    
+    def get_api_key(self, key_prefix: str) -> Optional[models.APIKey]:
+        """按前缀读取缓存的API密钥记录"""
+        return self._get("api_key", self.api_keys, models.APIKey, key_prefix)
+    
+    def peek_api_key(self, key_prefix: str) -> Optional[models.APIKey]:
+        """读取已缓存的API密钥记录，不查询数据库、不计入命中率（供限流识别调用方）"""
+        if not self.enabled():
+            return None
+        values = self.api_keys.get(key_prefix)
+        return models.APIKey(**values) if values is not None else None
+    
+    def put_api_key(self, api_key: models.APIKey, generation: int):
+        """写入从数据库读取的API密钥记录，generation为查询前api_keys.generation()的值"""
+        self._put(self.api_keys, api_key.key_prefix, api_key, generation)
+    
+    def clear(self):
+        self.users.clear()
+        self.api_keys.clear()
+    
+    def start(self):
+        """启动订阅失效频道的后台线程（每个进程一个）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="auth-cache-invalidation", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 5):
+        if not self._thread:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+    
+    def _run(self):
+        # 订阅连接长期空闲等待消息，不使用cache.get_redis()的读超时
+        client = redis.Redis.from_url(
+            config.REDIS_URL,
+            decode_responses=True,
+            socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT
+        )
+        while not self._stopping.is_set():
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # 订阅生效前的失效消息已错过
+                self.clear()
+                self._listening = True
+                while not self._stopping.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message:
+                        self._handle(message["data"])
+            except redis.RedisError as e:
+                logger.warning(f"认证缓存失效频道订阅中断，暂停使用缓存: {e}")
+                self._stopping.wait(RECONNECT_SECONDS)
+            finally:
+                self._listening = False
+                self.clear()
+                pubsub.close()
+    
+    def _handle(self, data: str):
+        kind, _, key = data.partition(":")
+        try:
+            if kind == "user":
+                self.users.evict(uuid.UUID(key))
+            elif kind == "api_key":
+                self.api_keys.evict(key)
+            else:
+                raise ValueError(kind)
+        except ValueError:
+            logger.warning(f"无效的认证缓存失效消息: {data}")
+
+auth_cache = AuthCache(config.AUTH_CACHE_MAX_SIZE, config.AUTH_CACHE_TTL_SECONDS)
+
+async def _publish_async(message: str):
+    try:
+        await cache.get_async_redis().publish(INVALIDATION_CHANNEL, message)
+    except redis.RedisError as e:
+        logger.warning(f"发布认证缓存失效消息失败 {message}: {e}")
+
+async def invalidate_user_async(user_id: uuid.UUID):
+    """
+    使用户在所有进程中的缓存失效，在用户信息变更提交后调用（异步）
+    
+    发布失败时其他进程的缓存最多在AUTH_CACHE_TTL_SECONDS后过期。
+    """
+    auth_cache.users.evict(user_id)
+    await _publish_async(f"user:{user_id}")
+
+async def invalidate_api_key_async(key_prefix: str):
+    """使API密钥在所有进程中的缓存失效，在密钥删除提交后调用（异步）"""
+    auth_cache.api_keys.evict(key_prefix)
+    await _publish_async(f"api_key:{key_prefix}")
@@ -0,0 +1,139 @@
+import json
+import logging
+from typing import Any, Optional
+
+import redis
+import redis.asyncio
+
+from core import config
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+_async_redis_client = None
+
+def get_redis() -> redis.Redis:
+    """获取Redis客户端（进程内复用连接池）"""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(
+            config.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT
+        )
+    return _redis_client
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """获取异步Redis客户端，供请求路径（中间件、异步接口）使用（进程内复用连接池）"""
+    global _async_redis_client
+    if _async_redis_client is None:
+        _async_redis_client = redis.asyncio.Redis.from_url(
+            config.REDIS_URL,
+            decode_responses=True,
+            socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT
+        )
+    return _async_redis_client
+
+def get_json(key: str) -> Optional[Any]:
+    """读取JSON缓存，Redis不可用时视为未命中"""
+    try:
+        value = get_redis().get(key)
+    except redis.RedisError as e:
+        logger.warning(f"读取缓存失败 {key}: {e}")
+        return None
+    return json.loads(value) if value is not None else None
+
+async def get_json_async(key: str) -> Optional[Any]:
+    """读取JSON缓存（异步）"""
+    try:
+        value = await get_async_redis().get(key)
+    except redis.RedisError as e:
+        logger.warning(f"读取缓存失败 {key}: {e}")
+        return None
+    return json.loads(value) if value is not None else None
+
+def set_json(key: str, value: Any, ttl: int):
+    """写入JSON缓存"""
+    if ttl <= 0:
+        return
+    try:
+        get_redis().set(key, json.dumps(value, default=str), ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"写入缓存失败 {key}: {e}")
+
+async def set_json_async(key: str, value: Any, ttl: int):
+    """写入JSON缓存（异步）"""
+    if ttl <= 0:
+        return
+    try:
+        await get_async_redis().set(key, json.dumps(value, default=str), ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"写入缓存失败 {key}: {e}")
+
+def delete(*keys: str):
+    """删除缓存"""
+    if not keys:
+        return
+    try:
+        get_redis().delete(*keys)
+    except redis.RedisError as e:
+        logger.warning(f"删除缓存失败 {keys}: {e}")
+
+async def delete_async(*keys: str):
+    """删除缓存（异步）"""
+    if not keys:
+        return
+    try:
+        await get_async_redis().delete(*keys)
+    except redis.RedisError as e:
+        logger.warning(f"删除缓存失败 {keys}: {e}")
+
+def incr(key: str, ttl: int) -> Optional[int]:
+    """自增计数并刷新过期时间，Redis不可用时返回None"""
+    try:
+        pipe = get_redis().pipeline()
+        pipe.incr(key)
+        pipe.expire(key, ttl)
+        return pipe.execute()[0]
+    except redis.RedisError as e:
+        logger.warning(f"自增缓存失败 {key}: {e}")
+        return None
+
+async def incr_async(key: str, ttl: int) -> Optional[int]:
+    """自增计数并刷新过期时间（异步）"""
+    try:
+        pipe = get_async_redis().pipeline()
+        pipe.incr(key)
+        pipe.expire(key, ttl)
+        return (await pipe.execute())[0]
+    except redis.RedisError as e:
+        logger.warning(f"自增缓存失败 {key}: {e}")
+        return None
+
+# 待处理键已存在（上次落库失败遗留，或另一次落库正在进行）时沿用，不再重命名；
+# 否则将缓冲键重命名为待处理键。返回是否有待处理的数据
+TAKE_PENDING_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 1
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    return 1
+end
+return 0
+"""
+
+_take_pending_script = None
+
+def take_pending(key: str, pending_key: str) -> bool:
+    """
+    将缓冲键原子地转为待处理键，供写后缓冲的定期落库使用（同步，Redis不可用时抛出RedisError）
+
+    检查与重命名在同一脚本中执行，两次落库重叠时不会用新的缓冲覆盖尚未读取的待处理数据。
+    """
+    global _take_pending_script
+    if _take_pending_script is None:
+        _take_pending_script = get_redis().register_script(TAKE_PENDING_SCRIPT)
+    return bool(_take_pending_script(keys=[key, pending_key]))
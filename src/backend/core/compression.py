@@ -0,0 +1,130 @@
+import gzip
+from typing import Dict, List, Optional, Tuple
+
+import brotli
+
+from core import config, metrics
+
+# 按此顺序优先选择（权重相同时brotli优先）
+ENCODINGS = ("br", "gzip")
+
+# 压缩的内容类型，PDF、ZIP等已压缩的文件不再压缩
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/xml", "application/javascript", "image/svg+xml")
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """按Accept-Encoding及其q值选择编码，都不接受时返回None"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, mode=brotli.MODE_TEXT, quality=config.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=config.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+def _compressible(status: int, headers: List[Tuple[bytes, bytes]]) -> bool:
+    if status < 200 or status in (204, 206, 304):
+        return False
+    if _header(headers, b"content-encoding") is not None:
+        return False
+    content_type = (_header(headers, b"content-type") or "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+def _vary_accept_encoding(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    """在Vary中加入Accept-Encoding（已有Vary时追加）"""
+    vary = _header(headers, b"vary")
+    if vary and "accept-encoding" in vary.lower():
+        return headers
+    headers = [(key, value) for key, value in headers if key != b"vary"]
+    headers.append((b"vary", (f"{vary}, Accept-Encoding" if vary else "Accept-Encoding").encode("latin-1")))
+    return headers
+
+class CompressionMiddleware:
+    """
+    响应压缩中间件（ASGI）
+    
+    按请求的Accept-Encoding协商brotli或gzip，压缩一次性返回的JSON、文本等响应（接口响应都是如此），
+    小于minimum_size字节或压缩后没有变小时原样返回。分块发送的响应（文件下载、批量导出、Range请求）
+    原样透传，不影响流式发送和断点续传。可压缩类型的响应无论是否压缩都带 Vary: Accept-Encoding。
+    """
+    
+    def __init__(self, app, minimum_size: int = config.COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+    
+        encoding = negotiate(_header(scope["headers"], b"accept-encoding") or "")
+        start_message = None
+        passthrough = False
+    
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+    
+            if message["type"] == "http.response.start":
+                # 等到第一段响应体，确定是否一次性返回后再发送响应头
+                start_message = message
+                return
+    
+            body = message.get("body", b"")
+            headers = list(start_message.get("headers", []))
+            passthrough = True
+            if not _compressible(start_message["status"], headers):
+                await send(start_message)
+                await send(message)
+                return
+    
+            # 可压缩类型的响应是否压缩取决于Accept-Encoding，原样返回时也声明Vary，
+            # 避免共享缓存把未压缩的响应返回给支持压缩的客户端，或反之
+            headers = _vary_accept_encoding(headers)
+            compressed = None
+            if encoding is not None and not message.get("more_body", False) and len(body) >= self.minimum_size:
+                compressed = compress(body, encoding)
+            if compressed is None or len(compressed) >= len(body):
+                await send({**start_message, "headers": headers})
+                await send(message)
+                return
+    
+            metrics.RESPONSE_COMPRESSION_BYTES.labels(encoding, "original").inc(len(body))
+            metrics.RESPONSE_COMPRESSION_BYTES.labels(encoding, "compressed").inc(len(compressed))
+    
+            headers = [(key, value) for key, value in headers if key != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+            ]
+            await send({**start_message, "headers": headers})
+            await send({**message, "body": compressed})
+    
+        await self.app(scope, receive, send_compressed)
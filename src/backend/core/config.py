@@ -1,3 +1,4 @@
+import json
 import os
 from dotenv import load_dotenv
 from typing import List
@@ -13,6 +14,19 @@ PROJECT_NAME = "Paperal"
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-for-development-only")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# 进程内缓存已认证的用户和API密钥，变更时经Redis频道通知各进程失效；TTL为0时不缓存
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+# API密钥的密钥部分以HMAC-SHA256存储，更换该值后已签发的API密钥全部失效
+API_KEY_HMAC_SECRET = os.getenv("API_KEY_HMAC_SECRET") or SECRET_KEY
+# 每个进程内同一API密钥记录最后使用时间的最小间隔
+API_KEY_LAST_USED_INTERVAL_SECONDS = float(os.getenv("API_KEY_LAST_USED_INTERVAL_SECONDS", "60"))
+# Prometheus指标：以 Authorization: Bearer <METRICS_TOKEN> 访问 /metrics，未设置时不暴露指标端点
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+# 密码哈希（bcrypt）线程池大小，以及排队和执行中的计算数上限，超出时返回503
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = int(os.getenv("PASSWORD_HASH_RETRY_AFTER_SECONDS", "2"))
 
 # CORS配置
 CORS_ORIGINS = [
@@ -37,7 +51,83 @@ S3_BUCKET = os.getenv("S3_BUCKET", "paperal-storage")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = os.getenv("REDIS_PORT", "6379")
 REDIS_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
 
 # Celery配置
 CELERY_BROKER_URL = REDIS_URL
-CELERY_RESULT_BACKEND = REDIS_URL
\ No newline at end of file
+CELERY_RESULT_BACKEND = REDIS_URL
+
+# 写后缓冲配置（访问次数、最后登录/使用时间的落库间隔）
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", "30"))
+
+# 文件下载配置
+# 设置后由Nginx通过X-Accel-Redirect内部跳转发送文件（内核sendfile），例如 /_protected/
+DOWNLOAD_ACCEL_REDIRECT_PREFIX = os.getenv("DOWNLOAD_ACCEL_REDIRECT_PREFIX")
+DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", str(256 * 1024)))
+PRESIGNED_URL_EXPIRE_SECONDS = int(os.getenv("PRESIGNED_URL_EXPIRE_SECONDS", "300"))
+PUBLIC_REPORT_CACHE_SECONDS = int(os.getenv("PUBLIC_REPORT_CACHE_SECONDS", "3600"))
+
+# 分享配置
+SHARE_BASE_URL = os.getenv("SHARE_BASE_URL", "https://paperal.com/s")
+SHARE_CACHE_TTL_SECONDS = int(os.getenv("SHARE_CACHE_TTL_SECONDS", "300"))
+
+# 列表总数缓存（写入时失效，TTL兜底其他途径的变更）
+COUNT_CACHE_TTL_SECONDS = int(os.getenv("COUNT_CACHE_TTL_SECONDS", "60"))
+
+# 论文向量（相似论文、语义检索）
+# 在CPU上运行的句向量模型，维度须与papers.embedding列一致
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_SWEEP_INTERVAL_SECONDS = float(os.getenv("EMBEDDING_SWEEP_INTERVAL_SECONDS", "60"))
+# HNSW检索的候选数，带过滤条件时需大于返回数量
+VECTOR_SEARCH_EF_SEARCH = int(os.getenv("VECTOR_SEARCH_EF_SEARCH", "100"))
+
+# 审计日志
+AUDIT_LOG_ENABLED = os.getenv("AUDIT_LOG_ENABLED", "False").lower() in ("true", "1", "t")
+# 记录审计事件的请求方法
+AUDIT_LOG_METHODS = {method.strip().upper() for method in os.getenv("AUDIT_LOG_METHODS", "POST,PUT,PATCH,DELETE").split(",") if method.strip()}
+# 进程内缓冲区容量，写入跟不上时丢弃最早的事件
+AUDIT_LOG_BUFFER_SIZE = int(os.getenv("AUDIT_LOG_BUFFER_SIZE", "10000"))
+# 后台写入的批大小和间隔
+AUDIT_LOG_BATCH_SIZE = int(os.getenv("AUDIT_LOG_BATCH_SIZE", "500"))
+AUDIT_LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_LOG_FLUSH_INTERVAL_SECONDS", "1"))
+# 按月分区：提前创建的月数、保留天数（整月超出保留期后删除分区）
+AUDIT_LOG_PARTITIONS_AHEAD = int(os.getenv("AUDIT_LOG_PARTITIONS_AHEAD", "3"))
+AUDIT_LOG_RETENTION_DAYS = int(os.getenv("AUDIT_LOG_RETENTION_DAYS", "365"))
+
+# 冷数据归档：完成较早的分析原文（raw_analysis）和论文正文压缩后转存到存储后端，表中只保留引用
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "100"))
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+# zstd压缩级别（1-22），级别越高压缩率越高、归档越慢，读取速度基本不受影响
+ARCHIVE_ZSTD_LEVEL = int(os.getenv("ARCHIVE_ZSTD_LEVEL", "10"))
+
+# 限流：按路由类别和调用方（API密钥、用户或客户端地址）的令牌桶，格式为 "次数/秒数"
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "False").lower() in ("true", "1", "t")
+RATE_LIMIT_AUTH = os.getenv("RATE_LIMIT_AUTH", "10/60")
+RATE_LIMIT_UPLOAD = os.getenv("RATE_LIMIT_UPLOAD", "20/3600")
+RATE_LIMIT_ANALYSIS = os.getenv("RATE_LIMIT_ANALYSIS", "30/3600")
+RATE_LIMIT_SEARCH = os.getenv("RATE_LIMIT_SEARCH", "120/60")
+RATE_LIMIT_DEFAULT = os.getenv("RATE_LIMIT_DEFAULT", "600/60")
+# 每个进程每次从Redis预取的令牌占容量的比例（至少1个）及预取令牌的有效秒数，
+# 比例越大访问Redis越少，但多进程时越早触发限流
+RATE_LIMIT_LOCAL_FRACTION = float(os.getenv("RATE_LIMIT_LOCAL_FRACTION", "0.05"))
+RATE_LIMIT_LEASE_SECONDS = float(os.getenv("RATE_LIMIT_LEASE_SECONDS", "2"))
+# 进程内记录的调用方数上限（LRU淘汰）
+RATE_LIMIT_LOCAL_MAX_ENTRIES = int(os.getenv("RATE_LIMIT_LOCAL_MAX_ENTRIES", "100000"))
+
+# 月度配额：订阅的usage_limits中papers、analyses、reports、tokens为每月上限，未设置的项不限制。
+# 没有活跃订阅的用户使用QUOTA_DEFAULT_LIMITS（JSON，默认不限制）
+QUOTA_DEFAULT_LIMITS = json.loads(os.getenv("QUOTA_DEFAULT_LIMITS") or "{}")
+# 活跃订阅的缓存秒数，订阅变更时删除缓存
+QUOTA_SUBSCRIPTION_CACHE_SECONDS = int(os.getenv("QUOTA_SUBSCRIPTION_CACHE_SECONDS", "300"))
+# Redis中的用量写入usage_counters表的间隔
+QUOTA_RECONCILE_INTERVAL_SECONDS = float(os.getenv("QUOTA_RECONCILE_INTERVAL_SECONDS", "300"))
+
+# 响应压缩：按Accept-Encoding协商brotli或gzip，只压缩一次性返回的JSON、文本等响应，小于阈值（字节）的不压缩
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "True").lower() in ("true", "1", "t")
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+# 压缩级别：gzip为1-9，brotli为0-11，动态响应不宜过高
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
@@ -0,0 +1,146 @@
+import hmac
+from typing import Dict
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, make_asgi_app
+from prometheus_client.core import GaugeMetricFamily
+
+# 连接池获取连接的等待时间
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "paperal_db_pool_checkout_wait_seconds",
+    "从连接池获取连接的等待时间",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+# 连接池获取连接超时次数
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "paperal_db_pool_checkout_timeouts_total",
+    "从连接池获取连接超时的次数",
+    ["pool"]
+)
+
+# 只读副本最近一次检查到的复制延迟
+DB_REPLICA_LAG = Gauge(
+    "paperal_db_replica_lag_seconds",
+    "只读副本的复制延迟",
+    ["replica"]
+)
+
+# 只读会话的路由结果：replica、primary_recent_write（用户刚写入）、primary_no_replica（无可用副本）
+DB_READ_ROUTES = Counter(
+    "paperal_db_read_routes_total",
+    "只读会话的路由次数",
+    ["target"]
+)
+
+# 审计事件：写入条数，以及丢弃条数（buffer_full：缓冲区已满，write_failed：写入数据库失败）
+AUDIT_EVENTS_WRITTEN = Counter(
+    "paperal_audit_events_written_total",
+    "写入数据库的审计事件数"
+)
+AUDIT_EVENTS_DROPPED = Counter(
+    "paperal_audit_events_dropped_total",
+    "丢弃的审计事件数",
+    ["reason"]
+)
+
+# 认证缓存查询结果，cache为user或api_key，result为hit、miss、bypass（未订阅失效频道，缓存未启用）
+AUTH_CACHE_LOOKUPS = Counter(
+    "paperal_auth_cache_lookups_total",
+    "认证缓存的查询次数",
+    ["cache", "result"]
+)
+
+# 密码哈希线程池排队已满而拒绝的请求数（登录、注册、修改密码）
+PASSWORD_HASH_REJECTED = Counter(
+    "paperal_password_hash_rejected_total",
+    "密码哈希排队已满而拒绝的请求数"
+)
+
+# 限流判定：result为allowed/rejected（访问Redis）、allowed_local/rejected_local（进程内判定）、redis_error（放行）
+RATE_LIMIT_DECISIONS = Counter(
+    "paperal_rate_limit_decisions_total",
+    "限流判定次数",
+    ["route_class", "result"]
+)
+
+# 配额检查结果：allowed、rejected（超出配额）、redis_error（Redis不可用，放行）
+QUOTA_CHECKS = Counter(
+    "paperal_quota_checks_total",
+    "配额检查次数",
+    ["result"]
+)
+
+# 压缩的响应字节数：encoding为br/gzip，stage为original（压缩前）、compressed（压缩后），两者之比为压缩率
+RESPONSE_COMPRESSION_BYTES = Counter(
+    "paperal_response_compression_bytes_total",
+    "压缩响应的字节数",
+    ["encoding", "stage"]
+)
+
+class PoolCollector:
+    """
+    连接池状态采集器
+    
+    在抓取时读取连接池的实时状态，而不是在每次获取/归还连接时更新指标。
+    记录的是引擎而不是连接池本身，因为engine.dispose()会替换连接池。
+    """
+    
+    def __init__(self):
+        self._engines: Dict[str, object] = {}
+    
+    def register(self, name: str, engine):
+        """注册需要采集的引擎（同步或异步）"""
+        self._engines[name] = engine
+    
+    def collect(self):
+        size = GaugeMetricFamily("paperal_db_pool_size", "连接池常驻连接数上限", labels=["pool"])
+        max_overflow = GaugeMetricFamily("paperal_db_pool_max_overflow", "连接池允许的溢出连接数", labels=["pool"])
+        checked_out = GaugeMetricFamily("paperal_db_pool_checked_out", "当前被占用的连接数", labels=["pool"])
+        checked_in = GaugeMetricFamily("paperal_db_pool_checked_in", "当前空闲的连接数", labels=["pool"])
+        overflow = GaugeMetricFamily("paperal_db_pool_overflow", "当前溢出连接数", labels=["pool"])
+        saturation = GaugeMetricFamily("paperal_db_pool_saturation", "被占用连接数占连接上限的比例", labels=["pool"])
+    
+        for name, engine in self._engines.items():
+            pool = getattr(engine, "sync_engine", engine).pool
+            # NullPool等没有容量概念的连接池不采集
+            if not hasattr(pool, "checkedout"):
+                continue
+    
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            size.add_metric([name], pool.size())
+            max_overflow.add_metric([name], pool._max_overflow)
+            checked_out.add_metric([name], pool.checkedout())
+            checked_in.add_metric([name], pool.checkedin())
+            overflow.add_metric([name], max(pool.overflow(), 0))
+            saturation.add_metric([name], pool.checkedout() / capacity if capacity else 0)
+    
+        return [size, max_overflow, checked_out, checked_in, overflow, saturation]
+
+pool_collector = PoolCollector()
+REGISTRY.register(pool_collector)
+
+
+def protected_asgi_app(token: str):
+    """
+    需要令牌才能访问的指标端点（Authorization: Bearer <token>）
+    
+    指标含连接池、限流、配额等内部状态，不向未认证的请求公开；令牌以常量时间比较。
+    """
+    app = make_asgi_app()
+    expected = f"Bearer {token}".encode("utf-8")
+    
+    async def metrics_app(scope, receive, send):
+        if scope["type"] == "http":
+            authorization = dict(scope["headers"]).get(b"authorization", b"")
+            if not hmac.compare_digest(authorization, expected):
+                await send({
+                    "type": "http.response.start",
+                    "status": 401,
+                    "headers": [(b"www-authenticate", b"Bearer"), (b"content-length", b"0")],
+                })
+                await send({"type": "http.response.body", "body": b""})
+                return
+        await app(scope, receive, send)
+    
+    return metrics_app
@@ -0,0 +1,252 @@
+from collections import OrderedDict
+import json
+import logging
+import math
+import re
+import time
+from typing import List, NamedTuple, Optional, Pattern, Tuple
+
+import redis
+
+from core import cache, config, metrics, security
+
+logger = logging.getLogger(__name__)
+
+# 令牌桶，每个(路由类别, 调用方)一个Redis哈希：tokens为剩余令牌，ts为上次计算的时间（Redis服务器时间）。
+# 按经过的时间补充令牌并加回退还的令牌（不超过容量），再发放最多requested个。
+# 返回 {发放数, 剩余令牌, 无令牌时的等待秒数, 令牌补满的秒数}
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local refund = tonumber(ARGV[4])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate + refund)
+
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+
+local retry_after = 0
+if granted == 0 then
+    retry_after = (1 - tokens) / rate
+end
+return {granted, tostring(tokens), tostring(retry_after), tostring((capacity - tokens) / rate)}
+"""
+
+class RateLimitRule(NamedTuple):
+    """路由类别的限流规则：每个调用方period秒内最多limit个请求"""
+    name: str
+    limit: int
+    period: float
+    # 每次从Redis预取的令牌数，在进程内发放
+    batch: int
+    
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+def _rule(name: str, spec: str) -> RateLimitRule:
+    """解析 "次数/秒数" 格式的限流配置"""
+    limit, period = spec.split("/")
+    limit = int(limit)
+    return RateLimitRule(name, limit, float(period), max(1, int(limit * config.RATE_LIMIT_LOCAL_FRACTION)))
+
+# 按顺序匹配(方法, 路径)，第一个匹配的类别生效；不在 /api 下的路径（健康检查、指标）不限流
+ROUTE_CLASSES: List[Tuple[str, Pattern, RateLimitRule]] = [
+    ("POST", re.compile(r"^/api/(auth/(token|register|refresh)|users/me/change-password)$"), _rule("auth", config.RATE_LIMIT_AUTH)),
+    ("POST", re.compile(r"^/api/papers$"), _rule("upload", config.RATE_LIMIT_UPLOAD)),
+    ("POST", re.compile(r"^/api/(papers/[^/]+/analysis|analysis/[^/]+/reports)$"), _rule("analysis", config.RATE_LIMIT_ANALYSIS)),
+    ("GET", re.compile(r"^/api/papers/(search|semantic-search|[^/]+/similar)$"), _rule("search", config.RATE_LIMIT_SEARCH)),
+    ("*", re.compile(r"^/api/"), _rule("default", config.RATE_LIMIT_DEFAULT)),
+]
+
+def classify(method: str, path: str) -> Optional[RateLimitRule]:
+    """确定请求的路由类别"""
+    for rule_method, pattern, rule in ROUTE_CLASSES:
+        if rule_method in ("*", method) and pattern.match(path):
+            return rule
+    return None
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[str]:
+    for key, value in headers:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+def identify(scope) -> str:
+    """
+    确定调用方：API密钥按前缀，JWT按用户id，其余按客户端地址
+    
+    这里不查询数据库。API密钥只有在进程内认证缓存中且密钥验证通过时才按前缀计数，
+    否则按客户端地址计数，伪造的密钥不能获得新的令牌桶；JWT验证签名后才按用户计数。
+    无效凭据的请求随后由认证返回401。
+    """
+    headers = scope["headers"]
+    credential = _header(headers, b"x-api-key")
+    if not credential:
+        authorization = _header(headers, b"authorization") or ""
+        scheme, _, credential = authorization.partition(" ")
+        if scheme.lower() != "bearer":
+            credential = None
+    
+    if credential:
+        if security.parse_api_key(credential):
+            key_prefix = security.verified_api_key_prefix(credential)
+            if key_prefix:
+                return f"key:{key_prefix}"
+            credential = None
+    
+    if credential:
+        user_id = security.decode_access_token(credential)
+        if user_id:
+            return f"user:{user_id}"
+    
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+class Lease:
+    """
+    进程内预取的令牌；denied_until非零时表示Redis已拒绝，此前直接拒绝不再访问Redis
+    
+    expires、reset、denied_until都是time.monotonic()时刻，reset为令牌桶补满的时刻。
+    """
+    __slots__ = ("tokens", "expires", "remaining", "reset", "denied_until")
+    
+    def __init__(self, tokens: int, expires: float, remaining: float, reset: float, denied_until: float = 0):
+        self.tokens = tokens
+        self.expires = expires
+        self.remaining = remaining
+        self.reset = reset
+        self.denied_until = denied_until
+
+class Decision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int
+    retry_after: int
+
+class RateLimiter:
+    """
+    分布式令牌桶限流
+    
+    令牌桶存放在Redis中，由Lua脚本原子地补充和发放。每个进程每次向Redis预取一批令牌
+    （规则容量的RATE_LIMIT_LOCAL_FRACTION），在RATE_LIMIT_LEASE_SECONDS内于进程内发放，
+    额度充足的调用方大多数请求无需访问Redis；过期未用完的令牌在下次预取时退还。
+    令牌先从Redis扣除再发放，各进程合计不会超过限额，只会因其他进程持有的令牌略早触发限流。
+    Redis被拒绝后在Retry-After之前直接拒绝。Redis不可用时放行。
+    """
+    
+    def __init__(self, max_entries: int, lease_seconds: float):
+        self._leases: "OrderedDict[Tuple[str, str], Lease]" = OrderedDict()
+        self._max_entries = max_entries
+        self._lease_seconds = lease_seconds
+        self._script = None
+    
+    async def _acquire(self, rule: RateLimitRule, subject: str, requested: int, refund: int):
+        if self._script is None:
+            self._script = cache.get_async_redis().register_script(TOKEN_BUCKET_SCRIPT)
+        granted, tokens, retry_after, reset = await self._script(
+            keys=[f"rl:{rule.name}:{subject}"],
+            args=[rule.limit, rule.rate, requested, refund]
+        )
+        return int(granted), float(tokens), float(retry_after), float(reset)
+    
+    def _store(self, key: Tuple[str, str], lease: Lease):
+        self._leases[key] = lease
+        self._leases.move_to_end(key)
+        while len(self._leases) > self._max_entries:
+            self._leases.popitem(last=False)
+    
+    async def check(self, rule: RateLimitRule, subject: str) -> Decision:
+        key = (rule.name, subject)
+        now = time.monotonic()
+        lease = self._leases.get(key)
+    
+        if lease is not None:
+            if lease.denied_until > now:
+                metrics.RATE_LIMIT_DECISIONS.labels(rule.name, "rejected_local").inc()
+                retry_after = math.ceil(lease.denied_until - now)
+                return Decision(False, rule.limit, 0, math.ceil(max(lease.reset - now, 0)), retry_after)
+            if lease.tokens > 0 and lease.expires > now:
+                lease.tokens -= 1
+                metrics.RATE_LIMIT_DECISIONS.labels(rule.name, "allowed_local").inc()
+                return Decision(True, rule.limit, int(lease.remaining + lease.tokens), math.ceil(max(lease.reset - now, 0)), 0)
+    
+        refund = lease.tokens if lease is not None and lease.denied_until == 0 else 0
+        try:
+            granted, tokens, retry_after, reset = await self._acquire(rule, subject, rule.batch, refund)
+        except redis.RedisError as e:
+            metrics.RATE_LIMIT_DECISIONS.labels(rule.name, "redis_error").inc()
+            logger.warning(f"限流检查失败，放行请求: {e}")
+            return Decision(True, rule.limit, rule.limit, 0, 0)
+    
+        if granted == 0:
+            self._store(key, Lease(0, 0, 0, now + reset, denied_until=now + retry_after))
+            metrics.RATE_LIMIT_DECISIONS.labels(rule.name, "rejected").inc()
+            return Decision(False, rule.limit, 0, math.ceil(reset), math.ceil(retry_after))
+    
+        self._store(key, Lease(granted - 1, now + self._lease_seconds, tokens, now + reset))
+        metrics.RATE_LIMIT_DECISIONS.labels(rule.name, "allowed").inc()
+        return Decision(True, rule.limit, int(tokens + granted - 1), math.ceil(reset), 0)
+
+rate_limiter = RateLimiter(config.RATE_LIMIT_LOCAL_MAX_ENTRIES, config.RATE_LIMIT_LEASE_SECONDS)
+
+def _headers(decision: Decision) -> List[Tuple[bytes, bytes]]:
+    headers = [
+        (b"x-ratelimit-limit", str(decision.limit).encode("latin-1")),
+        (b"x-ratelimit-remaining", str(decision.remaining).encode("latin-1")),
+        # 额度完全恢复的Unix时间戳
+        (b"x-ratelimit-reset", str(int(time.time()) + decision.reset).encode("latin-1")),
+    ]
+    if not decision.allowed:
+        headers.append((b"retry-after", str(decision.retry_after).encode("latin-1")))
+    return headers
+
+class RateLimitMiddleware:
+    """
+    限流中间件（ASGI）
+    
+    按路由类别和调用方（API密钥、用户或客户端地址）限流，响应带X-RateLimit-Limit、
+    X-RateLimit-Remaining、X-RateLimit-Reset头，超出限额时返回429和Retry-After。
+    """
+    
+    def __init__(self, app, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.limiter = limiter
+    
+    async def __call__(self, scope, receive, send):
+        rule = classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+    
+        decision = await self.limiter.check(rule, identify(scope))
+        headers = _headers(decision)
+    
+        if not decision.allowed:
+            body = json.dumps({"detail": "请求过于频繁，请稍后重试"}, ensure_ascii=False).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                ] + headers,
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+    
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+    
+        await self.app(scope, receive, send_with_headers)
@@ -0,0 +1,26 @@
+from typing import Any
+
+import orjson
+from fastapi import responses
+from pydantic import BaseModel
+
+def _default(obj: Any):
+    """pydantic模型按字段浅转换为dict，嵌套的模型和列表由orjson继续处理"""
+    if isinstance(obj, BaseModel):
+        return dict(obj)
+    raise TypeError(f"无法序列化的类型: {type(obj).__name__}")
+
+def dumps(content: Any) -> bytes:
+    """序列化为JSON：datetime、UUID、Enum由orjson原生处理，pydantic模型通过_default展开"""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+class ORJSONResponse(responses.ORJSONResponse):
+    """
+    使用orjson的JSON响应，作为应用的默认响应类
+    
+    接口直接返回 ORJSONResponse(schemas.DataResponse[...](...)) 时，数据在构造信封时已按
+    response_model校验，FastAPI不再经过response_model校验和jsonable_encoder的逐层遍历。
+    """
+    
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,20 +1,42 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+import asyncio
+import hashlib
+import hmac
+import secrets
+import string
+import threading
+from typing import Optional, Tuple
+import uuid
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, Select
 
-from core import config
-from database import get_db
+from core import config, metrics
+from core.auth_cache import LocalCache, auth_cache
+from database import get_async_db, open_async_read_session
 from models import models, schemas
+from services import counter_service
 
 # 密码上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# OAuth2密码Bearer
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
+# OAuth2密码Bearer，未携带时由get_current_user返回401（也可能使用X-API-Key认证）
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token", auto_error=False)
+# API密钥：X-API-Key请求头，或 Authorization: Bearer <API密钥>
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+# API密钥格式：pk_<公开前缀>_<密钥>，前缀用于按索引查找记录，密钥以HMAC-SHA256存储
+API_KEY_SCHEME = "pk"
+API_KEY_PREFIX_LENGTH = 12
+API_KEY_SECRET_LENGTH = 32
+_API_KEY_ALPHABET = string.ascii_letters + string.digits
+
+# 记录过最后使用时间的API密钥，间隔内不重复记录
+_api_key_uses = LocalCache(config.AUTH_CACHE_MAX_SIZE, config.API_KEY_LAST_USED_INTERVAL_SECONDS)
 
 def verify_password(plain_password, hashed_password):
     """验证密码"""
@@ -24,6 +46,57 @@ def get_password_hash(password):
     """获取密码哈希"""
     return pwd_context.hash(password)
 
+# bcrypt计算（约250ms）在独立的有界线程池中执行，计算期间释放GIL，不阻塞事件循环
+_password_hash_executor = ThreadPoolExecutor(
+    max_workers=config.PASSWORD_HASH_WORKERS, 
+    thread_name_prefix="password-hash"
+)
+# 排队和执行中的计算数上限，超出时直接拒绝，登录高峰时请求不会无限堆积
+_password_hash_slots = threading.BoundedSemaphore(config.PASSWORD_HASH_MAX_PENDING)
+
+async def _run_password_hash(func, *args):
+    """在密码哈希线程池中执行，名额在计算结束时释放（请求取消后计算仍会完成）"""
+    if not _password_hash_slots.acquire(blocking=False):
+        metrics.PASSWORD_HASH_REJECTED.inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="请求过多，请稍后重试",
+            headers={"Retry-After": str(config.PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+        )
+    future = _password_hash_executor.submit(func, *args)
+    future.add_done_callback(lambda _: _password_hash_slots.release())
+    return await asyncio.wrap_future(future)
+
+async def verify_password_async(plain_password, hashed_password):
+    """验证密码（异步，在密码哈希线程池中执行）"""
+    return await _run_password_hash(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    """获取密码哈希（异步，在密码哈希线程池中执行）"""
+    return await _run_password_hash(get_password_hash, password)
+
+def _random_string(length: int) -> str:
+    return "".join(secrets.choice(_API_KEY_ALPHABET) for _ in range(length))
+
+def hash_api_key_secret(secret: str) -> str:
+    """计算API密钥的密钥部分的HMAC-SHA256（十六进制）"""
+    return hmac.new(config.API_KEY_HMAC_SECRET.encode("utf-8"), secret.encode("utf-8"), hashlib.sha256).hexdigest()
+
+def generate_api_key() -> Tuple[str, str, str]:
+    """生成API密钥，返回(完整密钥, 前缀, 密钥哈希)"""
+    prefix = _random_string(API_KEY_PREFIX_LENGTH)
+    secret = _random_string(API_KEY_SECRET_LENGTH)
+    return f"{API_KEY_SCHEME}_{prefix}_{secret}", prefix, hash_api_key_secret(secret)
+
+def parse_api_key(value: str) -> Optional[Tuple[str, str]]:
+    """拆分API密钥，返回(前缀, 密钥)，格式不符时返回None"""
+    parts = value.split("_")
+    if len(parts) != 3 or parts[0] != API_KEY_SCHEME:
+        return None
+    if len(parts[1]) != API_KEY_PREFIX_LENGTH or len(parts[2]) != API_KEY_SECRET_LENGTH:
+        return None
+    return parts[1], parts[2]
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建访问令牌"""
     to_encode = data.copy()
@@ -35,28 +108,123 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, config.SECRET_KEY, algorithm=config.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    """获取当前用户"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="无法验证凭据",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def _api_key_statement(key_prefix: str) -> Select:
+    """按前缀查询API密钥（唯一索引）"""
+    return select(models.APIKey).where(models.APIKey.key_prefix == key_prefix)
+
+def _api_key_valid(api_key: models.APIKey, secret: str) -> bool:
+    """以常量时间比较密钥的HMAC，并检查是否停用、过期"""
+    if not hmac.compare_digest(api_key.key_hash, hash_api_key_secret(secret)):
+        return False
+    return api_key.is_active and not (api_key.expires_at and api_key.expires_at < datetime.utcnow())
+
+def verified_api_key_prefix(value: str) -> Optional[str]:
+    """
+    API密钥已缓存且验证通过时返回前缀，否则返回None
+    
+    只读进程内认证缓存，不查询数据库；密钥首次使用（或缓存未启用）时返回None。
+    """
+    parsed = parse_api_key(value)
+    if parsed is None:
+        return None
+    key_prefix, secret = parsed
+    api_key = auth_cache.peek_api_key(key_prefix)
+    if api_key is None or not _api_key_valid(api_key, secret):
+        return None
+    return key_prefix
+
+async def _resolve_api_key(db: AsyncSession, value: str) -> Optional[uuid.UUID]:
+    """
+    验证API密钥，返回所属用户id，无效、已停用或已过期时返回None
+    
+    按前缀查找记录（稳定状态下由进程内缓存命中），再以常量时间比较密钥的HMAC。
+    """
+    parsed = parse_api_key(value)
+    if parsed is None:
+        return None
+    key_prefix, secret = parsed
+    
+    api_key = auth_cache.get_api_key(key_prefix)
+    if api_key is None:
+        generation = auth_cache.api_keys.generation()
+        api_key = (await db.scalars(_api_key_statement(key_prefix))).first()
+        if api_key is None:
+            return None
+        auth_cache.put_api_key(api_key, generation)
+    
+    if not _api_key_valid(api_key, secret):
+        return None
+    
+    # 最后使用时间经写后缓冲定期落库，同一密钥在间隔内只记录一次
+    if _api_key_uses.get(api_key.id) is None:
+        _api_key_uses.put(api_key.id, {})
+        await counter_service.record_api_key_use_async(api_key.id)
+    
+    return api_key.user_id
+
+def decode_access_token(token: str) -> Optional[uuid.UUID]:
+    """解析JWT访问令牌，返回用户id，无效时返回None"""
     try:
         payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            return None
         token_data = schemas.TokenData(user_id=user_id)
-    except JWTError:
+        return uuid.UUID(token_data.user_id)
+    except (JWTError, ValueError):
+        return None
+
+async def get_current_user(
+    request: Request, 
+    db: AsyncSession = Depends(get_async_db), 
+    token: Optional[str] = Depends(oauth2_scheme), 
+    api_key: Optional[str] = Depends(api_key_header)
+):
+    """获取当前用户，支持JWT访问令牌和API密钥"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="无法验证凭据",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    if api_key:
+        user_uuid = await _resolve_api_key(db, api_key)
+    elif token and token.startswith(f"{API_KEY_SCHEME}_"):
+        user_uuid = await _resolve_api_key(db, token)
+    elif token:
+        user_uuid = decode_access_token(token)
+    else:
+        user_uuid = None
+    if user_uuid is None:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.id == token_data.user_id).first()
+    
+    # 稳定状态下由进程内缓存命中，不查询数据库
+    user = auth_cache.get_user(user_uuid)
     if user is None:
-        raise credentials_exception
+        generation = auth_cache.users.generation()
+        user = await db.get(models.User, user_uuid)
+        if user is None:
+            raise credentials_exception
+        auth_cache.put_user(user, generation)
+    # 请求内的写入提交后据此标记用户，之后的只读查询暂时发往主库
+    db.info["user_id"] = user.id
+    # 供审计中间件记录操作用户
+    request.state.user_id = user.id
     return user
 
-def get_current_active_user(current_user: schemas.User = Depends(get_current_user)):
+async def get_current_active_user(current_user: schemas.User = Depends(get_current_user)):
     """获取当前活跃用户"""
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="用户未激活")
-    return current_user
\ No newline at end of file
+    return current_user
+
+async def get_async_read_db(current_user: models.User = Depends(get_current_active_user)):
+    """
+    获取只读数据库会话，供列表、检索等只读接口使用
+    
+    配置了只读副本时查询发往延迟达标的副本；当前用户刚写入过时仍发往主库，保证读到自己的写入。
+    """
+    db = await open_async_read_session(current_user.id)
+    try:
+        yield db
+    finally:
+        await db.close()
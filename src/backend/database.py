@@ -1,9 +1,24 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+import asyncio
+import itertools
+import logging
+import math
 import os
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+import redis
 from dotenv import load_dotenv
 
+from core import cache, metrics
+
+logger = logging.getLogger(__name__)
+
 # 加载环境变量
 load_dotenv()
 
@@ -16,12 +31,246 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "postgres")
 
 # 构建数据库URL
 SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# 连接池配置（每个进程一个连接池，总连接数 = 进程数 × (POOL_SIZE + MAX_OVERFLOW)）
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "True").lower() in ("true", "1", "t")
+# 通过PgBouncer事务池模式连接时开启：禁用asyncpg预编译语句缓存并使用唯一语句名
+DB_PGBOUNCER_TRANSACTION_MODE = os.getenv("DB_PGBOUNCER_TRANSACTION_MODE", "False").lower() in ("true", "1", "t")
+
+# 只读副本（逗号分隔的host或host:port，库名和账号与主库相同），为空时全部查询发往主库
+DB_REPLICA_HOSTS = [host.strip() for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host.strip()]
+# 复制延迟超过该值的副本不接收查询
+DB_REPLICA_MAX_LAG_SECONDS = float(os.getenv("DB_REPLICA_MAX_LAG_SECONDS", "5"))
+# 每个进程检查副本延迟的间隔
+DB_REPLICA_LAG_CHECK_SECONDS = float(os.getenv("DB_REPLICA_LAG_CHECK_SECONDS", "5"))
+# 副本连接超时，副本宕机时尽快改用其他副本或主库
+DB_REPLICA_CONNECT_TIMEOUT = int(os.getenv("DB_REPLICA_CONNECT_TIMEOUT", "2"))
+
+class _InstrumentedPoolMixin:
+    """记录连接获取等待时间和超时次数，指标标签取自pool_logging_name"""
+    
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.DB_POOL_CHECKOUT_TIMEOUTS.labels(self.logging_name).inc()
+            raise
+        finally:
+            metrics.DB_POOL_CHECKOUT_WAIT.labels(self.logging_name).observe(time.perf_counter() - started)
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncAdaptedQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+def _pool_options(name: str) -> dict:
+    """构建连接池参数"""
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_logging_name": name,
+    }
+
+def _async_connect_args() -> dict:
+    """构建asyncpg连接参数"""
+    if not DB_PGBOUNCER_TRANSACTION_MODE:
+        return {}
+    # 事务池模式下同一会话的语句可能落到不同的服务端连接，预编译语句不能复用
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+
+def _replica_host_port(host: str) -> Tuple[str, str]:
+    """解析副本地址，未指定端口时使用主库端口"""
+    if ":" in host:
+        host, port = host.rsplit(":", 1)
+        return host, port
+    return host, DB_PORT
 
 # 创建数据库引擎
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    **_pool_options("sync")
+)
+
+# 创建异步数据库引擎（供API路由使用，查询不阻塞事件循环）
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    poolclass=InstrumentedAsyncAdaptedQueuePool,
+    connect_args=_async_connect_args(),
+    **_pool_options("async")
+)
+
+metrics.pool_collector.register("sync", engine)
+metrics.pool_collector.register("async", async_engine)
+
+def _create_replica_engines(index: int, replica_host: str):
+    """创建连接同一副本的同步、异步引擎"""
+    host, port = _replica_host_port(replica_host)
+    sync_engine = create_engine(
+        f"postgresql://{DB_USER}:{DB_PASSWORD}@{host}:{port}/{DB_NAME}",
+        poolclass=InstrumentedQueuePool,
+        connect_args={"connect_timeout": DB_REPLICA_CONNECT_TIMEOUT},
+        **_pool_options(f"replica{index}_sync")
+    )
+    replica_async_engine = create_async_engine(
+        f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{host}:{port}/{DB_NAME}",
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        connect_args={**_async_connect_args(), "timeout": DB_REPLICA_CONNECT_TIMEOUT},
+        **_pool_options(f"replica{index}_async")
+    )
+    metrics.pool_collector.register(f"replica{index}_sync", sync_engine)
+    metrics.pool_collector.register(f"replica{index}_async", replica_async_engine)
+    return sync_engine, replica_async_engine
+
+# 只读副本引擎，同一下标的同步、异步引擎连接同一副本
+_replicas = [_create_replica_engines(index, host) for index, host in enumerate(DB_REPLICA_HOSTS)]
+replica_engines: List[Engine] = [sync_engine for sync_engine, _ in _replicas]
+async_replica_engines = [replica_async_engine for _, replica_async_engine in _replicas]
+
+# 副本回放进度追上接收进度时没有延迟，否则以最后回放事务的时间计算延迟；在主库上执行时为0
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+# 副本下标 -> (检查时间, 延迟秒数)，延迟为None表示副本不可用；同步、异步引擎共用
+_replica_lag: Dict[int, Tuple[float, Optional[float]]] = {}
+_replica_counter = itertools.count()
+
+# 用户写入后在该时间内的只读查询发往主库：副本延迟不超过DB_REPLICA_MAX_LAG_SECONDS，
+# 但延迟检查结果最多缓存DB_REPLICA_LAG_CHECK_SECONDS
+READ_YOUR_WRITES_SECONDS = math.ceil(DB_REPLICA_MAX_LAG_SECONDS + DB_REPLICA_LAG_CHECK_SECONDS)
+
+class RoutingSession(Session):
+    """
+    读写分离会话
+    
+    info["replica"]指定了副本引擎时所有语句发往该副本（只读会话），否则发往主库。
+    副本在创建会话时选定，同一请求内的查询落在同一副本上，读到的数据是一致的。
+    """
+    
+    def get_bind(self, mapper=None, **kw):
+        replica = self.info.get("replica")
+        if replica is not None:
+            return replica
+        return super().get_bind(mapper, **kw)
+
+def _recent_write_key(user_id: uuid.UUID) -> str:
+    return f"recent_write:{user_id}"
+
+# 写入标记的后台任务，保留引用避免任务完成前被回收
+_pending_marks = set()
+
+def mark_recent_write(user_id: uuid.UUID):
+    """
+    记录用户刚刚写入，之后一段时间内该用户的只读查询发往主库
+    
+    异步会话提交时在事件循环线程内调用，由异步客户端在后台写入，不阻塞事件循环；
+    没有运行中的事件循环时（同步会话）直接写入。
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        cache.set_json(_recent_write_key(user_id), 1, READ_YOUR_WRITES_SECONDS)
+        return
+    task = loop.create_task(cache.set_json_async(_recent_write_key(user_id), 1, READ_YOUR_WRITES_SECONDS))
+    _pending_marks.add(task)
+    task.add_done_callback(_pending_marks.discard)
+
+async def has_recent_write_async(user_id: uuid.UUID) -> bool:
+    """用户最近是否写入过，Redis不可用时按写入过处理，宁可多读主库"""
+    try:
+        return bool(await cache.get_async_redis().exists(_recent_write_key(user_id)))
+    except redis.RedisError as e:
+        logger.warning(f"读取写入标记失败 {user_id}: {e}")
+        return True
+
+@event.listens_for(RoutingSession, "after_flush")
+def _track_flush(session, flush_context):
+    session.info["wrote"] = True
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _track_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+@event.listens_for(RoutingSession, "after_commit")
+def _mark_write_on_commit(session):
+    # user_id由security.get_current_user写入请求的会话
+    if session.info.pop("wrote", False) and session.info.get("user_id"):
+        mark_recent_write(session.info["user_id"])
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _reset_write_on_rollback(session):
+    session.info.pop("wrote", None)
+
+def _lag_check_due(index: int, now: float) -> bool:
+    checked = _replica_lag.get(index)
+    return checked is None or now - checked[0] >= DB_REPLICA_LAG_CHECK_SECONDS
+
+def _record_lag(index: int, lag: Optional[float]):
+    """记录副本延迟，不可用时记为None"""
+    _replica_lag[index] = (time.monotonic(), lag)
+    if lag is not None:
+        metrics.DB_REPLICA_LAG.labels(f"replica{index}").set(lag)
+
+def _pick_replica() -> Optional[int]:
+    """在延迟达标的副本中轮询选择，没有可用副本时返回None"""
+    healthy = [
+        index for index, (_, lag) in sorted(_replica_lag.items())
+        if lag is not None and lag <= DB_REPLICA_MAX_LAG_SECONDS
+    ]
+    if not healthy:
+        return None
+    return healthy[next(_replica_counter) % len(healthy)]
+
+async def choose_replica_async() -> Optional[Engine]:
+    """
+    选择延迟达标的副本，返回异步引擎对应的同步引擎，供RoutingSession使用
+    
+    延迟检查结果按DB_REPLICA_LAG_CHECK_SECONDS缓存。
+    """
+    now = time.monotonic()
+    for index, replica in enumerate(async_replica_engines):
+        if not _lag_check_due(index, now):
+            continue
+        # 检查期间其他协程沿用上次的结果，避免同时发起检查
+        _replica_lag[index] = (now, _replica_lag.get(index, (now, None))[1])
+        try:
+            async with replica.connect() as connection:
+                _record_lag(index, float(await connection.scalar(REPLICA_LAG_SQL)))
+        except (exc.DBAPIError, exc.TimeoutError, asyncio.TimeoutError, OSError) as e:
+            logger.warning(f"副本replica{index}不可用: {e}")
+            _record_lag(index, None)
+    
+    index = _pick_replica()
+    return async_replica_engines[index].sync_engine if index is not None else None
 
 # 创建会话工厂
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+# 提交后不过期对象，避免在异步上下文中隐式刷新属性
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, 
+    sync_session_class=RoutingSession, 
+    autoflush=False, 
+    expire_on_commit=False
+)
 
 # 创建基类
 Base = declarative_base()
@@ -34,8 +283,43 @@ def get_db():
     finally:
         db.close()
 
-# 初始化数据库
-def init_db():
-    # 导入所有模型以确保它们在创建表之前已定义
-    from models import models
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+# 获取异步数据库会话
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def _route_read_async(user_id: uuid.UUID) -> bool:
+    """只读查询是否可以发往副本，否则记录发往主库的原因"""
+    if not replica_engines:
+        return False
+    if await has_recent_write_async(user_id):
+        metrics.DB_READ_ROUTES.labels("primary_recent_write").inc()
+        return False
+    return True
+
+def _record_route(replica: Optional[Engine]):
+    metrics.DB_READ_ROUTES.labels("replica" if replica is not None else "primary_no_replica").inc()
+
+# 创建只读会话（异步），由调用方关闭：用户最近没有写入时发往延迟达标的副本，否则发往主库
+async def open_async_read_session(user_id: uuid.UUID) -> AsyncSession:
+    db = AsyncSessionLocal()
+    if await _route_read_async(user_id):
+        db.info["replica"] = await choose_replica_async()
+        _record_route(db.info["replica"])
+    return db
+
+# 检查数据库结构版本（表结构由Alembic迁移管理：alembic upgrade head）
+def check_db_revision() -> bool:
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    alembic_config = Config(os.path.join(base_dir, "alembic.ini"))
+    alembic_config.set_main_option("script_location", os.path.join(base_dir, "migrations"))
+    heads = set(ScriptDirectory.from_config(alembic_config).get_heads())
+    
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    
+    return current == heads
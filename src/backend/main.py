@@ -1,15 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 import logging
 
-from database import get_db, init_db
+from database import get_db, check_db_revision
 from models import models, schemas
-from api import auth, users, papers, analysis, reports
-from core import config
+from api import auth, users, papers, analysis, reports, shares
+from core import config, metrics
+from core.audit import AuditMiddleware, audit_writer
+from core.compression import CompressionMiddleware
+from core.auth_cache import auth_cache
+from core.rate_limit import RateLimitMiddleware
+from core.responses import ORJSONResponse
+from services.quota_service import QuotaExceededError
 
 # 配置日志
 logging.basicConfig(
@@ -23,8 +30,18 @@ app = FastAPI(
     title="Paperal API",
     description="API for Paperal - 学术论文商业化分析平台",
     version="0.1.0",
+    # 默认使用orjson序列化响应
+    default_response_class=ORJSONResponse,
 )
 
+# 响应压缩：放在最内层，只处理接口返回的响应体
+if config.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# 限流：放在CORS之内，429响应同样带CORS头
+if config.RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -34,24 +51,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 初始化数据库
+# 审计日志：请求结束后放入进程内缓冲区，由后台线程批量写入
+if config.AUDIT_LOG_ENABLED:
+    app.add_middleware(AuditMiddleware)
+
+# 检查数据库结构版本
 @app.on_event("startup")
 async def startup_event():
-    logger.info("初始化数据库...")
-    init_db()
-    logger.info("数据库初始化完成")
+    if not check_db_revision():
+        logger.warning("数据库结构不是最新版本，请执行 alembic upgrade head")
+    if config.AUDIT_LOG_ENABLED:
+        audit_writer.start()
+    if config.AUTH_CACHE_TTL_SECONDS > 0:
+        auth_cache.start()
+
+# 写入缓冲区中剩余的审计事件
+@app.on_event("shutdown")
+def shutdown_event():
+    audit_writer.stop()
+    auth_cache.stop()
+
+# 超出月度配额
+@app.exception_handler(QuotaExceededError)
+async def quota_exceeded_handler(request: Request, exc: QuotaExceededError):
+    return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": str(exc)})
 
 # 健康检查端点
 @app.get("/health", tags=["健康检查"])
 def health_check():
     return {"status": "healthy"}
 
+# Prometheus指标（含数据库连接池状态），需以METRICS_TOKEN访问，未配置时不暴露
+if config.METRICS_TOKEN:
+    app.mount("/metrics", metrics.protected_asgi_app(config.METRICS_TOKEN))
+
 # 包含路由器
 app.include_router(auth.router, prefix="/api/auth", tags=["认证"])
 app.include_router(users.router, prefix="/api/users", tags=["用户"])
 app.include_router(papers.router, prefix="/api/papers", tags=["论文"])
 app.include_router(analysis.router, prefix="/api/analysis", tags=["分析"])
 app.include_router(reports.router, prefix="/api/reports", tags=["报告"])
+app.include_router(shares.router, prefix="/api/shares", tags=["分享"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,50 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from database import Base, SQLALCHEMY_DATABASE_URL
+from models import models  # noqa: F401  注册所有模型
+
+# Alembic配置对象
+config = context.config
+
+# 配置日志
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# 自动生成迁移时对比的模型元数据
+target_metadata = Base.metadata
+
+def run_migrations_offline() -> None:
+    """离线模式：只输出SQL，不连接数据库"""
+    context.configure(
+        url=SQLALCHEMY_DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        compare_type=True,
+    )
+    
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    """在线模式：连接数据库执行迁移"""
+    # 迁移使用独立的一次性连接，不占用应用连接池
+    connectable = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=pool.NullPool)
+    
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            compare_type=True,
+        )
+    
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,201 @@
+"""initial schema
+
+与此前启动时create_all生成的表结构一致。已有数据库执行
+`alembic stamp 0001` 标记为此版本后，再 `alembic upgrade head`。
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('organization', sa.String(length=255), nullable=True),
+        sa.Column('role', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('last_login_at', sa.DateTime(), nullable=True),
+        sa.Column('profile_data', sa.JSON(), nullable=True),
+        sa.Column('settings', sa.JSON(), nullable=True),
+        sa.Column('api_key', sa.String(length=255), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    op.create_table(
+        'subscriptions',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('plan_type', sa.String(length=50), nullable=False),
+        sa.Column('start_date', sa.DateTime(), nullable=False),
+        sa.Column('end_date', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('payment_info', sa.JSON(), nullable=True),
+        sa.Column('features', sa.JSON(), nullable=True),
+        sa.Column('usage_limits', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'papers',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('title', sa.String(length=500), nullable=True),
+        sa.Column('authors', sa.JSON(), nullable=True),
+        sa.Column('upload_date', sa.DateTime(), nullable=True),
+        sa.Column('file_path', sa.String(length=500), nullable=False),
+        sa.Column('file_size', sa.Integer(), nullable=True),
+        sa.Column('file_hash', sa.String(length=255), nullable=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('metadata', sa.JSON(), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=True),
+        sa.Column('tags', postgresql.ARRAY(sa.String()), nullable=True),
+        sa.Column('doi', sa.String(length=255), nullable=True),
+        sa.Column('publication_info', sa.JSON(), nullable=True),
+        sa.Column('extracted_text', sa.Text(), nullable=True),
+        sa.Column('embedding_id', sa.String(length=255), nullable=True),
+        sa.Column('is_public', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'analysis',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('paper_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('result_data', sa.JSON(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('analysis_type', sa.String(length=50), nullable=True),
+        sa.Column('parameters', sa.JSON(), nullable=True),
+        sa.Column('feedback', sa.JSON(), nullable=True),
+        sa.Column('processing_time', sa.Integer(), nullable=True),
+        sa.Column('version', sa.String(length=50), nullable=True),
+        sa.ForeignKeyConstraint(['paper_id'], ['papers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'reports',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('analysis_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('format', sa.String(length=50), nullable=True),
+        sa.Column('status', sa.String(length=50), nullable=True),
+        sa.Column('file_path', sa.String(length=500), nullable=True),
+        sa.Column('shared_with', sa.JSON(), nullable=True),
+        sa.Column('is_public', sa.Boolean(), nullable=True),
+        sa.Column('access_count', sa.Integer(), nullable=True),
+        sa.Column('template_id', sa.String(length=255), nullable=True),
+        sa.Column('custom_sections', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['analysis_id'], ['analysis.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'share_links',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('code', sa.String(length=32), nullable=False),
+        sa.Column('report_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_by', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('access_type', sa.String(length=50), nullable=False),
+        sa.Column('recipients', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['report_id'], ['reports.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_share_links_code', 'share_links', ['code'], unique=True)
+    op.create_index('ix_share_links_report_id', 'share_links', ['report_id'], unique=False)
+
+    op.create_table(
+        'comments',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('report_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('parent_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('is_resolved', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['parent_id'], ['comments.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['report_id'], ['reports.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_comments_report_id_created_at', 'comments', ['report_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_comments_parent_id_created_at', 'comments', ['parent_id', 'created_at'], unique=False)
+
+    op.create_table(
+        'api_keys',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('key_name', sa.String(length=255), nullable=False),
+        sa.Column('key_hash', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(), nullable=True),
+        sa.Column('permissions', sa.JSON(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_table(
+        'audit_logs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('action', sa.String(length=255), nullable=False),
+        sa.Column('entity_type', sa.String(length=255), nullable=False),
+        sa.Column('entity_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('ip_address', sa.String(length=50), nullable=True),
+        sa.Column('user_agent', sa.Text(), nullable=True),
+        sa.Column('details', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('audit_logs')
+    op.drop_table('api_keys')
+    op.drop_index('ix_comments_parent_id_created_at', table_name='comments')
+    op.drop_index('ix_comments_report_id_created_at', table_name='comments')
+    op.drop_table('comments')
+    op.drop_index('ix_share_links_report_id', table_name='share_links')
+    op.drop_index('ix_share_links_code', table_name='share_links')
+    op.drop_table('share_links')
+    op.drop_table('reports')
+    op.drop_table('analysis')
+    op.drop_table('papers')
+    op.drop_table('subscriptions')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,44 @@
+"""list query indexes
+
+为列表和归属查询添加复合索引。使用CREATE INDEX CONCURRENTLY，
+建索引期间不阻塞写入。
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# (索引名, 表名, 列, 额外参数)
+INDEXES = [
+    ('ix_papers_user_id_upload_date', 'papers', ['user_id', 'upload_date'], {}),
+    ('ix_papers_user_id_status_upload_date', 'papers', ['user_id', 'status', 'upload_date'], {}),
+    ('ix_papers_tags', 'papers', ['tags'], {'postgresql_using': 'gin'}),
+    ('ix_analysis_paper_id_created_at', 'analysis', ['paper_id', 'created_at'], {}),
+    ('ix_reports_analysis_id_created_at', 'reports', ['analysis_id', 'created_at'], {}),
+    ('ix_subscriptions_user_id_start_date', 'subscriptions', ['user_id', 'start_date'], {}),
+    ('ix_api_keys_user_id', 'api_keys', ['user_id'], {}),
+    ('ix_audit_logs_user_id_timestamp', 'audit_logs', ['user_id', 'timestamp'], {}),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY不能在事务中执行
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, **kwargs)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
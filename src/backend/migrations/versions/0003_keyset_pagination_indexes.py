@@ -0,0 +1,45 @@
+"""keyset pagination indexes
+
+列表查询改为按(排序键, id)游标分页，索引追加id列，使行值比较和排序
+都能直接由索引完成。先建新索引再删除旧索引。
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# (新索引名, 旧索引名, 表名, 新索引列)
+INDEXES = [
+    ('ix_papers_user_id_upload_date_id', 'ix_papers_user_id_upload_date', 'papers',
+     ['user_id', 'upload_date', 'id']),
+    ('ix_papers_user_id_status_upload_date_id', 'ix_papers_user_id_status_upload_date', 'papers',
+     ['user_id', 'status', 'upload_date', 'id']),
+    ('ix_analysis_paper_id_created_at_id', 'ix_analysis_paper_id_created_at', 'analysis',
+     ['paper_id', 'created_at', 'id']),
+    ('ix_reports_analysis_id_created_at_id', 'ix_reports_analysis_id_created_at', 'reports',
+     ['analysis_id', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, old_name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+            op.drop_index(old_name, table_name=table, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, old_name, table, columns in reversed(INDEXES):
+            op.create_index(old_name, table, columns[:-1], postgresql_concurrently=True)
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,77 @@
+"""jsonb columns
+
+论文、分析、报告的JSON列改为JSONB，并为标签、作者过滤和技术可行性评分
+过滤建立索引。标签、作者索引包含user_id列，依赖btree_gin扩展。
+
+修改列类型会重写papers、analysis、reports三张表并持有排他锁，
+数据量大时应在维护窗口执行。
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# (表名, 列名)
+COLUMNS = [
+    ('papers', 'authors'),
+    ('papers', 'metadata'),
+    ('papers', 'publication_info'),
+    ('analysis', 'result_data'),
+    ('analysis', 'parameters'),
+    ('analysis', 'feedback'),
+    ('reports', 'shared_with'),
+    ('reports', 'custom_sections'),
+]
+
+# (索引名, 表名, 列, 额外参数)
+INDEXES = [
+    ('ix_papers_user_id_tags', 'papers', ['user_id', 'tags'], {'postgresql_using': 'gin'}),
+    ('ix_papers_user_id_authors', 'papers', ['user_id', 'authors'],
+     {'postgresql_using': 'gin', 'postgresql_ops': {'authors': 'jsonb_path_ops'}}),
+    ('ix_analysis_technical_feasibility_score', 'analysis',
+     [sa.text("((result_data -> 'technical_feasibility') -> 'score')")], {}),
+]
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+
+    for table, column in COLUMNS:
+        op.alter_column(
+            table, column,
+            type_=postgresql.JSONB(),
+            existing_type=sa.JSON(),
+            postgresql_using=f'{column}::jsonb'
+        )
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, **kwargs)
+        # 标签索引已由(user_id, tags)索引取代
+        op.drop_index('ix_papers_tags', table_name='papers', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_papers_tags', 'papers', ['tags'], postgresql_using='gin', postgresql_concurrently=True)
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+    for table, column in reversed(COLUMNS):
+        op.alter_column(
+            table, column,
+            type_=sa.JSON(),
+            existing_type=postgresql.JSONB(),
+            postgresql_using=f'{column}::json'
+        )
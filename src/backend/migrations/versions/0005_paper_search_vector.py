@@ -0,0 +1,69 @@
+"""paper search vector
+
+为论文添加全文检索向量列，由触发器在写入标题、作者、标签、元数据（摘要）
+或正文时增量更新，权重为 标题(A) > 作者、标签(B) > 摘要(C) > 正文(D)。
+文本检索配置须与paper_service.SEARCH_CONFIG一致。
+
+回填已有论文时会更新papers表的每一行，数据量大时应在维护窗口执行。
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# 正文超长时只索引开头部分，避免超出tsvector的1MB上限
+SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION papers_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(jsonb_to_tsvector('english', coalesce(NEW.authors, '[]'::jsonb), '["string"]'), 'B') ||
+        setweight(to_tsvector('english', coalesce(array_to_string(NEW.tags, ' '), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.metadata ->> 'abstract', '')), 'C') ||
+        setweight(to_tsvector('english', left(coalesce(NEW.extracted_text, ''), 500000)), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# 只有参与检索的列变化时才重新计算
+SEARCH_VECTOR_TRIGGER = """
+CREATE TRIGGER papers_search_vector_update
+BEFORE INSERT OR UPDATE OF title, authors, tags, metadata, extracted_text ON papers
+FOR EACH ROW EXECUTE FUNCTION papers_search_vector_update()
+"""
+
+
+def upgrade() -> None:
+    op.add_column('papers', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.execute(SEARCH_VECTOR_FUNCTION)
+    op.execute(SEARCH_VECTOR_TRIGGER)
+
+    # 通过触发器回填已有论文
+    op.execute('UPDATE papers SET title = title')
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_papers_user_id_search_vector', 'papers', ['user_id', 'search_vector'],
+            postgresql_using='gin', postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_papers_user_id_search_vector', table_name='papers', postgresql_concurrently=True)
+
+    op.execute('DROP TRIGGER IF EXISTS papers_search_vector_update ON papers')
+    op.execute('DROP FUNCTION IF EXISTS papers_search_vector_update()')
+    op.drop_column('papers', 'search_vector')
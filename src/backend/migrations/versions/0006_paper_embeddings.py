@@ -0,0 +1,49 @@
+"""paper embeddings
+
+为论文添加句向量列和HNSW近邻索引（pgvector >= 0.5.0），用于相似论文
+和语义检索。向量由Celery任务embed_pending_papers在后台补齐。
+向量维度须与配置EMBEDDING_DIM一致，更换不同维度的模型需新建迁移。
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from pgvector.sqlalchemy import Vector
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+EMBEDDING_DIM = 384
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS vector')
+    op.add_column('papers', sa.Column('embedding', Vector(EMBEDDING_DIM), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_papers_embedding', 'papers', ['embedding'],
+            postgresql_using='hnsw',
+            postgresql_ops={'embedding': 'vector_cosine_ops'},
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_papers_embedding_pending', 'papers', ['id'],
+            postgresql_where=sa.text('embedding IS NULL'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_papers_embedding_pending', table_name='papers', postgresql_concurrently=True)
+        op.drop_index('ix_papers_embedding', table_name='papers', postgresql_concurrently=True)
+
+    op.drop_column('papers', 'embedding')
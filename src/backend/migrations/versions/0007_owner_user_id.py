@@ -0,0 +1,72 @@
+"""owner user_id on analysis and reports
+
+为分析和报告冗余存储论文所有者user_id，列表查询和权限校验按user_id直接过滤，
+不再关联论文表（报告还需关联分析表）。新记录的user_id由服务层在创建时从
+论文或分析复制，论文不支持转移所有者，因此写入后无需同步。
+
+回填会更新analysis、reports两张表的每一行，设置NOT NULL需要全表扫描并持有
+排他锁，数据量大时应在维护窗口执行。
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# 先回填分析，报告再从分析复制
+BACKFILL_STATEMENTS = [
+    """
+    UPDATE analysis SET user_id = papers.user_id
+    FROM papers
+    WHERE analysis.paper_id = papers.id
+    """,
+    """
+    UPDATE reports SET user_id = analysis.user_id
+    FROM analysis
+    WHERE reports.analysis_id = analysis.id
+    """,
+]
+
+# (索引名, 表名, 列)
+INDEXES = [
+    ('ix_analysis_user_id_created_at_id', 'analysis', ['user_id', 'created_at', 'id']),
+    ('ix_reports_user_id_created_at_id', 'reports', ['user_id', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    for table in ('analysis', 'reports'):
+        op.add_column(table, sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True))
+
+    for statement in BACKFILL_STATEMENTS:
+        op.execute(statement)
+
+    for table in ('analysis', 'reports'):
+        op.alter_column(table, 'user_id', existing_type=postgresql.UUID(as_uuid=True), nullable=False)
+        op.create_foreign_key(
+            f'{table}_user_id_fkey', table, 'users', ['user_id'], ['id'], ondelete='CASCADE'
+        )
+
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+    for table in ('reports', 'analysis'):
+        op.drop_constraint(f'{table}_user_id_fkey', table, type_='foreignkey')
+        op.drop_column(table, 'user_id')
@@ -0,0 +1,84 @@
+"""partition audit_logs
+
+audit_logs改为按timestamp按月分区的表，并创建默认分区和当月起的几个月分区，
+之后的分区由maintain_audit_partitions任务创建、删除。主键改为(id, timestamp)，
+去掉user_id外键，details改为JSONB。
+
+此前应用没有写入过audit_logs，迁移直接重建该表，不迁移已有数据。
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+# 迁移时创建的月分区数（含当月），与AUDIT_LOG_PARTITIONS_AHEAD默认值一致
+INITIAL_MONTHS = 4
+
+
+def _next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.drop_table('audit_logs')
+
+    op.create_table(
+        'audit_logs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('action', sa.String(length=255), nullable=False),
+        sa.Column('entity_type', sa.String(length=255), nullable=False),
+        sa.Column('entity_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.Column('ip_address', sa.String(length=50), nullable=True),
+        sa.Column('user_agent', sa.Text(), nullable=True),
+        sa.Column('details', postgresql.JSONB(), nullable=True),
+        sa.PrimaryKeyConstraint('id', 'timestamp'),
+        postgresql_partition_by='RANGE (timestamp)'
+    )
+    op.create_index('ix_audit_logs_user_id_timestamp', 'audit_logs', ['user_id', 'timestamp'])
+
+    op.execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+
+    now = datetime.utcnow()
+    month = datetime(now.year, now.month, 1)
+    for _ in range(INITIAL_MONTHS):
+        end = _next_month(month)
+        op.execute(
+            f"CREATE TABLE audit_logs_{month:%Y%m} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+        month = end
+
+
+def downgrade() -> None:
+    # 删除父表时同时删除全部分区
+    op.drop_table('audit_logs')
+
+    op.create_table(
+        'audit_logs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('action', sa.String(length=255), nullable=False),
+        sa.Column('entity_type', sa.String(length=255), nullable=False),
+        sa.Column('entity_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('ip_address', sa.String(length=50), nullable=True),
+        sa.Column('user_agent', sa.Text(), nullable=True),
+        sa.Column('details', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_audit_logs_user_id_timestamp', 'audit_logs', ['user_id', 'timestamp'])
@@ -0,0 +1,97 @@
+"""archive cold payloads
+
+较早的分析原文（result_data中的raw_analysis）和论文正文（extracted_text）经zstd压缩后
+转存到存储后端，表中只保留存储路径（analysis.raw_archive_path、papers.text_archive_path），
+读取时由archive_service从存储补回。
+
+正文归档时extracted_text置空，检索向量触发器改为在这种情况下沿用原检索向量中的正文(D)词项，
+论文仍可按正文检索。
+
+降级只删除新列、恢复原触发器函数，不会把已归档的内容写回表中。
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+# 与0005相同，正文已归档（本次更新置空extracted_text并写入归档路径）时保留原正文词项
+SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION papers_search_vector_update() RETURNS trigger AS $$
+DECLARE
+    body tsvector;
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.extracted_text IS NULL AND NEW.text_archive_path IS NOT NULL THEN
+        body := ts_filter(coalesce(OLD.search_vector, ''::tsvector), '{d}');
+    ELSE
+        body := setweight(to_tsvector('english', left(coalesce(NEW.extracted_text, ''), 500000)), 'D');
+    END IF;
+
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(jsonb_to_tsvector('english', coalesce(NEW.authors, '[]'::jsonb), '["string"]'), 'B') ||
+        setweight(to_tsvector('english', coalesce(array_to_string(NEW.tags, ' '), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.metadata ->> 'abstract', '')), 'C') ||
+        body;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+PREVIOUS_SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION papers_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+        setweight(jsonb_to_tsvector('english', coalesce(NEW.authors, '[]'::jsonb), '["string"]'), 'B') ||
+        setweight(to_tsvector('english', coalesce(array_to_string(NEW.tags, ' '), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.metadata ->> 'abstract', '')), 'C') ||
+        setweight(to_tsvector('english', left(coalesce(NEW.extracted_text, ''), 500000)), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# (索引名, 表名, 列, 部分索引条件)，供归档任务查找待归档的行
+INDEXES = [
+    (
+        'ix_analysis_raw_archive_pending', 'analysis', ['completed_at'],
+        "raw_archive_path IS NULL AND result_data ? 'raw_analysis'"
+    ),
+    (
+        'ix_papers_text_archive_pending', 'papers', ['upload_date'],
+        'text_archive_path IS NULL AND extracted_text IS NOT NULL'
+    ),
+]
+
+
+def upgrade() -> None:
+    op.add_column('analysis', sa.Column('raw_archive_path', sa.String(length=500), nullable=True))
+    op.add_column('papers', sa.Column('text_archive_path', sa.String(length=500), nullable=True))
+    op.execute(SEARCH_VECTOR_FUNCTION)
+
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_where=sa.text(where), postgresql_concurrently=True
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+    op.execute(PREVIOUS_SEARCH_VECTOR_FUNCTION)
+    op.drop_column('papers', 'text_archive_path')
+    op.drop_column('analysis', 'raw_archive_path')
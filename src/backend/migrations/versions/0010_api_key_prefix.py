@@ -0,0 +1,38 @@
+"""api key prefix
+
+API密钥改为 pk_<前缀>_<密钥> 格式：前缀明文存储并建唯一索引，认证时按前缀查找记录，
+密钥部分以HMAC-SHA256存储（key_hash），不再使用bcrypt。
+
+此前签发的密钥没有前缀，无法用于认证，需由用户重新创建。
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('api_keys', sa.Column('key_prefix', sa.String(length=32), nullable=True))
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_api_keys_key_prefix', 'api_keys', ['key_prefix'],
+            unique=True, postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_api_keys_key_prefix', table_name='api_keys', postgresql_concurrently=True)
+
+    op.drop_column('api_keys', 'key_prefix')
@@ -0,0 +1,41 @@
+"""usage counters
+
+新增usage_counters表，保存用户的月度用量（论文上传、分析、报告、模型token数），
+由reconcile_usage任务从Redis中的实时计数定期写入。
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'usage_counters',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('period', sa.Date(), nullable=False),
+        sa.Column('papers', sa.Integer(), nullable=False),
+        sa.Column('analyses', sa.Integer(), nullable=False),
+        sa.Column('reports', sa.Integer(), nullable=False),
+        sa.Column('tokens', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'period')
+    )
+    op.create_index('ix_usage_counters_period', 'usage_counters', ['period'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_usage_counters_period', table_name='usage_counters')
+    op.drop_table('usage_counters')
@@ -0,0 +1,35 @@
+"""counter batches
+
+新增counter_batches表，记录已落库的写后缓冲批次，报告访问次数的落库在失败重试时
+不会重复累加。
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'counter_batches',
+        sa.Column('batch_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('applied_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('batch_id')
+    )
+    op.create_index('ix_counter_batches_applied_at', 'counter_batches', ['applied_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_counter_batches_applied_at', table_name='counter_batches')
+    op.drop_table('counter_batches')
@@ -1,9 +1,11 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text, ARRAY, JSON
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Boolean, Column, Date, ForeignKey, Integer, String, DateTime, Text, JSON, Index, FetchedValue, text
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
+from pgvector.sqlalchemy import Vector
 import uuid
 from datetime import datetime
 
+from core import config
 from database import Base
 
 class User(Base):
@@ -49,30 +51,115 @@ class Subscription(Base):
     # 关系
     user = relationship("User", back_populates="subscriptions")
 
+    __table_args__ = (
+        # 查询用户订阅历史
+        Index("ix_subscriptions_user_id_start_date", "user_id", "start_date"),
+    )
+
+class UsageCounter(Base):
+    """
+    用户的月度用量
+
+    用量实时累加在Redis中，由reconcile_usage任务定期写入本表；Redis数据丢失后从本表恢复。
+    """
+    __tablename__ = "usage_counters"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    # 统计月份（当月1日）
+    period = Column(Date, primary_key=True)
+    papers = Column(Integer, nullable=False, default=0)
+    analyses = Column(Integer, nullable=False, default=0)
+    reports = Column(Integer, nullable=False, default=0)
+    tokens = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # 恢复Redis时按月份读取
+        Index("ix_usage_counters_period", "period"),
+    )
+
+class CounterBatch(Base):
+    """
+    已落库的写后缓冲批次
+
+    批次id与累加计数在同一事务中写入，落库后删除Redis中的批次前失败时，重试不会重复累加。
+    """
+    __tablename__ = "counter_batches"
+
+    batch_id = Column(UUID(as_uuid=True), primary_key=True)
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # 按落库时间清理过期批次
+        Index("ix_counter_batches_applied_at", "applied_at"),
+    )
+
 class Paper(Base):
     """论文模型"""
     __tablename__ = "papers"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = Column(String(500))
-    authors = Column(JSON)
+    authors = Column(JSONB)
     upload_date = Column(DateTime, default=datetime.utcnow)
     file_path = Column(String(500), nullable=False)
     file_size = Column(Integer)
     file_hash = Column(String(255))
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    metadata = Column(JSON)
+    # 大字段默认延迟加载且禁止隐式加载，详情查询通过undefer_group("content")显式加载。
+    # metadata是Declarative的保留属性名，列名仍为metadata，属性名为metadata_
+    metadata_ = deferred(Column("metadata", JSONB), group="content", raiseload=True)
     status = Column(String(50), default="uploaded")
     tags = Column(ARRAY(String))
     doi = Column(String(255))
-    publication_info = Column(JSON)
-    extracted_text = Column(Text)
+    publication_info = deferred(Column(JSONB), group="content", raiseload=True)
+    extracted_text = deferred(Column(Text), group="content", raiseload=True)
+    # 正文归档后extracted_text置空，正文以zstd压缩存放在该存储路径，读取见archive_service
+    text_archive_path = Column(String(500))
+    # 生成embedding所用的模型，模型变更后据此重新计算
     embedding_id = Column(String(255))
+    # 标题、作者和摘要的句向量，用于相似论文和语义检索
+    embedding = deferred(Column(Vector(config.EMBEDDING_DIM)), raiseload=True)
     is_public = Column(Boolean, default=False)
+    # 全文检索向量，由数据库触发器papers_search_vector_update维护（标题 > 作者、标签 > 摘要 > 正文）
+    search_vector = deferred(
+        Column(TSVECTOR, server_default=FetchedValue(), server_onupdate=FetchedValue()), 
+        raiseload=True
+    )
 
     # 关系
     user = relationship("User", back_populates="papers")
-    analyses = relationship("Analysis", back_populates="paper")
+    # 删除时由数据库外键级联删除子记录，ORM不加载子记录，也不将已加载子记录的外键置空
+    analyses = relationship("Analysis", back_populates="paper", passive_deletes="all")
+
+    __table_args__ = (
+        # 论文列表：按用户过滤、按(上传时间, id)倒序，支持游标分页
+        Index("ix_papers_user_id_upload_date_id", "user_id", "upload_date", "id"),
+        # 论文列表：按用户和状态过滤
+        Index("ix_papers_user_id_status_upload_date_id", "user_id", "status", "upload_date", "id"),
+        # 按用户过滤标签、作者（@>），user_id列依赖btree_gin扩展
+        Index("ix_papers_user_id_tags", "user_id", "tags", postgresql_using="gin"),
+        Index(
+            "ix_papers_user_id_authors", "user_id", "authors", 
+            postgresql_using="gin", 
+            postgresql_ops={"authors": "jsonb_path_ops"}
+        ),
+        # 全文检索（@@），按用户过滤
+        Index("ix_papers_user_id_search_vector", "user_id", "search_vector", postgresql_using="gin"),
+        # 向量近邻检索（余弦距离），依赖pgvector扩展
+        Index(
+            "ix_papers_embedding", "embedding", 
+            postgresql_using="hnsw", 
+            postgresql_ops={"embedding": "vector_cosine_ops"}
+        ),
+        # 后台补齐向量时查找尚无向量的论文
+        Index("ix_papers_embedding_pending", "id", postgresql_where=text("embedding IS NULL")),
+        # 归档任务查找上传较早、正文尚未归档的论文
+        Index(
+            "ix_papers_text_archive_pending", "upload_date", 
+            postgresql_where=text("text_archive_path IS NULL AND extracted_text IS NOT NULL")
+        ),
+    )
 
 class Analysis(Base):
     """分析模型"""
@@ -80,21 +167,44 @@ class Analysis(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     paper_id = Column(UUID(as_uuid=True), ForeignKey("papers.id", ondelete="CASCADE"), nullable=False)
+    # 论文所有者，冗余存储以便按用户查询和校验权限时无需关联论文表
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     status = Column(String(50), default="pending")
     created_at = Column(DateTime, default=datetime.utcnow)
     started_at = Column(DateTime)
     completed_at = Column(DateTime)
-    result_data = Column(JSON)
+    # 分析结果（含raw_analysis原文）默认延迟加载，结果查询通过undefer_group("results")显式加载
+    result_data = deferred(Column(JSONB), group="results", raiseload=True)
+    # raw_analysis归档后从result_data中移除，原文以zstd压缩存放在该存储路径，读取见archive_service
+    raw_archive_path = Column(String(500))
     error_message = Column(Text)
     analysis_type = Column(String(50), default="standard")
-    parameters = Column(JSON)
-    feedback = Column(JSON)
+    parameters = Column(JSONB)
+    feedback = Column(JSONB)
     processing_time = Column(Integer)
     version = Column(String(50))
 
     # 关系
     paper = relationship("Paper", back_populates="analyses")
-    reports = relationship("Report", back_populates="analysis")
+    reports = relationship("Report", back_populates="analysis", passive_deletes="all")
+
+    __table_args__ = (
+        # 分析列表：按用户过滤、按(创建时间, id)倒序
+        Index("ix_analysis_user_id_created_at_id", "user_id", "created_at", "id"),
+        # 按论文过滤分析列表
+        Index("ix_analysis_paper_id_created_at_id", "paper_id", "created_at", "id"),
+        # 归档任务查找完成较早、raw_analysis尚未归档的分析
+        Index(
+            "ix_analysis_raw_archive_pending", "completed_at", 
+            postgresql_where=text("raw_archive_path IS NULL AND result_data ? 'raw_analysis'")
+        ),
+    )
+
+# 按技术可行性评分过滤：jsonb表达式索引，查询条件须使用相同的表达式
+Index(
+    "ix_analysis_technical_feasibility_score", 
+    Analysis.result_data["technical_feasibility"]["score"]
+)
 
 class Report(Base):
     """报告模型"""
@@ -102,20 +212,48 @@ class Report(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     analysis_id = Column(UUID(as_uuid=True), ForeignKey("analysis.id", ondelete="CASCADE"), nullable=False)
+    # 论文所有者，冗余存储以便按用户查询和校验权限时无需关联分析表和论文表
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     title = Column(String(255), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     format = Column(String(50), default="pdf")
+    status = Column(String(50), default="generating")
     file_path = Column(String(500))
-    shared_with = Column(JSON)
+    shared_with = Column(JSONB)
     is_public = Column(Boolean, default=False)
     access_count = Column(Integer, default=0)
     template_id = Column(String(255))
-    custom_sections = Column(JSON)
+    custom_sections = Column(JSONB)
 
     # 关系
     analysis = relationship("Analysis", back_populates="reports")
-    comments = relationship("Comment", back_populates="report")
+    comments = relationship("Comment", back_populates="report", passive_deletes="all")
+    share_links = relationship("ShareLink", back_populates="report", passive_deletes="all")
+
+    __table_args__ = (
+        # 报告列表：按用户过滤、按(创建时间, id)倒序
+        Index("ix_reports_user_id_created_at_id", "user_id", "created_at", "id"),
+        # 按分析过滤报告列表
+        Index("ix_reports_analysis_id_created_at_id", "analysis_id", "created_at", "id"),
+    )
+
+class ShareLink(Base):
+    """报告分享链接模型"""
+    __tablename__ = "share_links"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    code = Column(String(32), unique=True, index=True, nullable=False)
+    report_id = Column(UUID(as_uuid=True), ForeignKey("reports.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    access_type = Column(String(50), nullable=False, default="link")
+    recipients = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime)
+    is_active = Column(Boolean, default=True)
+
+    # 关系
+    report = relationship("Report", back_populates="share_links")
 
 class Comment(Base):
     """评论模型"""
@@ -133,7 +271,15 @@ class Comment(Base):
     # 关系
     report = relationship("Report", back_populates="comments")
     user = relationship("User", back_populates="comments")
-    replies = relationship("Comment", backref=ForeignKey("parent_id"))
+    parent = relationship("Comment", back_populates="replies", remote_side=[id])
+    replies = relationship("Comment", back_populates="parent", order_by="Comment.created_at")
+
+    __table_args__ = (
+        # 按报告分页读取评论
+        Index("ix_comments_report_id_created_at", "report_id", "created_at", "id"),
+        # 批量加载回复
+        Index("ix_comments_parent_id_created_at", "parent_id", "created_at"),
+    )
 
 class APIKey(Base):
     """API密钥模型"""
@@ -142,6 +288,9 @@ class APIKey(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     key_name = Column(String(255), nullable=False)
+    # 完整密钥为 pk_<key_prefix>_<密钥>，认证时按前缀查找；此前签发的密钥没有前缀，无法用于认证
+    key_prefix = Column(String(32))
+    # 密钥部分的HMAC-SHA256（此前签发的密钥为bcrypt哈希）
     key_hash = Column(String(255), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime)
@@ -152,16 +301,33 @@ class APIKey(Base):
     # 关系
     user = relationship("User", back_populates="api_keys")
 
+    __table_args__ = (
+        Index("ix_api_keys_user_id", "user_id"),
+        Index("ix_api_keys_key_prefix", "key_prefix", unique=True),
+    )
+
 class AuditLog(Base):
-    """审计日志模型"""
+    """
+    审计日志模型
+    
+    按timestamp按月分区（audit_logs_YYYYMM，另有默认分区audit_logs_default），分区由
+    maintain_audit_partitions任务提前创建、超出保留期后删除。主键须包含分区键。
+    user_id不设外键：审计记录需在用户删除后保留，写入时也省去对users表的检查。
+    """
     __tablename__ = "audit_logs"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"))
+    user_id = Column(UUID(as_uuid=True))
     action = Column(String(255), nullable=False)
     entity_type = Column(String(255), nullable=False)
     entity_id = Column(UUID(as_uuid=True))
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)
     ip_address = Column(String(50))
     user_agent = Column(Text)
-    details = Column(JSON)
\ No newline at end of file
+    details = Column(JSONB)
+
+    __table_args__ = (
+        # 按用户查询操作记录
+        Index("ix_audit_logs_user_id_timestamp", "user_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
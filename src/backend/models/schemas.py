@@ -1,5 +1,7 @@
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Union, Generic, TypeVar
 from pydantic import BaseModel, EmailStr, Field, validator
+from pydantic.utils import GetterDict
+from pydantic.generics import GenericModel
 from datetime import datetime
 import uuid
 from enum import Enum
@@ -38,6 +40,9 @@ class Token(BaseSchema):
     token_type: str
     expires_in: int
 
+class TokenWithUser(Token):
+    user: User
+
 class TokenData(BaseSchema):
     user_id: Optional[str] = None
 
@@ -64,6 +69,28 @@ class Subscription(SubscriptionBase):
     end_date: Optional[datetime] = None
     created_at: datetime
 
+class UserProfile(User):
+    """当前用户信息及活跃订阅"""
+    subscription: Optional[Subscription] = None
+
+class SubscriptionPlan(BaseSchema):
+    """用户当前的订阅计划（缓存在Redis中），plan_type为None表示没有活跃订阅"""
+    plan_type: Optional[str] = None
+    end_date: Optional[datetime] = None
+    features: Dict[str, Any] = {}
+    usage_limits: Dict[str, Any] = {}
+
+class QuotaItem(BaseSchema):
+    limit: Optional[int] = None
+    used: int
+    remaining: Optional[int] = None
+
+class Usage(BaseSchema):
+    plan: Optional[str] = None
+    period_start: datetime
+    period_end: datetime
+    quotas: Dict[str, QuotaItem]
+
 # 论文相关模型
 class PaperBase(BaseSchema):
     title: Optional[str] = None
@@ -92,11 +119,31 @@ class Paper(PaperBase):
     status: str
     is_public: bool
 
+class PaperSearchResult(Paper):
+    rank: float
+    title_highlight: Optional[str] = None
+    snippet: Optional[str] = None
+
+class PaperSimilarity(Paper):
+    similarity: float
+
+class PaperGetterDict(GetterDict):
+    """从论文模型读取字段：metadata列在模型上的属性名为metadata_（metadata是Declarative的保留属性名）"""
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key == "metadata":
+            key = "metadata_"
+        return getattr(self._obj, key, default)
+
 class PaperDetail(Paper):
     file_size: Optional[int] = None
     metadata: Optional[Dict[str, Any]] = None
     doi: Optional[str] = None
     publication_info: Optional[Dict[str, Any]] = None
+    extracted_text: Optional[str] = None
+    
+    class Config:
+        getter_dict = PaperGetterDict
 
 # 分析相关模型
 class AnalysisType(str, Enum):
@@ -165,9 +212,16 @@ class ReportDetail(Report):
     access_count: int
     custom_sections: Optional[Dict[str, Any]] = None
 
+class ReportExportFilter(BaseSchema):
+    paper_ids: Optional[List[uuid.UUID]] = None
+    tags: Optional[List[str]] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
 # 评论相关模型
 class CommentBase(BaseSchema):
     content: str
+    parent_id: Optional[uuid.UUID] = None
 
 class CommentCreate(CommentBase):
     report_id: uuid.UUID
@@ -186,6 +240,9 @@ class Comment(CommentBase):
     parent_id: Optional[uuid.UUID] = None
     is_resolved: bool
 
+class CommentThread(Comment):
+    replies: List[Comment] = []
+
 # API密钥相关模型
 class APIKeyBase(BaseSchema):
     key_name: str
@@ -198,6 +255,7 @@ class APIKeyCreate(APIKeyBase):
 class APIKey(APIKeyBase):
     id: uuid.UUID
     user_id: uuid.UUID
+    key_prefix: Optional[str] = None
     created_at: datetime
     expires_at: Optional[datetime] = None
     is_active: bool
@@ -218,22 +276,35 @@ class ErrorResponse(ResponseBase):
     success: bool = False
     error: ErrorDetail
 
+class TotalMode(str, Enum):
+    cached = "cached"
+    exact = "exact"
+    estimate = "estimate"
+    none = "none"
+
 class PaginationMeta(BaseSchema):
-    total: int
+    total: Optional[int] = None
+    total_estimated: Optional[bool] = None
     count: int
     per_page: int
-    current_page: int
-    total_pages: int
+    current_page: Optional[int] = None
+    total_pages: Optional[int] = None
     links: Optional[Dict[str, Optional[str]]] = None
 
 class ResponseMeta(BaseSchema):
     pagination: Optional[PaginationMeta] = None
 
-class DataResponse(ResponseBase):
+DataT = TypeVar("DataT")
+
+class DataResponse(ResponseBase, GenericModel, Generic[DataT]):
+    """统一响应格式，按接口指定数据类型，如 DataResponse[PaperDetail]；不指定时data不做校验"""
     success: bool = True
-    data: Any
+    data: DataT
     meta: Optional[ResponseMeta] = None
 
+class Message(BaseSchema):
+    message: str
+
 # 共享相关模型
 class ShareType(str, Enum):
     link = "link"
@@ -248,4 +319,33 @@ class Share(BaseSchema):
     id: uuid.UUID
     share_url: str
     access_type: ShareType
-    expires_at: Optional[datetime] = None
\ No newline at end of file
+    expires_at: Optional[datetime] = None
+
+class ShareLink(Share):
+    code: str
+    report_id: uuid.UUID
+    created_at: datetime
+    is_active: bool
+    recipients: Optional[List[EmailStr]] = None
+
+class PublicSharedReport(BaseSchema):
+    id: uuid.UUID
+    title: str
+    format: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    is_public: bool = False
+
+class SharedReport(PublicSharedReport):
+    file_path: Optional[str] = None
+
+class PublicShare(BaseSchema):
+    """通过分享码返回的信息，不含报告文件路径"""
+    share_id: uuid.UUID
+    code: str
+    access_type: ShareType
+    expires_at: Optional[datetime] = None
+    report: PublicSharedReport
+
+class ResolvedShare(PublicShare):
+    report: SharedReport
\ No newline at end of file
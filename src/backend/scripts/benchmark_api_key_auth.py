@@ -0,0 +1,90 @@
+"""
+API密钥认证开销测试
+
+直接调用security.get_current_user，对比缓存命中时API密钥和JWT认证每次的耗时，
+并给出一次bcrypt验证的耗时作为参照。测试前向进程内缓存写入用户和API密钥记录，
+模拟已订阅失效频道的稳定状态，不需要数据库和Redis（记录最后使用时间的写入失败
+只记录警告）。
+
+用法：
+    python scripts/benchmark_api_key_auth.py --requests 20000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.requests import Request
+
+from core import security
+from core.auth_cache import auth_cache
+from models import models
+
+class NoDatabase:
+    """缓存命中时不应访问数据库"""
+    
+    def __init__(self):
+        self.info = {}
+    
+    def __getattr__(self, name):
+        raise AssertionError(f"缓存命中时访问了数据库: {name}")
+
+def build_request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [], "state": {}})
+
+async def measure(total: int, **credentials):
+    """调用total次get_current_user，返回每次的耗时（秒）"""
+    db = NoDatabase()
+    latencies = []
+    for _ in range(total):
+        request = build_request()
+        started = time.perf_counter()
+        await security.get_current_user(request, db, **credentials)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+def report(name: str, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1e6
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6
+    print(f"{name:>10}: p50 {p50:7.1f}us  p99 {p99:7.1f}us")
+
+async def main():
+    parser = argparse.ArgumentParser(description="API密钥认证开销测试")
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    
+    user = models.User(
+        id=uuid.uuid4(), email="bench@example.com", name="bench", 
+        password_hash=security.get_password_hash("password"), is_active=True
+    )
+    key_value, key_prefix, key_hash = security.generate_api_key()
+    api_key = models.APIKey(
+        id=uuid.uuid4(), user_id=user.id, key_name="bench", key_prefix=key_prefix, key_hash=key_hash, 
+        is_active=True, expires_at=datetime.utcnow() + timedelta(days=1)
+    )
+    token = security.create_access_token({"sub": str(user.id)})
+    
+    # 模拟已订阅失效频道、缓存已预热的稳定状态
+    auth_cache._listening = True
+    auth_cache.put_user(user, auth_cache.users.generation())
+    auth_cache.put_api_key(api_key, auth_cache.api_keys.generation())
+    
+    report("X-API-Key", await measure(args.requests, token=None, api_key=key_value))
+    report("Bearer密钥", await measure(args.requests, token=key_value, api_key=None))
+    report("JWT", await measure(args.requests, token=token, api_key=None))
+    
+    started = time.perf_counter()
+    security.verify_password("password", user.password_hash)
+    print(f"{'bcrypt':>10}: {(time.perf_counter() - started) * 1e6:7.1f}us（参照）")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+审计中间件请求路径开销测试
+
+直接以ASGI方式调用一个最简应用（不经过HTTP客户端），对比挂载AuditMiddleware
+前后每个请求的耗时，差值即审计在请求路径上的开销。测试时不启动后台写入线程，
+不需要数据库。
+
+用法：
+    python scripts/benchmark_audit_overhead.py --requests 20000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.audit import AuditMiddleware, AuditWriter
+
+async def endpoint_app(scope, receive, send):
+    """模拟已完成路由的端点：写入路径参数和用户id后返回空响应"""
+    scope["endpoint"] = endpoint_app
+    scope["path_params"] = {"paper_id": scope["path"].rsplit("/", 1)[-1]}
+    scope.setdefault("state", {})["user_id"] = uuid.UUID(int=1)
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+def build_scope(paper_id: str) -> dict:
+    return {
+        "type": "http",
+        "method": "PATCH",
+        "path": f"/api/papers/{paper_id}",
+        "headers": [(b"user-agent", b"benchmark"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 50000),
+    }
+
+async def run(app, total: int):
+    """逐个调用应用，返回每个请求的耗时（秒）"""
+    async def receive():
+        return {"type": "http.request", "body": b""}
+    
+    async def send(message):
+        pass
+    
+    paper_id = str(uuid.uuid4())
+    latencies = []
+    for _ in range(total):
+        scope = build_scope(paper_id)
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+def report(name: str, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1e6
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6
+    print(f"{name:>12}: p50 {p50:6.2f}us  p99 {p99:6.2f}us")
+    return p50
+
+async def main():
+    parser = argparse.ArgumentParser(description="审计中间件请求路径开销测试")
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    
+    # 缓冲区足够大，测试期间不会丢弃事件
+    writer = AuditWriter(capacity=args.requests * 2, batch_size=args.requests * 2, interval=3600)
+    audited = AuditMiddleware(endpoint_app, writer=writer)
+    
+    # 预热
+    await run(endpoint_app, 1000)
+    await run(audited, 1000)
+    
+    baseline = report("无审计", await run(endpoint_app, args.requests))
+    with_audit = report("AuditMiddleware", await run(audited, args.requests))
+    print(f"每个请求增加约 {with_audit - baseline:.2f}us，缓冲区中事件数 {writer.pending()}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+响应压缩与字段选择的效果测试
+
+构造带raw_analysis的分析结果响应和100条论文的列表响应（不需要数据库），给出不压缩、gzip、brotli
+时的响应大小和压缩耗时，以及使用fields参数只返回部分字段时的大小。
+
+用法：
+    python scripts/benchmark_compression.py --raw-size 30000 --rounds 200
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import compression, config
+from core.responses import dumps
+from models import models, schemas
+from utils import field_utils
+
+def build_analysis(raw_size: int) -> models.Analysis:
+    words = ["技术", "市场", "商业化", "专利", "客户", "成本", "规模化", "验证", "融资", "团队"]
+    rng = random.Random(0)
+    raw_analysis = "".join(rng.choice(words) for _ in range(raw_size // 2))
+    analysis = models.Analysis(
+        id=uuid.uuid4(),
+        paper_id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        analysis_type="standard",
+        status="completed",
+        created_at=datetime.utcnow(),
+        completed_at=datetime.utcnow()
+    )
+    analysis.result_data = {
+        "technical_feasibility": {"score": 8.5, "maturity_level": "TRL 4", "strengths": ["创新性高"], "challenges": ["成本较高"]},
+        "market_opportunities": {"potential_applications": [{"name": "医疗诊断应用", "market_size": "$5B"}]},
+        "business_model": {"recommended_models": [{"type": "SaaS", "revenue_streams": ["订阅", "专业服务"]}]},
+        "raw_analysis": raw_analysis,
+        "token_usage": {"input_tokens": 12000, "output_tokens": 3000}
+    }
+    return analysis
+
+def build_papers(count: int) -> List[models.Paper]:
+    now = datetime.utcnow()
+    user_id = uuid.uuid4()
+    return [
+        models.Paper(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            title=f"Commercialization Potential of Research Result {i}",
+            authors=["Alice Zhang", "Bob Li", "Carol Wang"],
+            tags=["machine-learning", "nlp", "commercialization"],
+            upload_date=now - timedelta(minutes=i),
+            file_path=f"uploads/{user_id}/{i}.pdf",
+            status="analyzed",
+            is_public=False
+        )
+        for i in range(count)
+    ]
+
+def measure(body: bytes, encoding: str, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        compressed = compression.compress(body, encoding)
+        timings.append(time.perf_counter() - started)
+    return len(compressed), statistics.median(timings) * 1e3
+
+def report(title: str, body: bytes, rounds: int):
+    print(f"{title}: {len(body)} bytes")
+    for encoding in compression.ENCODINGS:
+        size, p50 = measure(body, encoding, rounds)
+        print(f"{encoding:>8}: {size:8d} bytes ({size / len(body):6.1%})  压缩p50 {p50:6.3f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="响应压缩与字段选择的效果测试")
+    parser.add_argument("--raw-size", type=int, default=30000, help="raw_analysis的字符数")
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    
+    print(f"gzip级别 {config.COMPRESSION_GZIP_LEVEL}，brotli质量 {config.COMPRESSION_BROTLI_QUALITY}")
+    
+    analysis = schemas.DataResponse[schemas.AnalysisDetail](data=build_analysis(args.raw_size))
+    report("分析结果", dumps(analysis), args.rounds)
+    fields = field_utils.parse_fields("status,result_data.technical_feasibility,result_data.market_opportunities", schemas.AnalysisDetail)
+    report("分析结果（fields，不含raw_analysis）", dumps(field_utils.select_fields(analysis, fields)), args.rounds)
+    
+    papers = schemas.DataResponse[List[schemas.Paper]](data=build_papers(args.items))
+    report(f"论文列表（{args.items}条）", dumps(papers), args.rounds)
+    fields = field_utils.parse_fields("title,status", schemas.Paper)
+    report(f"论文列表（{args.items}条，fields=title,status）", dumps(field_utils.select_fields(papers, fields)), args.rounds)
+
+if __name__ == "__main__":
+    main()
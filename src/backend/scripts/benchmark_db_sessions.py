@@ -0,0 +1,102 @@
+"""
+同步会话与异步会话并发吞吐对比
+
+在同一进程内挂载两个路由：一个使用同步Session（FastAPI在线程池中执行），
+一个使用AsyncSession（asyncpg，直接在事件循环中等待）。每个请求执行
+pg_sleep模拟慢查询，然后以相同并发度压测，输出吞吐量和延迟分位数。
+
+用法（需要可连接的PostgreSQL，连接参数与应用一致）：
+    python scripts/benchmark_db_sessions.py --concurrency 200 --requests 2000 --sleep 0.05
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_async_db, get_db
+
+def build_app(sleep_seconds: float) -> FastAPI:
+    """构建只包含两个测试路由的应用"""
+    app = FastAPI()
+    
+    @app.get("/sync")
+    def sync_route(db: Session = Depends(get_db)):
+        return {"value": db.execute(text("SELECT pg_sleep(:s), 1"), {"s": sleep_seconds}).scalar_one_or_none()}
+    
+    @app.get("/async")
+    async def async_route(db: AsyncSession = Depends(get_async_db)):
+        result = await db.execute(text("SELECT pg_sleep(:s), 1"), {"s": sleep_seconds})
+        return {"value": result.scalar_one_or_none()}
+    
+    return app
+
+async def run_load(app: FastAPI, path: str, concurrency: int, total: int):
+    """以固定并发度发送请求，返回(耗时, 成功数, 延迟列表)"""
+    latencies = []
+    failures = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+    
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def worker():
+            nonlocal failures
+            while True:
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code != 200:
+                        failures += 1
+                        continue
+                except Exception:
+                    failures += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+    
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    
+    return elapsed, total - failures, latencies
+
+def report(name: str, elapsed: float, succeeded: int, latencies):
+    """输出压测结果"""
+    if not latencies:
+        print(f"{name:>6}: 全部请求失败")
+        return
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{name:>6}: {succeeded / elapsed:8.1f} req/s  成功 {succeeded}  p50 {p50:7.1f}ms  p99 {p99:7.1f}ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description="同步/异步数据库会话吞吐对比")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--sleep", type=float, default=0.05, help="每个请求中pg_sleep的秒数")
+    args = parser.parse_args()
+    
+    app = build_app(args.sleep)
+    
+    for name, path in (("sync", "/sync"), ("async", "/async")):
+        # 预热连接池
+        await run_load(app, path, min(args.concurrency, 10), 10)
+        report(name, *(await run_load(app, path, args.concurrency, args.requests)))
+
+if __name__ == "__main__":
+    asyncio.run(main())
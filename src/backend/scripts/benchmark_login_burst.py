@@ -0,0 +1,106 @@
+"""
+登录高峰下其他接口的延迟测试
+
+在同一个事件循环中构建一个最简应用：/login-blocking 在协程中直接执行bcrypt（改造前的
+写法），/login 经security.verify_password_async在密码哈希线程池中执行，/ping 为普通接口。
+并发发起一批登录请求的同时持续请求 /ping，对比 /ping 的延迟，并统计因排队已满返回503的
+登录数。不需要数据库。
+
+用法：
+    python scripts/benchmark_login_burst.py --logins 40
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+
+from core import config, security
+
+PASSWORD = "correct horse battery staple"
+
+def build_app(password_hash: str) -> FastAPI:
+    app = FastAPI()
+    
+    @app.post("/login-blocking")
+    async def login_blocking():
+        return {"ok": security.verify_password(PASSWORD, password_hash)}
+    
+    @app.post("/login")
+    async def login():
+        return {"ok": await security.verify_password_async(PASSWORD, password_hash)}
+    
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+    
+    return app
+
+async def ping_until(client: httpx.AsyncClient, done: asyncio.Event, interval: float):
+    """
+    按固定间隔请求/ping直到done，返回每次的延迟（秒）
+    
+    延迟从计划发出的时间算起：事件循环被阻塞时，/ping未能按时发出的等待也计入延迟。
+    """
+    latencies = []
+    scheduled = time.perf_counter()
+    while not done.is_set():
+        await asyncio.sleep(max(0, scheduled - time.perf_counter()))
+        await client.get("/ping")
+        latencies.append(time.perf_counter() - scheduled)
+        scheduled += interval
+    return latencies
+
+async def run(client: httpx.AsyncClient, login_path: str, logins: int, duration: float):
+    """并发发起logins个登录（login_path为None时只测/ping），返回(/ping延迟, 登录状态码, 登录总耗时)"""
+    done = asyncio.Event()
+    pinger = asyncio.create_task(ping_until(client, done, 0.01))
+    await asyncio.sleep(0.05)
+    
+    started = time.perf_counter()
+    if login_path:
+        responses = await asyncio.gather(*(client.post(login_path) for _ in range(logins)))
+    else:
+        await asyncio.sleep(duration)
+        responses = []
+    elapsed = time.perf_counter() - started
+    
+    done.set()
+    return await pinger, [response.status_code for response in responses], elapsed
+
+def report(name: str, latencies, statuses, elapsed: float):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    line = f"{name:>16}: /ping p50 {p50:7.1f}ms  p99 {p99:7.1f}ms  max {latencies[-1] * 1000:7.1f}ms"
+    if statuses:
+        line += f"  登录 {statuses.count(200)} 成功 / {statuses.count(503)} 返回503，共 {elapsed:.1f}s"
+    print(line)
+
+async def main():
+    parser = argparse.ArgumentParser(description="登录高峰下其他接口的延迟测试")
+    parser.add_argument("--logins", type=int, default=40)
+    args = parser.parse_args()
+    
+    print(f"密码哈希线程数 {config.PASSWORD_HASH_WORKERS}，排队上限 {config.PASSWORD_HASH_MAX_PENDING}")
+    password_hash = security.get_password_hash(PASSWORD)
+    app = build_app(password_hash)
+    
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark") as client:
+        baseline = await run(client, None, 0, 1.0)
+        report("无登录", *baseline)
+    
+        offloaded = await run(client, "/login", args.logins, 0)
+        report("线程池", *offloaded)
+    
+        blocking = await run(client, "/login-blocking", args.logins, 0)
+        report("事件循环中计算", *blocking)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+限流中间件请求路径开销测试
+
+直接以ASGI方式调用一个最简应用（不经过HTTP客户端），对比挂载RateLimitMiddleware
+前后每个请求的耗时。请求携带API密钥，按默认路由类别限流。
+
+不指定--redis-url时，令牌桶的预取直接发放令牌（不访问Redis），只测量进程内判定的开销；
+指定时使用真实的Redis和Lua脚本，包含预取时的网络往返。
+
+用法：
+    python scripts/benchmark_rate_limit.py --requests 20000
+    python scripts/benchmark_rate_limit.py --requests 20000 --redis-url redis://localhost:6379/0
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import cache, config, security
+from core.rate_limit import RateLimiter, RateLimitMiddleware
+
+class LocalOnlyRateLimiter(RateLimiter):
+    """预取时直接发放令牌，不访问Redis"""
+
+    async def _acquire(self, rule, subject, requested, refund):
+        return requested, float(rule.limit), 0.0, 0.0
+
+async def endpoint_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+def build_scope(api_key: str) -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/api/papers",
+        "headers": [(b"user-agent", b"benchmark"), (b"x-api-key", api_key.encode("latin-1"))],
+        "client": ("127.0.0.1", 50000),
+    }
+
+async def run(app, total: int, api_key: str):
+    """逐个调用应用，返回每个请求的耗时（秒）和429响应数"""
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    rejected = 0
+
+    async def send(message):
+        nonlocal rejected
+        if message["type"] == "http.response.start" and message["status"] == 429:
+            rejected += 1
+
+    latencies = []
+    for _ in range(total):
+        scope = build_scope(api_key)
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        latencies.append(time.perf_counter() - started)
+    return latencies, rejected
+
+def report(name: str, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1e6
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6
+    print(f"{name:>20}: p50 {p50:8.2f}us  p99 {p99:8.2f}us  max {latencies[-1] * 1e6:8.2f}us")
+
+async def main():
+    parser = argparse.ArgumentParser(description="限流中间件请求路径开销测试")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--redis-url", help="使用真实Redis（默认只测量进程内判定）")
+    args = parser.parse_args()
+
+    if args.redis_url:
+        config.REDIS_URL = args.redis_url
+        limiter = RateLimiter(config.RATE_LIMIT_LOCAL_MAX_ENTRIES, config.RATE_LIMIT_LEASE_SECONDS)
+        await cache.get_async_redis().ping()
+    else:
+        limiter = LocalOnlyRateLimiter(config.RATE_LIMIT_LOCAL_MAX_ENTRIES, config.RATE_LIMIT_LEASE_SECONDS)
+    limited = RateLimitMiddleware(endpoint_app, limiter=limiter)
+
+    # 预热
+    await run(endpoint_app, 1000, security.generate_api_key()[0])
+    await run(limited, 1000, security.generate_api_key()[0])
+
+    # 每轮使用新的API密钥，从满额的令牌桶开始
+    baseline, _ = await run(endpoint_app, args.requests, security.generate_api_key()[0])
+    latencies, rejected = await run(limited, args.requests, security.generate_api_key()[0])
+    report("无限流", baseline)
+    report("RateLimitMiddleware", latencies)
+    print(f"限流规则 default={config.RATE_LIMIT_DEFAULT}，429响应 {rejected} 个")
+
+if __name__ == "__main__":
+    asyncio.run(main())
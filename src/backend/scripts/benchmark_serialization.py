@@ -0,0 +1,151 @@
+"""
+列表接口响应序列化开销测试
+
+构造100条论文和100条分析的ORM对象（不需要数据库），对比两种响应路径的耗时：
+  旧路径：response_model=DataResponse（data不做校验），接口内from_orm后由FastAPI校验信封、
+          经jsonable_encoder逐层转换，再由json序列化
+  新路径：接口返回 ORJSONResponse(DataResponse[List[...]](...))，构造信封时按类型校验ORM对象，
+          由orjson直接序列化，不经过jsonable_encoder
+测试前检查两种路径输出的JSON内容一致。
+
+用法：
+    python scripts/benchmark_serialization.py --items 100 --rounds 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from core.responses import ORJSONResponse
+from models import models, schemas
+
+def build_papers(count: int) -> List[models.Paper]:
+    now = datetime.utcnow()
+    user_id = uuid.uuid4()
+    return [
+        models.Paper(
+            id=uuid.uuid4(),
+            user_id=user_id,
+            title=f"Commercialization Potential of Research Result {i}",
+            authors=["Alice Zhang", "Bob Li", "Carol Wang"],
+            tags=["machine-learning", "nlp", "commercialization"],
+            upload_date=now - timedelta(minutes=i),
+            file_path=f"uploads/{user_id}/{i}.pdf",
+            status="analyzed",
+            is_public=False
+        )
+        for i in range(count)
+    ]
+
+def build_analyses(count: int) -> List[models.Analysis]:
+    now = datetime.utcnow()
+    return [
+        models.Analysis(
+            id=uuid.uuid4(),
+            paper_id=uuid.uuid4(),
+            user_id=uuid.uuid4(),
+            analysis_type="standard",
+            parameters={"depth": "full", "sections": ["market", "technical", "business"]},
+            status="completed",
+            created_at=now - timedelta(minutes=i),
+            started_at=now - timedelta(minutes=i),
+            completed_at=now
+        )
+        for i in range(count)
+    ]
+
+def build_meta(count: int) -> dict:
+    return {
+        "pagination": {
+            "total": 1000,
+            "total_estimated": False,
+            "count": count,
+            "per_page": count,
+            "current_page": 1,
+            "total_pages": 10,
+            "links": {"next": "/api/papers?cursor=eyJ2IjoxfQ", "prev": None}
+        }
+    }
+
+def old_path(item_schema):
+    """旧路径：接口返回dict，FastAPI按未指定类型的DataResponse校验后经jsonable_encoder转换"""
+    field = create_response_field("response", schemas.DataResponse)
+    
+    async def render(items, meta) -> bytes:
+        content = await serialize_response(
+            field=field,
+            response_content={
+                "success": True,
+                "data": [item_schema.from_orm(item) for item in items],
+                "meta": meta
+            }
+        )
+        return JSONResponse(content).body
+    
+    return render
+
+def new_path(item_schema):
+    """新路径：接口返回按类型校验的信封，由orjson直接序列化"""
+    envelope = schemas.DataResponse[List[item_schema]]
+    
+    async def render(items, meta) -> bytes:
+        return ORJSONResponse(envelope(data=items, meta=meta)).body
+    
+    return render
+
+async def measure(render, items, meta, rounds: int) -> List[float]:
+    for _ in range(20):
+        await render(items, meta)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await render(items, meta)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+def report(name: str, timings: List[float], size: int):
+    timings = sorted(timings)
+    p50 = statistics.median(timings) * 1e3
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1e3
+    print(f"{name:>16}: p50 {p50:7.3f}ms  p99 {p99:7.3f}ms  {size} bytes")
+
+async def main():
+    parser = argparse.ArgumentParser(description="列表接口响应序列化开销测试")
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    
+    meta = build_meta(args.items)
+    cases = [
+        ("论文列表", schemas.Paper, build_papers(args.items)),
+        ("分析列表", schemas.Analysis, build_analyses(args.items)),
+    ]
+    
+    for title, item_schema, items in cases:
+        old_render, new_render = old_path(item_schema), new_path(item_schema)
+        old_body = await old_render(items, meta)
+        new_body = await new_render(items, meta)
+        if json.loads(old_body) != json.loads(new_body):
+            raise SystemExit(f"{title}：两种路径的输出不一致")
+    
+        print(f"{title}（{args.items}条）")
+        old_timings = await measure(old_render, items, meta, args.rounds)
+        new_timings = await measure(new_render, items, meta, args.rounds)
+        report("jsonable_encoder", old_timings, len(old_body))
+        report("orjson", new_timings, len(new_body))
+        print(f"{'':>16}  p50加速 {statistics.median(old_timings) / statistics.median(new_timings):.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
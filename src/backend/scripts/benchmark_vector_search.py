@@ -0,0 +1,101 @@
+"""
+相似论文与语义检索延迟测试
+
+使用库中已有的、已生成向量的论文：随机选取论文执行相似论文查询，
+并以其标题作为检索词执行语义检索，输出延迟分位数。语义检索的延迟
+包含在CPU上生成查询向量的时间，单独列出以便区分。
+
+用法（需要已执行 alembic upgrade head、且已运行过embed_pending_papers任务的PostgreSQL）：
+    python scripts/benchmark_vector_search.py --queries 200 --limit 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+from sqlalchemy import select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import SessionLocal
+from models import models
+from services import similarity_service
+from utils import embedding_utils
+
+def measure(func: Callable[[], object], repeat: int) -> List[float]:
+    """重复执行并返回每次的耗时（秒）"""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+def report(name: str, latencies: List[float]):
+    """输出延迟分位数"""
+    if not latencies:
+        print(f"{name:>10}: 无数据")
+        return
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+    print(f"{name:>10}: 次数 {len(latencies)}  p50 {p50:7.1f}ms  p95 {p95:7.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="相似论文与语义检索延迟测试")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    random.seed(args.seed)
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(models.Paper.id, models.Paper.user_id, models.Paper.title).where(
+                models.Paper.embedding.is_not(None)
+            ).limit(10000)
+        ).all()
+        if not rows:
+            print("没有已生成向量的论文，请先运行embed_pending_papers任务")
+            return
+    
+        print(f"已生成向量的论文（抽样上限10000）：{len(rows)}")
+    
+        # 预热：加载模型、建立连接
+        paper_id, user_id, title = rows[0]
+        embedding_utils.embed_texts([title])
+        similarity_service.get_similar_papers(db, paper_id, user_id, args.limit)
+        db.rollback()
+    
+        samples = [random.choice(rows) for _ in range(args.queries)]
+    
+        def run_similar():
+            paper_id, user_id, _ = samples.pop()
+            similarity_service.get_similar_papers(db, paper_id, user_id, args.limit)
+            db.rollback()
+    
+        similar = measure(run_similar, args.queries)
+    
+        samples = [random.choice(rows) for _ in range(args.queries)]
+        titles = [title for _, _, title in samples]
+        encode = measure(lambda: embedding_utils.embed_texts([random.choice(titles)]), args.queries)
+    
+        def run_semantic():
+            _, user_id, title = samples.pop()
+            similarity_service.semantic_search(db, user_id, title, args.limit)
+            db.rollback()
+    
+        semantic = measure(run_semantic, args.queries)
+    finally:
+        db.close()
+    
+    report("similar", similar)
+    report("encode", encode)
+    report("semantic", semantic)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+列表查询读取列检查
+
+编译论文、分析、报告列表的分页、游标和计数查询（与服务层使用同一查询构建函数），
+任一查询读取了正文、元数据、分析结果等大字段即以非零状态退出；同时确认详情查询
+仍会显式加载这些字段。只编译SQL，不需要连接数据库。
+
+用法：
+    python scripts/check_list_columns.py
+"""
+import os
+import sys
+import uuid
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import Select
+from sqlalchemy.dialects import postgresql
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import models
+from services import paper_service, analysis_service, report_service
+from utils import pagination_utils
+
+# 列表查询不允许读取的大字段
+HEAVY_COLUMNS = [
+    "papers.extracted_text",
+    "papers.metadata",
+    "papers.publication_info",
+    "papers.search_vector",
+    "papers.embedding",
+    "analysis.result_data",
+]
+
+def select_clause(stmt: Select) -> str:
+    """按PostgreSQL方言编译查询，返回SELECT列表部分（过滤条件中可以引用大字段，如全文检索向量）"""
+    return str(stmt.compile(dialect=postgresql.dialect())).split("\nFROM", 1)[0]
+
+def list_queries() -> List[Tuple[str, Select]]:
+    """构建需要检查的列表查询"""
+    user_id = uuid.uuid4()
+    cursor = pagination_utils.encode_cursor(pagination_utils.NEXT, datetime.utcnow(), uuid.uuid4())
+    
+    queries = [
+        ("papers", paper_service._papers_statement(user_id, status="analyzed", tags=["tag"], search="x"), (models.Paper.upload_date, models.Paper.id)),
+        ("analyses", analysis_service._analyses_statement(user_id, status="completed"), (models.Analysis.created_at, models.Analysis.id)),
+        ("reports", report_service._reports_statement(user_id, paper_id=uuid.uuid4()), (models.Report.created_at, models.Report.id)),
+    ]
+    
+    checks = []
+    for name, stmt, (sort_column, id_column) in queries:
+        checks.append((f"{name} page", pagination_utils.page_statement(stmt, 1, 100)))
+        checks.append((f"{name} cursor", pagination_utils.keyset_statement(stmt, sort_column, id_column, 100, cursor)))
+        checks.append((f"{name} count", pagination_utils.count_statement(stmt)))
+    return checks
+
+def detail_queries() -> List[Tuple[str, Select, List[str]]]:
+    """构建需要加载大字段的详情查询及其应加载的列"""
+    return [
+        ("paper detail", paper_service._paper_statement(uuid.uuid4(), uuid.uuid4()), ["papers.extracted_text", "papers.metadata", "papers.publication_info"]),
+        ("analysis results", analysis_service._analysis_statement(uuid.uuid4(), uuid.uuid4(), with_results=True), ["analysis.result_data"]),
+    ]
+
+def main() -> int:
+    failures = 0
+    
+    for name, stmt in list_queries():
+        sql = select_clause(stmt)
+        fetched = [column for column in HEAVY_COLUMNS if column in sql]
+        if fetched:
+            failures += 1
+            print(f"FAIL {name}: 读取了 {', '.join(fetched)}")
+        else:
+            print(f"ok   {name}")
+    
+    for name, stmt, columns in detail_queries():
+        sql = select_clause(stmt)
+        missing = [column for column in columns if column not in sql]
+        if missing:
+            failures += 1
+            print(f"FAIL {name}: 未加载 {', '.join(missing)}")
+        else:
+            print(f"ok   {name}")
+    
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+列表查询执行计划检查
+
+在事务中写入一批测试数据并ANALYZE，然后对论文、分析、报告列表查询执行
+EXPLAIN，任一查询在这些表上出现顺序扫描（Seq Scan）即以非零状态退出。
+结束时回滚事务，不留下测试数据。
+
+用法（需要已执行 alembic upgrade head 的PostgreSQL，连接参数与应用一致）：
+    python scripts/check_query_plans.py --users 200 --papers-per-user 50
+"""
+import argparse
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import Select, text
+from sqlalchemy.engine import Connection
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import engine
+from models import models
+from services import paper_service, analysis_service, report_service
+from utils import pagination_utils
+
+# 列表查询涉及、不允许顺序扫描的表
+CHECKED_TABLES = {"papers", "analysis", "reports", "comments"}
+
+SEED_STATEMENTS = [
+    """
+    INSERT INTO users (id, email, password_hash, name, role, created_at, is_active)
+    SELECT md5('plan-check-user-' || g)::uuid, 'plan-check-' || g || '@example.com', 'x', 'plan check ' || g, 'user', now(), true
+    FROM generate_series(1, :users) AS g
+    """,
+    """
+    INSERT INTO papers (id, user_id, title, authors, file_path, upload_date, status, tags, is_public)
+    SELECT md5('plan-check-paper-' || u.id || '-' || g)::uuid, u.id, 'paper ' || g,
+           jsonb_build_array('author ' || (g % 50)), '/dev/null',
+           now() - g * interval '1 minute', (ARRAY['uploaded', 'processing', 'analyzed'])[1 + g % 3],
+           ARRAY['tag' || (g % 20)], false
+    FROM users AS u CROSS JOIN generate_series(1, :papers_per_user) AS g
+    WHERE u.email LIKE 'plan-check-%@example.com'
+    """,
+    """
+    INSERT INTO analysis (id, paper_id, user_id, status, created_at, analysis_type, result_data)
+    SELECT md5('plan-check-analysis-' || p.id)::uuid, p.id, p.user_id, 'completed', p.upload_date, 'standard',
+           jsonb_build_object('technical_feasibility', jsonb_build_object('score', abs(hashtext(p.id::text)) % 100 / 10.0))
+    FROM papers AS p
+    WHERE p.file_path = '/dev/null'
+    """,
+    """
+    INSERT INTO reports (id, analysis_id, user_id, title, created_at, format, status, is_public, access_count)
+    SELECT md5('plan-check-report-' || a.id)::uuid, a.id, a.user_id, 'report', a.created_at, 'pdf', 'completed', false, 0
+    FROM analysis AS a JOIN papers AS p ON a.paper_id = p.id
+    WHERE p.file_path = '/dev/null'
+    """,
+    "ANALYZE users",
+    "ANALYZE papers",
+    "ANALYZE analysis",
+    "ANALYZE reports",
+]
+
+def seed(connection: Connection, users: int, papers_per_user: int):
+    """写入测试数据并更新统计信息"""
+    for statement in SEED_STATEMENTS:
+        connection.execute(text(statement), {"users": users, "papers_per_user": papers_per_user})
+
+def list_queries(connection: Connection) -> List[Tuple[str, Select]]:
+    """构建需要检查的列表查询（与服务层使用同一查询构建函数）"""
+    user_id, paper_id = connection.execute(text(
+        "SELECT p.user_id, p.id FROM papers AS p WHERE p.file_path = '/dev/null' LIMIT 1"
+    )).one()
+    
+    paper_columns = (models.Paper.upload_date, models.Paper.id)
+    analysis_columns = (models.Analysis.created_at, models.Analysis.id)
+    report_columns = (models.Report.created_at, models.Report.id)
+    
+    queries = [
+        ("papers", paper_service._papers_statement(user_id), paper_columns),
+        ("papers?status", paper_service._papers_statement(user_id, status="analyzed"), paper_columns),
+        ("papers?tags", paper_service._papers_statement(user_id, tags=["tag3"]), paper_columns),
+        ("papers?author", paper_service._papers_statement(user_id, author="author 7"), paper_columns),
+        ("papers?search", paper_service._papers_statement(user_id, search="paper 7"), paper_columns),
+        ("analyses", analysis_service._analyses_statement(user_id), analysis_columns),
+        ("analyses?paper_id", analysis_service._analyses_statement(user_id, paper_id=paper_id), analysis_columns),
+        ("analyses?min_score", analysis_service._analyses_statement(user_id, min_score=9.5), analysis_columns),
+        ("reports", report_service._reports_statement(user_id), report_columns),
+        ("reports?paper_id", report_service._reports_statement(user_id, paper_id=paper_id), report_columns),
+    ]
+    
+    # 游标分页从中间位置继续读取
+    cursor = pagination_utils.encode_cursor(
+        pagination_utils.NEXT, datetime.utcnow() - timedelta(minutes=25), uuid.UUID(int=0)
+    )
+    
+    checks = []
+    for name, stmt, (sort_column, id_column) in queries:
+        checks.append((f"{name} page", pagination_utils.page_statement(stmt, 1, 20)))
+        checks.append((f"{name} cursor", pagination_utils.keyset_statement(stmt, sort_column, id_column, 20, cursor)))
+        checks.append((f"{name} count", pagination_utils.count_statement(stmt)))
+    
+    # 详情查询（权限校验）按主键和user_id查找，不关联论文表
+    analysis_id, report_id = connection.execute(text(
+        "SELECT a.id, r.id FROM analysis AS a JOIN reports AS r ON r.analysis_id = a.id WHERE a.paper_id = :paper_id LIMIT 1"
+    ), {"paper_id": paper_id}).one()
+    checks.append(("analysis detail", analysis_service._analysis_statement(analysis_id, user_id)))
+    checks.append(("report detail", report_service._report_statement(report_id, user_id)))
+    
+    # 全文检索按相关度排序，只有页码分页
+    search_stmt = paper_service._search_statement(user_id, "paper 7")
+    checks.append(("paper search page", paper_service._search_results_statement(search_stmt, "paper 7", 1, 20)))
+    checks.append(("paper search count", pagination_utils.count_statement(search_stmt)))
+    return checks
+
+def iter_plan_nodes(node: dict) -> Iterator[dict]:
+    """遍历执行计划树"""
+    yield node
+    for child in node.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+def explain(connection: Connection, stmt: Select) -> dict:
+    """获取查询的JSON执行计划"""
+    return pagination_utils.plan_root(connection.scalar(pagination_utils.Explain(stmt)))
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="检查列表查询是否使用索引")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--papers-per-user", type=int, default=50)
+    args = parser.parse_args()
+    
+    failures = 0
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            seed(connection, args.users, args.papers_per_user)
+    
+            for name, stmt in list_queries(connection):
+                seq_scans = sorted({
+                    node["Relation Name"]
+                    for node in iter_plan_nodes(explain(connection, stmt))
+                    if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in CHECKED_TABLES
+                })
+                if seq_scans:
+                    failures += 1
+                    print(f"FAIL {name}: 顺序扫描 {', '.join(seq_scans)}")
+                else:
+                    print(f"ok   {name}")
+        finally:
+            transaction.rollback()
+    
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,7 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, undefer, undefer_group
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, cast, func, literal, select, Select
+from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
 import uuid
 from typing import List, Optional, Tuple, Dict, Any
@@ -8,79 +10,159 @@ import boto3
 
 from models import models, schemas
 from core import config
-from services import paper_service
-from utils import pdf_utils
+from services import paper_service, count_service, archive_service, quota_service
+from utils import pdf_utils, pagination_utils
 from tasks import analysis_tasks
 
-def create_analysis(db: Session, paper_id: uuid.UUID, analysis_create: schemas.AnalysisCreate):
-    """创建分析任务"""
-    # 检查论文是否存在
-    paper = db.query(models.Paper).filter(models.Paper.id == paper_id).first()
-    if not paper:
-        return None
-    
-    # 创建分析记录
-    db_analysis = models.Analysis(
+def _build_analysis(paper_id: uuid.UUID, user_id: uuid.UUID, analysis_create: schemas.AnalysisCreate) -> models.Analysis:
+    """构建分析记录，user_id为论文所有者"""
+    return models.Analysis(
         paper_id=paper_id,
+        user_id=user_id,
         status="pending",
         created_at=datetime.utcnow(),
         analysis_type=analysis_create.analysis_type,
         parameters=analysis_create.parameters,
         version="1.0"
     )
+
+async def create_analysis_async(db: AsyncSession, paper_id: uuid.UUID, analysis_create: schemas.AnalysisCreate):
+    """创建分析任务（异步）"""
+    # 检查论文是否存在
+    paper_user_id = await db.scalar(select(models.Paper.user_id).where(models.Paper.id == paper_id))
+    if not paper_user_id:
+        return None
+    
+    # 创建分析记录
+    db_analysis = _build_analysis(paper_id, paper_user_id, analysis_create)
     
     db.add(db_analysis)
-    db.commit()
-    db.refresh(db_analysis)
+    await db.commit()
+    await db.refresh(db_analysis)
     
-    # 启动异步分析任务
-    # TODO: 使用Celery任务异步处理
-    # analysis_tasks.process_analysis.delay(str(db_analysis.id))
+    # 列表总数缓存失效
+    await count_service.invalidate_async(paper_user_id)
     
     return db_analysis
 
-def get_analyses(
-    db: Session, 
+def _technical_feasibility_score():
+    """
+    技术可行性评分的jsonb表达式
+    
+    键名按字面量渲染而非绑定参数，与ix_analysis_technical_feasibility_score索引表达式一致，
+    服务端预编译语句（asyncpg）也能使用该索引。
+    """
+    return models.Analysis.result_data[
+        literal("technical_feasibility", literal_execute=True)
+    ][
+        literal("score", literal_execute=True)
+    ]
+
+def _analyses_statement(
     user_id: uuid.UUID, 
-    page: int = 1, 
-    limit: int = 20, 
     status: Optional[str] = None, 
-    paper_id: Optional[uuid.UUID] = None
-) -> Tuple[List[models.Analysis], int]:
-    """获取分析列表"""
-    # 构建查询
-    query = db.query(models.Analysis).join(
-        models.Paper, models.Analysis.paper_id == models.Paper.id
-    ).filter(models.Paper.user_id == user_id)
+    paper_id: Optional[uuid.UUID] = None, 
+    min_score: Optional[float] = None
+) -> Select:
+    """构建分析列表查询"""
+    stmt = select(models.Analysis).options(
+        pagination_utils.schema_columns(models.Analysis, schemas.Analysis)
+    ).where(models.Analysis.user_id == user_id)
     
     # 应用过滤条件
     if status:
-        query = query.filter(models.Analysis.status == status)
+        stmt = stmt.where(models.Analysis.status == status)
     
     if paper_id:
-        query = query.filter(models.Analysis.paper_id == paper_id)
+        stmt = stmt.where(models.Analysis.paper_id == paper_id)
     
-    # 计算总数
-    total = query.count()
+    if min_score is not None:
+        # jsonb比较时数值只与数值按大小比较，非数值的评分需排除
+        score = _technical_feasibility_score()
+        stmt = stmt.where(
+            func.jsonb_typeof(score) == "number",
+            score >= cast(min_score, JSONB)
+        )
+    
+    return stmt.order_by(models.Analysis.created_at.desc(), models.Analysis.id.desc())
+
+async def get_analyses_async(
+    db: AsyncSession, 
+    user_id: uuid.UUID, 
+    page: int = 1, 
+    limit: int = 20, 
+    status: Optional[str] = None, 
+    paper_id: Optional[uuid.UUID] = None, 
+    min_score: Optional[float] = None, 
+    total_mode: schemas.TotalMode = schemas.TotalMode.cached
+) -> pagination_utils.OffsetPage:
+    """获取分析列表，总数按total_mode获取（异步）"""
+    stmt = _analyses_statement(user_id, status, paper_id, min_score)
     
     # 应用分页
-    query = query.order_by(models.Analysis.created_at.desc())
-    query = query.offset((page - 1) * limit).limit(limit)
+    analyses = (await db.scalars(pagination_utils.page_statement(stmt, page, limit))).all()
+    
+    # 获取总数
+    total, total_estimated = await count_service.get_total_async(
+        db, user_id, "analyses", stmt, {"status": status, "paper_id": paper_id, "min_score": min_score}, total_mode
+    )
     
-    return query.all(), total
+    return pagination_utils.offset_page(analyses, limit, total, total_estimated)
 
-def get_analysis(db: Session, analysis_id: uuid.UUID, user_id: uuid.UUID):
-    """获取分析状态"""
-    return db.query(models.Analysis).join(
-        models.Paper, models.Analysis.paper_id == models.Paper.id
-    ).filter(
+async def get_analyses_page_async(
+    db: AsyncSession, 
+    user_id: uuid.UUID, 
+    limit: int = 20, 
+    cursor: Optional[str] = None, 
+    status: Optional[str] = None, 
+    paper_id: Optional[uuid.UUID] = None, 
+    min_score: Optional[float] = None, 
+    total_mode: schemas.TotalMode = schemas.TotalMode.none
+) -> pagination_utils.KeysetPage:
+    """
+    按游标获取分析列表（异步）
+    
+    按(created_at, id)倒序分页，默认不统计总数，翻页深度不影响查询代价。游标格式不正确时抛出ValueError。
+    """
+    base_stmt = _analyses_statement(user_id, status, paper_id, min_score)
+    stmt = pagination_utils.keyset_statement(
+        base_stmt, 
+        models.Analysis.created_at, 
+        models.Analysis.id, 
+        limit, 
+        cursor
+    )
+    analyses = (await db.scalars(stmt)).all()
+    
+    # 获取总数（默认不统计）
+    total, total_estimated = await count_service.get_total_async(
+        db, user_id, "analyses", base_stmt, {"status": status, "paper_id": paper_id, "min_score": min_score}, total_mode
+    )
+    
+    return pagination_utils.keyset_page(analyses, limit, cursor, "created_at", total, total_estimated)
+
+def _analysis_statement(analysis_id: uuid.UUID, user_id: uuid.UUID, with_results: bool = False) -> Select:
+    """构建分析详情查询，with_results为True时加载分析结果"""
+    stmt = select(models.Analysis).where(
         models.Analysis.id == analysis_id,
-        models.Paper.user_id == user_id
-    ).first()
+        models.Analysis.user_id == user_id
+    )
+    
+    if with_results:
+        stmt = stmt.options(undefer_group("results"))
+    
+    return stmt
+
+async def get_analysis_async(db: AsyncSession, analysis_id: uuid.UUID, user_id: uuid.UUID):
+    """获取分析状态（异步）"""
+    return (await db.scalars(_analysis_statement(analysis_id, user_id))).first()
 
-def get_analysis_with_results(db: Session, analysis_id: uuid.UUID, user_id: uuid.UUID):
-    """获取分析结果"""
-    return get_analysis(db, analysis_id, user_id)
+async def get_analysis_with_results_async(db: AsyncSession, analysis_id: uuid.UUID, user_id: uuid.UUID, rehydrate: bool = True):
+    """获取分析结果（异步），raw_analysis已归档时从存储补回（rehydrate为False时跳过）"""
+    analysis = (await db.scalars(_analysis_statement(analysis_id, user_id, with_results=True))).first()
+    if analysis and rehydrate:
+        await archive_service.rehydrate_raw_analysis_async(analysis)
+    return analysis
 
 def update_analysis_status(db: Session, analysis_id: uuid.UUID, status: str, result_data: Optional[Dict[str, Any]] = None):
     """更新分析状态"""
@@ -99,19 +181,24 @@ def update_analysis_status(db: Session, analysis_id: uuid.UUID, status: str, res
         if db_analysis.started_at:
             processing_time = (db_analysis.completed_at - db_analysis.started_at).total_seconds()
             db_analysis.processing_time = int(processing_time)
-        
+    
         if result_data:
             db_analysis.result_data = result_data
+            # 新结果含raw_analysis，之前归档的原文不再使用
+            db_analysis.raw_archive_path = None
     
     db.commit()
     db.refresh(db_analysis)
     
+    # 状态变化影响按状态过滤的列表总数
+    count_service.invalidate(db_analysis.user_id)
+    
     return db_analysis
 
-def add_feedback(db: Session, analysis_id: uuid.UUID, user_id: uuid.UUID, feedback: Dict[str, Any]):
-    """添加分析反馈"""
+async def add_feedback_async(db: AsyncSession, analysis_id: uuid.UUID, user_id: uuid.UUID, feedback: Dict[str, Any]):
+    """添加分析反馈（异步）"""
     # 检查分析是否存在且属于当前用户
-    db_analysis = get_analysis(db, analysis_id, user_id)
+    db_analysis = await get_analysis_async(db, analysis_id, user_id)
     
     if not db_analysis:
         return None
@@ -119,8 +206,8 @@ def add_feedback(db: Session, analysis_id: uuid.UUID, user_id: uuid.UUID, feedba
     # 更新反馈
     db_analysis.feedback = feedback
     
-    db.commit()
-    db.refresh(db_analysis)
+    await db.commit()
+    await db.refresh(db_analysis)
     
     return db_analysis
 
@@ -137,26 +224,37 @@ def process_analysis(db: Session, analysis_id: uuid.UUID):
     
     try:
         # 获取论文
-        paper = db.query(models.Paper).filter(models.Paper.id == db_analysis.paper_id).first()
-        
+        paper = db.query(models.Paper).options(
+            undefer(models.Paper.extracted_text)
+        ).filter(models.Paper.id == db_analysis.paper_id).first()
+    
         if not paper:
             raise Exception("论文不存在")
-        
+    
+        # 正文已归档时从存储读取
+        archive_service.rehydrate_extracted_text(paper)
+    
         # 提取论文文本
         if not paper.extracted_text:
             # TODO: 实现文本提取
             pass
-        
+    
         # 根据分析类型和参数执行分析
         analysis_type = db_analysis.analysis_type
         parameters = db_analysis.parameters or {}
-        
+    
         # 使用AWS Bedrock上的Claude API进行分析
         result_data = analyze_with_bedrock_claude(paper, analysis_type, parameters)
-        
+    
+        # 模型token用量计入发起分析的用户本月配额
+        token_usage = result_data.get("token_usage") or {}
+        quota_service.record_usage(db_analysis.user_id, {
+            quota_service.TOKENS: token_usage.get("input_tokens", 0) + token_usage.get("output_tokens", 0)
+        })
+    
         # 更新分析结果
         update_analysis_status(db, analysis_id, "completed", result_data)
-        
+    
         return db_analysis
     
     except Exception as e:
@@ -164,7 +262,8 @@ def process_analysis(db: Session, analysis_id: uuid.UUID):
         db_analysis.status = "failed"
         db_analysis.error_message = str(e)
         db.commit()
-        
+        count_service.invalidate(db_analysis.user_id)
+    
         return None
 
 def analyze_with_bedrock_claude(paper, analysis_type, parameters):
@@ -279,7 +378,9 @@ def analyze_with_bedrock_claude(paper, analysis_type, parameters):
             "team": ["技术专家", "产品经理", "市场营销"],
             "details": "初期需要组建一个核心团队，包括技术专家、产品经理和市场营销人员..."
         },
-        "raw_analysis": analysis_text
+        "raw_analysis": analysis_text,
+        # 模型的输入、输出token数
+        "token_usage": response_body.get("usage", {})
     }
     
     return result_data
\ No newline at end of file
@@ -0,0 +1,197 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import bindparam, literal, select, update, Select
+from starlette.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
+import logging
+import os
+import uuid
+from typing import Optional
+
+import zstandard
+
+from models import models
+from core import config
+from utils import storage_utils
+
+logger = logging.getLogger(__name__)
+
+# 单次归档任务最多处理的批数，避免任务长时间占用worker
+MAX_BATCHES_PER_RUN = 20
+
+# result_data中归档的键
+RAW_ANALYSIS_KEY = "raw_analysis"
+
+def _archive_path(*parts: str) -> str:
+    """归档文件的存储路径，对象存储下转换为 archive/... 对象键"""
+    return os.path.join(config.STORAGE_PATH, "archive", *parts)
+
+def _raw_analysis_path(analysis_id: uuid.UUID) -> str:
+    return _archive_path("analysis", str(analysis_id), "raw_analysis.txt.zst")
+
+def _extracted_text_path(user_id: uuid.UUID, paper_id: uuid.UUID) -> str:
+    return _archive_path("papers", str(user_id), str(paper_id), "extracted_text.txt.zst")
+
+def compress_text(value: str) -> bytes:
+    """zstd压缩文本（UTF-8），帧头中记录原始长度"""
+    return zstandard.ZstdCompressor(level=config.ARCHIVE_ZSTD_LEVEL).compress(value.encode("utf-8"))
+
+def decompress_text(data: bytes) -> str:
+    return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+
+def _store(file_path: str, value: str) -> int:
+    """压缩并写入存储，返回压缩后的字节数"""
+    data = compress_text(value)
+    storage_utils.write_bytes(file_path, data)
+    return len(data)
+
+def _load(file_path: str) -> str:
+    return decompress_text(storage_utils.read_bytes(file_path))
+
+def _has_raw_analysis():
+    """
+    result_data中是否有raw_analysis
+    
+    键名按字面量渲染，与ix_analysis_raw_archive_pending部分索引的条件一致。
+    """
+    return models.Analysis.result_data.has_key(literal(RAW_ANALYSIS_KEY, literal_execute=True))
+
+def _raw_analysis_candidates_statement(cutoff: datetime, batch_size: int) -> Select:
+    """构建待归档分析原文的查询，跳过其他worker正在处理的行"""
+    return select(
+        models.Analysis.id,
+        models.Analysis.result_data[RAW_ANALYSIS_KEY].astext
+    ).where(
+        models.Analysis.raw_archive_path.is_(None),
+        _has_raw_analysis(),
+        models.Analysis.completed_at < cutoff
+    ).limit(batch_size).with_for_update(skip_locked=True)
+
+def _extracted_text_candidates_statement(cutoff: datetime, batch_size: int) -> Select:
+    """构建待归档论文正文的查询，跳过其他worker正在处理的行"""
+    return select(
+        models.Paper.id,
+        models.Paper.user_id,
+        models.Paper.extracted_text
+    ).where(
+        models.Paper.text_archive_path.is_(None),
+        models.Paper.extracted_text.is_not(None),
+        models.Paper.upload_date < cutoff
+    ).limit(batch_size).with_for_update(skip_locked=True)
+
+def _archive_raw_analysis_statement():
+    """移除result_data中的raw_analysis并记录归档路径（按分析id批量执行）"""
+    table = models.Analysis.__table__
+    return update(table).where(
+        table.c.id == bindparam("analysis_id")
+    ).values(
+        result_data=table.c.result_data.op("-")(RAW_ANALYSIS_KEY),
+        raw_archive_path=bindparam("archive_path")
+    )
+
+def _archive_extracted_text_statement():
+    """清空正文并记录归档路径（按论文id批量执行），检索向量中的正文词项由触发器保留"""
+    table = models.Paper.__table__
+    return update(table).where(
+        table.c.id == bindparam("paper_id")
+    ).values(
+        extracted_text=None,
+        text_archive_path=bindparam("archive_path")
+    )
+
+def archive_raw_analyses(db: Session, older_than_days: int, batch_size: int) -> int:
+    """
+    归档完成超过older_than_days天的分析原文，返回归档的分析数
+    
+    先写入存储再更新数据库：更新失败时只会留下下次归档时覆盖的文件，不会丢失数据。
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archived = 0
+    for _ in range(MAX_BATCHES_PER_RUN):
+        rows = db.execute(_raw_analysis_candidates_statement(cutoff, batch_size)).all()
+        if not rows:
+            break
+    
+        params = []
+        stored_bytes = 0
+        for analysis_id, raw_analysis in rows:
+            archive_path = _raw_analysis_path(analysis_id)
+            stored_bytes += _store(archive_path, raw_analysis or "")
+            params.append({"analysis_id": analysis_id, "archive_path": archive_path})
+    
+        db.execute(_archive_raw_analysis_statement(), params)
+        db.commit()
+    
+        archived += len(rows)
+        logger.info(f"归档分析原文{len(rows)}条，压缩后共{stored_bytes}字节")
+        if len(rows) < batch_size:
+            break
+    
+    return archived
+
+def archive_extracted_texts(db: Session, older_than_days: int, batch_size: int) -> int:
+    """归档上传超过older_than_days天的论文正文，返回归档的论文数"""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archived = 0
+    for _ in range(MAX_BATCHES_PER_RUN):
+        rows = db.execute(_extracted_text_candidates_statement(cutoff, batch_size)).all()
+        if not rows:
+            break
+    
+        params = []
+        stored_bytes = 0
+        for paper_id, user_id, extracted_text in rows:
+            archive_path = _extracted_text_path(user_id, paper_id)
+            stored_bytes += _store(archive_path, extracted_text)
+            params.append({"paper_id": paper_id, "archive_path": archive_path})
+    
+        db.execute(_archive_extracted_text_statement(), params)
+        db.commit()
+    
+        archived += len(rows)
+        logger.info(f"归档论文正文{len(rows)}条，压缩后共{stored_bytes}字节")
+        if len(rows) < batch_size:
+            break
+    
+    return archived
+
+def _extracted_text_archived(paper: models.Paper) -> bool:
+    """extracted_text已归档且尚未补回"""
+    return paper.extracted_text is None and bool(paper.text_archive_path)
+
+def rehydrate_extracted_text(paper: models.Paper) -> models.Paper:
+    """
+    已归档的论文补回extracted_text（调用方需已加载extracted_text）
+    
+    以已提交值写入，不会被会话视为修改，正文保持归档状态。
+    """
+    if _extracted_text_archived(paper):
+        set_committed_value(paper, "extracted_text", _load(paper.text_archive_path))
+    return paper
+
+async def rehydrate_extracted_text_async(paper: models.Paper) -> models.Paper:
+    """已归档的论文补回extracted_text（异步，存储读取在线程池中执行）"""
+    if _extracted_text_archived(paper):
+        await run_in_threadpool(rehydrate_extracted_text, paper)
+    return paper
+
+def _raw_analysis_archived(analysis: models.Analysis) -> bool:
+    """raw_analysis已归档且尚未补回"""
+    return bool(analysis.raw_archive_path) and analysis.result_data is not None and RAW_ANALYSIS_KEY not in analysis.result_data
+
+def rehydrate_raw_analysis(analysis: models.Analysis) -> models.Analysis:
+    """
+    已归档的分析在result_data中补回raw_analysis（调用方需已加载result_data）
+    
+    以已提交值写入，不会被会话视为修改，也就不会在之后的提交中写回数据库。
+    """
+    if _raw_analysis_archived(analysis):
+        result_data = {**analysis.result_data, RAW_ANALYSIS_KEY: _load(analysis.raw_archive_path)}
+        set_committed_value(analysis, "result_data", result_data)
+    return analysis
+
+async def rehydrate_raw_analysis_async(analysis: models.Analysis) -> models.Analysis:
+    """已归档的分析在result_data中补回raw_analysis（异步，存储读取在线程池中执行）"""
+    if _raw_analysis_archived(analysis):
+        await run_in_threadpool(rehydrate_raw_analysis, analysis)
+    return analysis
@@ -0,0 +1,93 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import insert, text
+from datetime import datetime, timedelta
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from models import models
+
+logger = logging.getLogger(__name__)
+
+# 月分区命名：audit_logs_YYYYMM
+PARTITION_PATTERN = re.compile(r"^audit_logs_(\d{4})(\d{2})$")
+DEFAULT_PARTITION = "audit_logs_default"
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+def _next_month(month: datetime) -> datetime:
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def _partition_name(month: datetime) -> str:
+    return f"audit_logs_{month:%Y%m}"
+
+def write_events(db: Session, events: List[Dict[str, Any]]) -> int:
+    """
+    批量写入审计事件
+    
+    按批执行INSERT，psycopg2驱动下合并为多行VALUES语句，每批一次往返。
+    """
+    if not events:
+        return 0
+    
+    db.execute(insert(models.AuditLog), events)
+    db.commit()
+    
+    return len(events)
+
+def _partitions(db: Session) -> List[str]:
+    """列出audit_logs的全部分区"""
+    return db.scalars(text(
+        "SELECT c.relname FROM pg_inherits AS i JOIN pg_class AS c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'audit_logs'::regclass"
+    )).all()
+
+def ensure_partitions(db: Session, months_ahead: int, now: Optional[datetime] = None) -> List[str]:
+    """
+    创建当月及之后months_ahead个月的分区，返回新建的分区名
+    
+    默认分区中已有落在新分区范围内的数据时创建会失败，此时记录错误并跳过该分区。
+    """
+    existing = set(_partitions(db))
+    month = _month_start(now or datetime.utcnow())
+    created = []
+    
+    for _ in range(months_ahead + 1):
+        end = _next_month(month)
+        name = _partition_name(month)
+        if name not in existing:
+            try:
+                db.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF audit_logs "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                ))
+                db.commit()
+                created.append(name)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"创建审计日志分区{name}失败: {e}")
+        month = end
+    
+    # 默认分区只应在分区未及时创建时接收数据
+    if db.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION})")):
+        logger.warning(f"审计日志默认分区{DEFAULT_PARTITION}中有数据，请检查分区维护任务是否按时运行")
+    
+    return created
+
+def drop_expired_partitions(db: Session, retention_days: int, now: Optional[datetime] = None) -> List[str]:
+    """删除整月都超出保留期的分区，返回删除的分区名"""
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    dropped = []
+    
+    for name in sorted(_partitions(db)):
+        match = PARTITION_PATTERN.match(name)
+        if not match:
+            continue
+        month = datetime(int(match.group(1)), int(match.group(2)), 1)
+        if _next_month(month) <= cutoff:
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+            dropped.append(name)
+    
+    return dropped
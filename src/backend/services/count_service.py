@@ -0,0 +1,73 @@
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
+import json
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from core import config, cache
+from models import schemas
+from utils import pagination_utils
+
+# 用户列表总数缓存的版本号，用户的论文、分析、报告发生增删或状态变化时自增，
+# 旧版本的缓存随之失效，不需要逐个删除
+GENERATION_KEY = "count_gen:{user_id}"
+GENERATION_TTL_SECONDS = 24 * 3600
+
+def _generation_key(user_id: uuid.UUID) -> str:
+    return GENERATION_KEY.format(user_id=user_id)
+
+async def _cache_key(user_id: uuid.UUID, entity: str, filters: Dict[str, Any]) -> str:
+    """按用户、列表类型和过滤条件生成缓存键"""
+    generation = await cache.get_json_async(_generation_key(user_id)) or 0
+    digest = hashlib.sha1(
+        json.dumps(filters, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+    return f"count:{user_id}:{generation}:{entity}:{digest}"
+
+def invalidate(user_id: uuid.UUID):
+    """使用户的列表总数缓存失效（Celery任务中调用）"""
+    cache.incr(_generation_key(user_id), GENERATION_TTL_SECONDS)
+
+async def invalidate_async(user_id: uuid.UUID):
+    """使用户的列表总数缓存失效（异步）"""
+    await cache.incr_async(_generation_key(user_id), GENERATION_TTL_SECONDS)
+
+async def _cached_total(mode: schemas.TotalMode, key: str) -> Optional[int]:
+    """读取缓存的总数，exact模式不读缓存"""
+    if mode == schemas.TotalMode.exact:
+        return None
+    return await cache.get_json_async(key)
+
+async def get_total_async(
+    db: AsyncSession, 
+    user_id: uuid.UUID, 
+    entity: str, 
+    stmt: Select, 
+    filters: Dict[str, Any], 
+    mode: schemas.TotalMode = schemas.TotalMode.cached
+) -> Tuple[Optional[int], bool]:
+    """
+    获取列表总数，返回(总数, 是否为估算值)（异步）
+    
+    cached: 优先读缓存，未命中时精确统计并写入缓存
+    exact: 精确统计并刷新缓存
+    estimate: 优先读缓存，未命中时使用查询计划的行数估算，不执行COUNT
+    none: 不返回总数
+    """
+    if mode == schemas.TotalMode.none:
+        return None, False
+    
+    key = await _cache_key(user_id, entity, filters)
+    total = await _cached_total(mode, key)
+    if total is not None:
+        return total, False
+    
+    if mode == schemas.TotalMode.estimate:
+        plan = await db.scalar(pagination_utils.Explain(stmt))
+        return int(pagination_utils.plan_root(plan)["Plan Rows"]), True
+    
+    total = await db.scalar(pagination_utils.count_statement(stmt))
+    await cache.set_json_async(key, total, config.COUNT_CACHE_TTL_SECONDS)
+    
+    return total, False
@@ -0,0 +1,145 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import delete, update, values, column, func, Integer, DateTime
+from sqlalchemy.dialects.postgresql import UUID, insert
+from datetime import datetime, timedelta
+import uuid
+import logging
+import redis
+from typing import Dict, Optional, Tuple
+
+from models import models
+from core import cache
+
+logger = logging.getLogger(__name__)
+
+# 写后缓冲的Redis哈希键
+REPORT_ACCESS_KEY = "wb:report_access"
+USER_LAST_LOGIN_KEY = "wb:user_last_login"
+API_KEY_LAST_USED_KEY = "wb:api_key_last_used"
+
+# 已落库批次的保留天数，落库失败的批次在此期间内重试不会重复累加
+BATCH_RETENTION_DAYS = 7
+
+async def _buffer_async(command: str, key: str, field: uuid.UUID, value):
+    """写入缓冲区（在请求路径上调用，使用异步客户端），Redis不可用时丢弃（此类数据允许少量丢失）"""
+    try:
+        await getattr(cache.get_async_redis(), command)(key, str(field), value)
+    except redis.RedisError as e:
+        logger.warning(f"写后缓冲写入失败 {key}: {e}")
+
+async def increment_report_access_async(report_id: uuid.UUID, amount: int = 1):
+    """累加报告访问次数"""
+    await _buffer_async("hincrby", REPORT_ACCESS_KEY, report_id, amount)
+
+async def record_user_login_async(user_id: uuid.UUID, timestamp: Optional[datetime] = None):
+    """记录用户最后登录时间"""
+    await _buffer_async("hset", USER_LAST_LOGIN_KEY, user_id, (timestamp or datetime.utcnow()).isoformat())
+
+async def record_api_key_use_async(api_key_id: uuid.UUID, timestamp: Optional[datetime] = None):
+    """记录API密钥最后使用时间"""
+    await _buffer_async("hset", API_KEY_LAST_USED_KEY, api_key_id, (timestamp or datetime.utcnow()).isoformat())
+
+def _drain(key: str) -> Tuple[Optional[uuid.UUID], Dict[str, str]]:
+    """
+    取出缓冲区内容，返回(批次id, 内容)
+
+    先将哈希原子地重命名为待落库键，新的写入会进入新的哈希；
+    若已有待落库键（上次落库失败遗留，或与另一次落库重叠），则先处理其中的数据，沿用其批次id。
+    """
+    client = cache.get_redis()
+    flushing_key = f"{key}:flushing"
+    batch_key = f"{key}:batch"
+    if not cache.take_pending(key, flushing_key):
+        # 缓冲区为空
+        return None, {}
+    client.set(batch_key, str(uuid.uuid4()), nx=True)
+    pipe = client.pipeline(transaction=False)
+    pipe.get(batch_key)
+    pipe.hgetall(flushing_key)
+    batch_id, pending = pipe.execute()
+    return uuid.UUID(batch_id), pending
+
+def _ack(key: str):
+    """落库成功后删除待落库键和批次id（同一命令删除，不会只删除其一）"""
+    cache.get_redis().delete(f"{key}:flushing", f"{key}:batch")
+
+def _claim_batch(db: Session, batch_id: uuid.UUID, now: datetime) -> bool:
+    """在落库事务中记录批次，批次已落库过时返回False，并清理超过保留期的批次"""
+    db.execute(delete(models.CounterBatch).where(
+        models.CounterBatch.applied_at < now - timedelta(days=BATCH_RETENTION_DAYS)
+    ))
+    claimed = db.execute(
+        insert(models.CounterBatch)
+        .values(batch_id=batch_id, applied_at=now)
+        .on_conflict_do_nothing(index_elements=[models.CounterBatch.batch_id])
+        .returning(models.CounterBatch.batch_id)
+    ).first()
+    return claimed is not None
+
+def flush_report_access(db: Session) -> int:
+    """
+    批量落库报告访问次数
+
+    累加不是幂等的：批次id与计数在同一事务中提交，提交后删除Redis中的批次前失败时，
+    重试发现批次已落库，直接删除批次，不会重复累加。
+    """
+    batch_id, pending = _drain(REPORT_ACCESS_KEY)
+    if not pending:
+        return 0
+
+    if not _claim_batch(db, batch_id, datetime.utcnow()):
+        db.commit()
+        _ack(REPORT_ACCESS_KEY)
+        logger.warning(f"报告访问次数批次{batch_id}已落库，跳过")
+        return 0
+
+    rows = values(
+        column("id", UUID(as_uuid=True)),
+        column("delta", Integer),
+        name="pending"
+    ).data([(uuid.UUID(report_id), int(delta)) for report_id, delta in pending.items()])
+
+    db.execute(
+        update(models.Report)
+        .where(models.Report.id == rows.c.id)
+        .values(
+            access_count=func.coalesce(models.Report.access_count, 0) + rows.c.delta,
+            # 计数变化不视为报告内容更新
+            updated_at=models.Report.updated_at
+        )
+    )
+    db.commit()
+    _ack(REPORT_ACCESS_KEY)
+
+    return len(pending)
+
+def _flush_timestamps(db: Session, key: str, model, column_name: str) -> int:
+    """批量落库时间戳，只会向后推进（重复落库结果不变，不需要记录批次）"""
+    _, pending = _drain(key)
+    if not pending:
+        return 0
+
+    rows = values(
+        column("id", UUID(as_uuid=True)),
+        column("ts", DateTime),
+        name="pending"
+    ).data([(uuid.UUID(entity_id), datetime.fromisoformat(ts)) for entity_id, ts in pending.items()])
+
+    target = getattr(model, column_name)
+    update_values = {column_name: func.greatest(target, rows.c.ts)}
+    if hasattr(model, "updated_at"):
+        update_values["updated_at"] = model.updated_at
+
+    db.execute(update(model).where(model.id == rows.c.id).values(**update_values))
+    db.commit()
+    _ack(key)
+
+    return len(pending)
+
+def flush_all(db: Session) -> Dict[str, int]:
+    """落库全部写后缓冲"""
+    return {
+        "report_access": flush_report_access(db),
+        "user_last_login": _flush_timestamps(db, USER_LAST_LOGIN_KEY, models.User, "last_login_at"),
+        "api_key_last_used": _flush_timestamps(db, API_KEY_LAST_USED_KEY, models.APIKey, "last_used_at"),
+    }
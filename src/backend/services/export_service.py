@@ -0,0 +1,133 @@
+from sqlalchemy.orm import Session, undefer
+from datetime import datetime
+import uuid
+import json
+import zipfile
+import logging
+from typing import Iterator
+
+from models import models, schemas
+from database import SessionLocal
+from utils import storage_utils, zip_utils
+from services import archive_service
+
+logger = logging.getLogger(__name__)
+
+# 每批从数据库读取的行数
+EXPORT_BATCH_SIZE = 100
+
+# 已压缩的格式直接存储，不再压缩
+STORED_FORMATS = {"pdf", "docx"}
+
+def _export_query(db: Session, user_id: uuid.UUID, export_filter: schemas.ReportExportFilter, *entities):
+    """构建导出范围内报告的查询"""
+    query = db.query(*entities).select_from(models.Report).join(
+        models.Analysis, models.Report.analysis_id == models.Analysis.id
+    ).join(
+        models.Paper, models.Analysis.paper_id == models.Paper.id
+    ).filter(
+        models.Report.user_id == user_id,
+        models.Report.file_path.isnot(None)
+    )
+    
+    if export_filter.paper_ids:
+        query = query.filter(models.Paper.id.in_(export_filter.paper_ids))
+    
+    if export_filter.tags:
+        query = query.filter(models.Paper.tags.contains(export_filter.tags))
+    
+    if export_filter.created_from:
+        query = query.filter(models.Report.created_at >= export_filter.created_from)
+    
+    if export_filter.created_to:
+        query = query.filter(models.Report.created_at < export_filter.created_to)
+    
+    return query
+
+def _artifact_name(report_id: uuid.UUID, report_format: str) -> str:
+    """报告文件在压缩包中的路径"""
+    return f"reports/{report_id}.{report_format or 'pdf'}"
+
+def _iter_manifest(db: Session, user_id: uuid.UUID, export_filter: schemas.ReportExportFilter) -> Iterator[bytes]:
+    """
+    逐行生成NDJSON清单，每个分析一行
+
+    按分析排序读取，同一分析的报告相邻，因此只需缓存当前分析的报告列表。
+    """
+    rows = _export_query(
+        db, user_id, export_filter,
+        models.Analysis, models.Paper.title,
+        models.Report.id, models.Report.title, models.Report.format, models.Report.created_at
+    ).options(
+        undefer(models.Analysis.result_data)
+    ).order_by(
+        models.Analysis.created_at, models.Analysis.id, models.Report.created_at
+    ).yield_per(EXPORT_BATCH_SIZE)
+    
+    current = None
+    for analysis, paper_title, report_id, report_title, report_format, report_created_at in rows:
+        if current is None or current["analysis_id"] != analysis.id:
+            if current is not None:
+                yield (json.dumps(current, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+            current = {
+                "analysis_id": analysis.id,
+                "paper_id": analysis.paper_id,
+                "paper_title": paper_title,
+                "analysis_type": analysis.analysis_type,
+                "status": analysis.status,
+                "created_at": analysis.created_at,
+                "completed_at": analysis.completed_at,
+                "result_data": archive_service.rehydrate_raw_analysis(analysis).result_data,
+                "reports": [],
+            }
+        current["reports"].append({
+            "id": report_id,
+            "title": report_title,
+            "format": report_format,
+            "created_at": report_created_at,
+            "file": _artifact_name(report_id, report_format),
+        })
+    
+    if current is not None:
+        yield (json.dumps(current, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+def _iter_artifacts(db: Session, user_id: uuid.UUID, export_filter: schemas.ReportExportFilter) -> Iterator[zip_utils.ZipEntry]:
+    """逐个生成报告文件条目"""
+    rows = _export_query(
+        db, user_id, export_filter,
+        models.Report.id, models.Report.file_path, models.Report.format, models.Report.updated_at
+    ).order_by(models.Report.created_at, models.Report.id).yield_per(EXPORT_BATCH_SIZE)
+    
+    for report_id, file_path, report_format, updated_at in rows:
+        if not storage_utils.file_exists(file_path):
+            logger.warning(f"导出时报告文件不存在: {report_id}")
+            continue
+        
+        yield zip_utils.ZipEntry(
+            name=_artifact_name(report_id, report_format),
+            modified=updated_at or datetime.utcnow(),
+            chunks=storage_utils.iter_file_chunks(file_path),
+            compress_type=zipfile.ZIP_STORED if report_format in STORED_FORMATS else zipfile.ZIP_DEFLATED
+        )
+
+def _iter_entries(db: Session, user_id: uuid.UUID, export_filter: schemas.ReportExportFilter) -> Iterator[zip_utils.ZipEntry]:
+    """压缩包条目：清单在前，报告文件在后"""
+    yield zip_utils.ZipEntry(
+        name="manifest.ndjson",
+        modified=datetime.utcnow(),
+        chunks=_iter_manifest(db, user_id, export_filter)
+    )
+    yield from _iter_artifacts(db, user_id, export_filter)
+
+def stream_export(user_id: uuid.UUID, export_filter: schemas.ReportExportFilter) -> Iterator[bytes]:
+    """
+    流式导出报告文件与分析结果清单
+
+    数据库按批读取，文件按块读取，压缩包边生成边发送，内存占用不随导出数量增长。
+    使用独立的数据库会话，生命周期与响应流一致。
+    """
+    db = SessionLocal()
+    try:
+        yield from zip_utils.stream_zip(_iter_entries(db, user_id, export_filter))
+    finally:
+        db.close()
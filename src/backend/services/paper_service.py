@@ -1,26 +1,33 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy.orm import undefer_group
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, Select
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
 import uuid
 import os
 import hashlib
 import shutil
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Dict, Any
 
 from models import models, schemas
 from core import config
-from utils import pdf_utils
+from services import archive_service, count_service
+from utils import pdf_utils, pagination_utils
 
-async def upload_paper(
-    db: Session, 
-    user_id: uuid.UUID, 
-    file: UploadFile, 
-    title: Optional[str] = None, 
-    authors: Optional[List[str]] = None, 
-    tags: Optional[List[str]] = None
-):
-    """上传论文"""
+# 全文检索的文本检索配置，须与papers_search_vector_update触发器一致
+SEARCH_CONFIG = "english"
+# 生成摘要片段时最多读取的字符数
+SNIPPET_SOURCE_CHARS = 20000
+HIGHLIGHT_OPTIONS = "StartSel=<mark>, StopSel=</mark>"
+SNIPPET_OPTIONS = "MaxFragments=2, MinWords=10, MaxWords=30, FragmentDelimiter=\" ... \""
+# 参与生成论文向量的字段
+EMBEDDING_FIELDS = {"title", "authors", "metadata"}
+# 与模型属性名不同的字段（metadata是Declarative的保留属性名）
+PAPER_ATTRIBUTES = {"metadata": "metadata_"}
+
+def _save_paper_file(user_id: uuid.UUID, file: UploadFile) -> Tuple[str, str, int, Dict[str, Any]]:
+    """保存上传文件并提取PDF信息，返回(文件路径, 文件哈希, 文件大小, PDF信息)"""
     # 创建存储目录
     storage_path = os.path.join(config.STORAGE_PATH, "papers", str(user_id))
     os.makedirs(storage_path, exist_ok=True)
@@ -44,6 +51,19 @@ async def upload_paper(
     # 提取PDF信息
     pdf_info = pdf_utils.extract_pdf_info(file_path)
     
+    return file_path, file_hash, file_size, pdf_info
+
+def _build_paper(
+    user_id: uuid.UUID, 
+    file_path: str, 
+    file_hash: str, 
+    file_size: int, 
+    pdf_info: Dict[str, Any], 
+    title: Optional[str], 
+    authors: Optional[List[str]], 
+    tags: Optional[List[str]]
+) -> models.Paper:
+    """构建论文记录"""
     # 如果未提供标题，使用提取的标题
     if not title and pdf_info.get("title"):
         title = pdf_info.get("title")
@@ -52,8 +72,7 @@ async def upload_paper(
     if not authors and pdf_info.get("authors"):
         authors = pdf_info.get("authors")
     
-    # 创建论文记录
-    db_paper = models.Paper(
+    return models.Paper(
         title=title,
         authors=authors,
         upload_date=datetime.utcnow(),
@@ -61,99 +80,291 @@ async def upload_paper(
         file_size=file_size,
         file_hash=file_hash,
         user_id=user_id,
-        metadata=pdf_info,
+        metadata_={k: v for k, v in pdf_info.items() if k != "text"},
         status="uploaded",
         tags=tags,
         doi=pdf_info.get("doi"),
         publication_info=pdf_info.get("publication_info"),
+        extracted_text=pdf_info.get("text"),
         is_public=False
     )
+
+async def upload_paper_async(
+    db: AsyncSession, 
+    user_id: uuid.UUID, 
+    file: UploadFile, 
+    title: Optional[str] = None, 
+    authors: Optional[List[str]] = None, 
+    tags: Optional[List[str]] = None
+):
+    """上传论文（异步）"""
+    # 文件写入和PDF解析放到线程池，避免阻塞事件循环
+    file_path, file_hash, file_size, pdf_info = await run_in_threadpool(_save_paper_file, user_id, file)
+    
+    # 创建论文记录
+    db_paper = _build_paper(user_id, file_path, file_hash, file_size, pdf_info, title, authors, tags)
     
     db.add(db_paper)
-    db.commit()
-    db.refresh(db_paper)
+    await db.commit()
+    await db.refresh(db_paper)
     
-    # 异步提取文本内容
-    # TODO: 使用Celery任务异步处理
+    # 列表总数缓存失效
+    await count_service.invalidate_async(user_id)
     
     return db_paper
 
-def get_papers(
-    db: Session, 
+def _search_condition(query: str):
+    """全文检索条件，支持引号短语、OR和-排除等websearch语法"""
+    return models.Paper.search_vector.bool_op("@@")(
+        func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    )
+
+def _papers_statement(
     user_id: uuid.UUID, 
-    page: int = 1, 
-    limit: int = 20, 
     status: Optional[str] = None, 
     tags: Optional[List[str]] = None, 
+    author: Optional[str] = None, 
     search: Optional[str] = None
-) -> Tuple[List[models.Paper], int]:
-    """获取论文列表"""
-    query = db.query(models.Paper).filter(models.Paper.user_id == user_id)
+) -> Select:
+    """构建论文列表查询"""
+    stmt = select(models.Paper).options(
+        pagination_utils.schema_columns(models.Paper, schemas.Paper)
+    ).where(models.Paper.user_id == user_id)
     
     # 应用过滤条件
     if status:
-        query = query.filter(models.Paper.status == status)
+        stmt = stmt.where(models.Paper.status == status)
     
+    # 标签、作者使用@>包含查询，可走GIN索引
     if tags:
-        for tag in tags:
-            query = query.filter(models.Paper.tags.contains([tag]))
+        stmt = stmt.where(models.Paper.tags.contains(tags))
+    
+    if author:
+        stmt = stmt.where(models.Paper.authors.contains([author]))
     
     if search:
-        query = query.filter(or_(
-            models.Paper.title.ilike(f"%{search}%"),
-            func.array_to_string(models.Paper.tags, ',').ilike(f"%{search}%")
-        ))
+        stmt = stmt.where(_search_condition(search))
     
-    # 计算总数
-    total = query.count()
+    return stmt.order_by(models.Paper.upload_date.desc(), models.Paper.id.desc())
+
+async def get_papers_async(
+    db: AsyncSession, 
+    user_id: uuid.UUID, 
+    page: int = 1, 
+    limit: int = 20, 
+    status: Optional[str] = None, 
+    tags: Optional[List[str]] = None, 
+    author: Optional[str] = None, 
+    search: Optional[str] = None, 
+    total_mode: schemas.TotalMode = schemas.TotalMode.cached
+) -> pagination_utils.OffsetPage:
+    """获取论文列表，总数按total_mode获取（异步）"""
+    stmt = _papers_statement(user_id, status, tags, author, search)
     
     # 应用分页
-    query = query.order_by(models.Paper.upload_date.desc())
-    query = query.offset((page - 1) * limit).limit(limit)
+    papers = (await db.scalars(pagination_utils.page_statement(stmt, page, limit))).all()
+    
+    # 获取总数
+    total, total_estimated = await count_service.get_total_async(
+        db, user_id, "papers", stmt, {"status": status, "tags": tags, "author": author, "search": search}, total_mode
+    )
+    
+    return pagination_utils.offset_page(papers, limit, total, total_estimated)
+
+async def get_papers_page_async(
+    db: AsyncSession, 
+    user_id: uuid.UUID, 
+    limit: int = 20, 
+    cursor: Optional[str] = None, 
+    status: Optional[str] = None, 
+    tags: Optional[List[str]] = None, 
+    author: Optional[str] = None, 
+    search: Optional[str] = None, 
+    total_mode: schemas.TotalMode = schemas.TotalMode.none
+) -> pagination_utils.KeysetPage:
+    """
+    按游标获取论文列表（异步）
+    
+    按(upload_date, id)倒序分页，默认不统计总数，翻页深度不影响查询代价。游标格式不正确时抛出ValueError。
+    """
+    base_stmt = _papers_statement(user_id, status, tags, author, search)
+    stmt = pagination_utils.keyset_statement(
+        base_stmt, 
+        models.Paper.upload_date, 
+        models.Paper.id, 
+        limit, 
+        cursor
+    )
+    papers = (await db.scalars(stmt)).all()
+    
+    # 获取总数（默认不统计）
+    total, total_estimated = await count_service.get_total_async(
+        db, user_id, "papers", base_stmt, {"status": status, "tags": tags, "author": author, "search": search}, total_mode
+    )
     
-    return query.all(), total
+    return pagination_utils.keyset_page(papers, limit, cursor, "upload_date", total, total_estimated)
 
-def get_paper(db: Session, paper_id: uuid.UUID, user_id: uuid.UUID):
-    """获取论文详情"""
-    return db.query(models.Paper).filter(
+def _search_statement(user_id: uuid.UUID, query: str) -> Select:
+    """构建全文检索的匹配查询"""
+    return select(models.Paper.id).where(
+        models.Paper.user_id == user_id,
+        _search_condition(query)
+    )
+
+def _search_results_statement(match_stmt: Select, query: str, page: int, limit: int) -> Select:
+    """
+    构建全文检索结果查询
+    
+    先在子查询中按相关度排序并截取当前页，再只为当前页的论文生成高亮标题和摘要片段，
+    避免对所有匹配的论文执行ts_headline。
+    """
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+    rank = func.ts_rank_cd(models.Paper.search_vector, tsquery)
+    
+    matches = pagination_utils.page_statement(
+        match_stmt.add_columns(rank.label("rank")).order_by(rank.desc(), models.Paper.id.desc()), 
+        page, 
+        limit
+    ).subquery()
+    
+    # 摘要优先，没有摘要时使用正文开头
+    snippet_source = func.left(
+        func.coalesce(models.Paper.metadata_["abstract"].astext, models.Paper.extracted_text), 
+        SNIPPET_SOURCE_CHARS
+    )
+    
+    return select(
+        models.Paper, 
+        matches.c.rank, 
+        func.ts_headline(SEARCH_CONFIG, models.Paper.title, tsquery, HIGHLIGHT_OPTIONS).label("title_highlight"), 
+        func.ts_headline(SEARCH_CONFIG, snippet_source, tsquery, f"{HIGHLIGHT_OPTIONS}, {SNIPPET_OPTIONS}").label("snippet")
+    ).options(
+        pagination_utils.schema_columns(models.Paper, schemas.Paper)
+    ).join(
+        matches, models.Paper.id == matches.c.id
+    ).order_by(matches.c.rank.desc(), models.Paper.id.desc())
+
+def _search_result(row) -> schemas.PaperSearchResult:
+    """将检索结果行转换为响应模型"""
+    paper, rank, title_highlight, snippet = row
+    return schemas.PaperSearchResult(
+        **schemas.Paper.from_orm(paper).dict(), 
+        rank=rank, 
+        title_highlight=title_highlight, 
+        snippet=snippet
+    )
+
+async def search_papers_async(
+    db: AsyncSession, 
+    user_id: uuid.UUID, 
+    query: str, 
+    page: int = 1, 
+    limit: int = 20, 
+    total_mode: schemas.TotalMode = schemas.TotalMode.cached
+) -> pagination_utils.OffsetPage:
+    """
+    全文检索论文，按相关度排序（异步）
+    
+    检索标题、作者、标签、摘要和正文，返回高亮的标题和摘要片段。
+    """
+    match_stmt = _search_statement(user_id, query)
+    
+    rows = (await db.execute(_search_results_statement(match_stmt, query, page, limit))).all()
+    
+    # 获取总数
+    total, total_estimated = await count_service.get_total_async(
+        db, user_id, "paper_search", match_stmt, {"query": query}, total_mode
+    )
+    
+    return pagination_utils.offset_page([_search_result(row) for row in rows], limit, total, total_estimated)
+
+def _paper_statement(paper_id: uuid.UUID, user_id: uuid.UUID) -> Select:
+    """构建论文详情查询，加载正文、元数据等大字段"""
+    return select(models.Paper).options(undefer_group("content")).where(
+        models.Paper.id == paper_id,
+        models.Paper.user_id == user_id
+    )
+
+async def get_paper_async(db: AsyncSession, paper_id: uuid.UUID, user_id: uuid.UUID, rehydrate: bool = True):
+    """获取论文详情（异步），extracted_text已归档时从存储补回（rehydrate为False时跳过）"""
+    paper = (await db.scalars(_paper_statement(paper_id, user_id))).first()
+    if paper and rehydrate:
+        await archive_service.rehydrate_extracted_text_async(paper)
+    return paper
+
+def _owned_paper_statement(paper_id: uuid.UUID, user_id: uuid.UUID) -> Select:
+    """构建论文归属查询，不加载大字段（更新、删除前只需确认论文存在且属于该用户）"""
+    return select(models.Paper).where(
         models.Paper.id == paper_id,
         models.Paper.user_id == user_id
-    ).first()
+    )
+
+async def paper_exists_async(db: AsyncSession, paper_id: uuid.UUID, user_id: uuid.UUID) -> bool:
+    """论文是否存在且属于该用户（异步）"""
+    stmt = _owned_paper_statement(paper_id, user_id).with_only_columns(models.Paper.id)
+    return await db.scalar(stmt) is not None
 
-def update_paper(db: Session, paper_id: uuid.UUID, user_id: uuid.UUID, paper_update: schemas.PaperUpdate):
-    """更新论文信息"""
-    db_paper = get_paper(db, paper_id, user_id)
+def _apply_paper_update(db_paper: models.Paper, paper_update: schemas.PaperUpdate):
+    """将更新内容应用到论文记录"""
+    update_data = paper_update.dict(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(db_paper, PAPER_ATTRIBUTES.get(key, key), value)
+    
+    # 向量由标题、作者和摘要生成，变更后清空，由后台任务重新生成
+    if EMBEDDING_FIELDS & update_data.keys():
+        db_paper.embedding = None
+
+async def update_paper_async(db: AsyncSession, paper_id: uuid.UUID, user_id: uuid.UUID, paper_update: schemas.PaperUpdate):
+    """更新论文信息（异步）"""
+    db_paper = (await db.scalars(_owned_paper_statement(paper_id, user_id))).first()
     
     if not db_paper:
         return None
     
     # 更新论文信息
-    update_data = paper_update.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_paper, key, value)
+    _apply_paper_update(db_paper, paper_update)
     
-    db.commit()
-    db.refresh(db_paper)
+    await db.commit()
+    # 重新读取并加载大字段，用于返回论文详情
+    db_paper = (await db.scalars(
+        _paper_statement(paper_id, user_id).execution_options(populate_existing=True)
+    )).first()
+    await archive_service.rehydrate_extracted_text_async(db_paper)
+    
+    # 列表总数缓存失效
+    await count_service.invalidate_async(user_id)
     
     return db_paper
 
-def delete_paper(db: Session, paper_id: uuid.UUID, user_id: uuid.UUID):
-    """删除论文"""
-    db_paper = get_paper(db, paper_id, user_id)
+def _remove_paper_file(file_path: str):
+    """删除论文文件"""
+    try:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    except Exception as e:
+        print(f"删除文件失败: {e}")
+
+async def delete_paper_async(db: AsyncSession, paper_id: uuid.UUID, user_id: uuid.UUID):
+    """删除论文（异步）"""
+    db_paper = (await db.scalars(_owned_paper_statement(paper_id, user_id))).first()
     
     if not db_paper:
         return False
     
+    # 论文的分析、报告和分享链接随外键级联删除，先读取分享码，提交后清除分享解析缓存
+    from services import report_service
+    share_codes = await report_service.get_paper_share_codes_async(db, paper_id)
+    
     # 删除文件
-    try:
-        if os.path.exists(db_paper.file_path):
-            os.remove(db_paper.file_path)
-    except Exception as e:
-        print(f"删除文件失败: {e}")
+    await run_in_threadpool(_remove_paper_file, db_paper.file_path)
     
     # 删除数据库记录
-    db.delete(db_paper)
-    db.commit()
+    await db.delete(db_paper)
+    await db.commit()
+    await report_service.invalidate_share_codes_async(share_codes)
+    
+    # 列表总数缓存失效
+    await count_service.invalidate_async(user_id)
     
     return True
 
@@ -165,4 +376,4 @@ def calculate_file_hash(file_path: str) -> str:
         for byte_block in iter(lambda: f.read(4096), b""):
             sha256_hash.update(byte_block)
     
-    return sha256_hash.hexdigest()
\ No newline at end of file
+    return sha256_hash.hexdigest()
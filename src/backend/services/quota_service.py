@@ -0,0 +1,295 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, Select
+from sqlalchemy.dialects.postgresql import insert
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+import logging
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+from models import models, schemas
+from core import config, cache, metrics
+from services import subscription_service
+
+logger = logging.getLogger(__name__)
+
+# 月度用量项，与usage_limits中的键、usage_counters表的列一致
+PAPERS = "papers"
+ANALYSES = "analyses"
+REPORTS = "reports"
+TOKENS = "tokens"
+METRICS = (PAPERS, ANALYSES, REPORTS, TOKENS)
+
+# 用量哈希 quota:usage:<用户id>:<YYYY-MM>，字段为各用量项；
+# 有变化的 <用户id>:<YYYY-MM> 记入待落库集合，由reconcile_usage写入usage_counters
+USAGE_KEY = "quota:usage:{user_id}:{period}"
+DIRTY_KEY = "quota:dirty"
+# 从usage_counters恢复后写入的标记，标记不存在说明Redis数据已丢失
+RESTORED_KEY = "quota:restored"
+# 用量哈希在月末后保留的天数，期间的用量仍可落库
+USAGE_TTL_SECONDS = 40 * 24 * 3600
+
+# 检查并累加用量：ARGV为过期秒数、待落库成员，之后每三个一组(用量项, 增量, 上限)，上限为-1表示不限制。
+# 任意一项累加后超出上限（增量为0的项要求当前用量低于上限）时不做任何修改，返回 {用量项, 当前用量, 上限}
+RESERVE_SCRIPT = """
+for i = 3, #ARGV, 3 do
+    local limit = tonumber(ARGV[i + 2])
+    if limit >= 0 then
+        local used = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0')
+        if used + math.max(tonumber(ARGV[i + 1]), 1) > limit then
+            return {ARGV[i], used, limit}
+        end
+    end
+end
+for i = 3, #ARGV, 3 do
+    if tonumber(ARGV[i + 1]) ~= 0 then
+        redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('SADD', KEYS[2], ARGV[2])
+return {}
+"""
+
+# 从usage_counters恢复：各项取Redis与数据库中的较大值。ARGV为过期秒数，之后每两个一组(用量项, 用量)
+RESTORE_SCRIPT = """
+for i = 2, #ARGV, 2 do
+    local used = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0')
+    if tonumber(ARGV[i + 1]) > used then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+METRIC_NAMES = {
+    PAPERS: "论文上传",
+    ANALYSES: "论文分析",
+    REPORTS: "报告生成",
+    TOKENS: "模型token",
+}
+
+_scripts = {}
+_async_scripts = {}
+
+class QuotaExceededError(Exception):
+    """超出月度配额"""
+    
+    def __init__(self, metric: str, used: int, limit: int):
+        self.metric = metric
+        self.used = used
+        self.limit = limit
+        super().__init__(f"已超出本月{METRIC_NAMES.get(metric, metric)}配额（{used}/{limit}）")
+
+def _script(source: str):
+    """注册Lua脚本（执行时使用EVALSHA，脚本不在Redis中时自动重新加载）"""
+    if source not in _scripts:
+        _scripts[source] = cache.get_redis().register_script(source)
+    return _scripts[source]
+
+def _async_script(source: str):
+    """注册Lua脚本，由异步Redis客户端执行（请求路径使用）"""
+    if source not in _async_scripts:
+        _async_scripts[source] = cache.get_async_redis().register_script(source)
+    return _async_scripts[source]
+
+def current_period(now: Optional[datetime] = None) -> date:
+    """当前统计月份（当月1日，UTC）"""
+    now = now or datetime.utcnow()
+    return date(now.year, now.month, 1)
+
+def _next_period(period: date) -> date:
+    return date(period.year + period.month // 12, period.month % 12 + 1, 1)
+
+def _usage_key(user_id, period: date) -> str:
+    return USAGE_KEY.format(user_id=user_id, period=f"{period:%Y-%m}")
+
+def _dirty_member(user_id, period: date) -> str:
+    return f"{user_id}:{period:%Y-%m}"
+
+def get_limits(plan: schemas.SubscriptionPlan) -> Dict[str, Optional[int]]:
+    """各用量项的月度上限，None表示不限制"""
+    source = plan.usage_limits if plan.plan_type is not None else config.QUOTA_DEFAULT_LIMITS
+    limits = {}
+    for metric in METRICS:
+        value = source.get(metric)
+        limits[metric] = int(value) if value is not None else None
+    return limits
+
+def _usage_args(user_id: uuid.UUID, period: date, amounts: Dict[str, int], limits: Dict[str, Optional[int]]) -> list:
+    """RESERVE_SCRIPT的参数，limits中没有的用量项不限制"""
+    args = [USAGE_TTL_SECONDS, _dirty_member(user_id, period)]
+    for metric, amount in amounts.items():
+        limit = limits.get(metric)
+        args += [metric, amount, -1 if limit is None else limit]
+    return args
+
+async def _reserve(user_id: uuid.UUID, plan: schemas.SubscriptionPlan, amounts: Dict[str, int]) -> bool:
+    """
+    检查并累加用量，超出上限时抛出QuotaExceededError，返回是否已累加
+    
+    Redis不可用时放行，不记录用量，返回False（之后不需要撤回）。
+    """
+    period = current_period()
+    args = _usage_args(user_id, period, amounts, get_limits(plan))
+    try:
+        rejected = await _async_script(RESERVE_SCRIPT)(keys=[_usage_key(user_id, period), DIRTY_KEY], args=args)
+    except redis.RedisError as e:
+        metrics.QUOTA_CHECKS.labels("redis_error").inc()
+        logger.warning(f"配额检查失败，放行请求: {e}")
+        return False
+    if rejected:
+        metrics.QUOTA_CHECKS.labels("rejected").inc()
+        metric, used, limit = rejected
+        raise QuotaExceededError(metric, int(used), int(limit))
+    metrics.QUOTA_CHECKS.labels("allowed").inc()
+    return True
+
+async def _release(user_id: uuid.UUID, amounts: Dict[str, int]):
+    """撤回已累加的用量（后续操作失败时）"""
+    period = current_period()
+    args = _usage_args(user_id, period, {metric: -amount for metric, amount in amounts.items() if amount}, {})
+    try:
+        await _async_script(RESERVE_SCRIPT)(keys=[_usage_key(user_id, period), DIRTY_KEY], args=args)
+    except redis.RedisError as e:
+        logger.warning(f"撤回用量失败 {user_id} {amounts}: {e}")
+
+def record_usage(user_id: uuid.UUID, amounts: Dict[str, int]):
+    """累加用量，不检查上限（如分析完成后的模型token数，在Celery任务中调用）"""
+    period = current_period()
+    args = _usage_args(user_id, period, amounts, {})
+    try:
+        _script(RESERVE_SCRIPT)(keys=[_usage_key(user_id, period), DIRTY_KEY], args=args)
+    except redis.RedisError as e:
+        logger.warning(f"记录用量失败 {user_id} {amounts}: {e}")
+
+@asynccontextmanager
+async def reserve_async(db: AsyncSession, user_id: uuid.UUID, metric: str, amount: int = 1, require: Tuple[str, ...] = ()):
+    """
+    占用配额后执行代码块，代码块抛出异常时撤回
+    
+    require中的用量项不累加，只要求当前用量低于上限（如分析前检查token用量）。
+    订阅计划和用量都从Redis读取，缓存命中时不查询数据库。Redis不可用时未累加用量，也不撤回。
+    """
+    amounts = {metric: amount, **{name: 0 for name in require}}
+    reserved = await _reserve(user_id, await subscription_service.get_subscription_plan_async(db, user_id), amounts)
+    try:
+        yield
+    except BaseException:
+        if reserved:
+            await _release(user_id, amounts)
+        raise
+
+async def _get_used(user_id: uuid.UUID, period: date) -> Dict[str, int]:
+    try:
+        used = await cache.get_async_redis().hgetall(_usage_key(user_id, period))
+    except redis.RedisError as e:
+        logger.warning(f"读取用量失败 {user_id}: {e}")
+        used = {}
+    return {metric: int(used.get(metric, 0)) for metric in METRICS}
+
+def _build_usage(plan: schemas.SubscriptionPlan, used: Dict[str, int], period: date) -> schemas.Usage:
+    limits = get_limits(plan)
+    quotas = {}
+    for metric in METRICS:
+        limit = limits[metric]
+        quotas[metric] = schemas.QuotaItem(
+            limit=limit,
+            used=used[metric],
+            remaining=max(limit - used[metric], 0) if limit is not None else None
+        )
+    return schemas.Usage(
+        plan=plan.plan_type,
+        period_start=datetime(period.year, period.month, 1),
+        period_end=datetime.combine(_next_period(period), datetime.min.time()),
+        quotas=quotas
+    )
+
+async def get_usage_async(db: AsyncSession, user_id: uuid.UUID) -> schemas.Usage:
+    """获取用户本月的用量和配额"""
+    period = current_period()
+    return _build_usage(await subscription_service.get_subscription_plan_async(db, user_id), await _get_used(user_id, period), period)
+
+def _period_counters_statement(period: date) -> Select:
+    return select(models.UsageCounter).where(models.UsageCounter.period == period)
+
+def restore_usage(db: Session) -> int:
+    """
+    Redis数据丢失后从usage_counters恢复本月用量，返回恢复的用户数
+    
+    丢失到恢复之间的用量按较大值合并，期间可能少计，最多放行一个落库间隔内的超额请求。
+    """
+    client = cache.get_redis()
+    if client.exists(RESTORED_KEY):
+        return 0
+    
+    restored = 0
+    script = _script(RESTORE_SCRIPT)
+    for counter in db.scalars(_period_counters_statement(current_period()).execution_options(yield_per=1000)):
+        args = [USAGE_TTL_SECONDS]
+        for metric in METRICS:
+            args += [metric, getattr(counter, metric)]
+        script(keys=[_usage_key(counter.user_id, counter.period)], args=args)
+        restored += 1
+    client.set(RESTORED_KEY, datetime.utcnow().isoformat())
+    
+    if restored:
+        logger.warning(f"Redis中没有配额用量，已从数据库恢复{restored}个用户的用量")
+    return restored
+
+def _drain_dirty() -> List[str]:
+    """取出待落库的成员，做法同counter_service：重命名后读取，落库成功后删除"""
+    flushing_key = f"{DIRTY_KEY}:flushing"
+    if not cache.take_pending(DIRTY_KEY, flushing_key):
+        return []
+    return list(cache.get_redis().smembers(flushing_key))
+
+def flush_usage(db: Session) -> int:
+    """将有变化的用量写入usage_counters（以Redis中的值为准），返回写入的行数"""
+    members = _drain_dirty()
+    if not members:
+        return 0
+    
+    client = cache.get_redis()
+    pipe = client.pipeline(transaction=False)
+    keys = []
+    for member in members:
+        user_id, _, period = member.partition(":")
+        period = datetime.strptime(period, "%Y-%m").date()
+        keys.append((uuid.UUID(user_id), period))
+        pipe.hgetall(_usage_key(user_id, period))
+    
+    now = datetime.utcnow()
+    rows = []
+    for (user_id, period), used in zip(keys, pipe.execute()):
+        # 用量哈希已过期（月份早已结束）时保留数据库中的值
+        if not used:
+            continue
+        rows.append({
+            "user_id": user_id,
+            "period": period,
+            **{metric: int(used.get(metric, 0)) for metric in METRICS},
+            "updated_at": now,
+        })
+    
+    if rows:
+        stmt = insert(models.UsageCounter)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[models.UsageCounter.user_id, models.UsageCounter.period],
+            set_={metric: stmt.excluded[metric] for metric in METRICS + ("updated_at",)}
+        ), rows)
+        db.commit()
+    client.delete(f"{DIRTY_KEY}:flushing")
+    
+    return len(rows)
+
+def reconcile_usage(db: Session) -> Dict[str, int]:
+    """Redis数据丢失时从数据库恢复用量，再将有变化的用量写入数据库"""
+    return {
+        "restored": restore_usage(db),
+        "flushed": flush_usage(db),
+    }
@@ -1,28 +1,24 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, selectinload, undefer
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, tuple_, select, Select
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
 import uuid
 import os
+import secrets
 from typing import List, Optional, Tuple, Dict, Any
 
 from models import models, schemas
-from core import config
-from services import analysis_service
-
-def create_report(db: Session, analysis_id: uuid.UUID, report_create: schemas.ReportCreate):
-    """创建报告"""
-    # 检查分析是否存在
-    analysis = db.query(models.Analysis).filter(models.Analysis.id == analysis_id).first()
-    if not analysis:
-        return None
-    
-    # 检查分析是否已完成
-    if analysis.status != "completed":
-        return None
-    
-    # 创建报告记录
-    db_report = models.Report(
+from core import config, cache
+from database import SessionLocal
+from services import analysis_service, counter_service, count_service
+from utils import pagination_utils
+
+def _build_report(analysis_id: uuid.UUID, user_id: uuid.UUID, report_create: schemas.ReportCreate) -> models.Report:
+    """构建报告记录，user_id为论文所有者"""
+    return models.Report(
         analysis_id=analysis_id,
+        user_id=user_id,
         title=report_create.title,
         created_at=datetime.utcnow(),
         format=report_create.format,
@@ -30,140 +26,421 @@ def create_report(db: Session, analysis_id: uuid.UUID, report_create: schemas.Re
         template_id=report_create.template,
         custom_sections=report_create.sections
     )
+
+def _generate_report_in_session(report_id: uuid.UUID):
+    """使用独立的同步会话生成报告"""
+    db = SessionLocal()
+    try:
+        generate_report(db, report_id)
+    finally:
+        db.close()
+
+async def create_report_async(db: AsyncSession, analysis_id: uuid.UUID, report_create: schemas.ReportCreate):
+    """创建报告（异步）"""
+    # 检查分析是否存在且已完成
+    analysis = (await db.execute(
+        select(models.Analysis.status, models.Analysis.user_id).where(models.Analysis.id == analysis_id)
+    )).first()
+    if not analysis or analysis.status != "completed":
+        return None
+    
+    # 创建报告记录
+    db_report = _build_report(analysis_id, analysis.user_id, report_create)
     
     db.add(db_report)
-    db.commit()
-    db.refresh(db_report)
+    await db.commit()
+    
+    # 列表总数缓存失效
+    await count_service.invalidate_async(analysis.user_id)
     
-    # 启动异步报告生成任务
-    # TODO: 使用Celery任务异步处理
-    # report_tasks.generate_report.delay(str(db_report.id))
+    # 临时模拟报告生成，文件写入放到线程池
+    await run_in_threadpool(_generate_report_in_session, db_report.id)
     
-    # 临时模拟报告生成
-    generate_report(db, db_report.id)
+    await db.refresh(db_report)
     
     return db_report
 
-def get_reports(
-    db: Session, 
+def _reports_statement(
     user_id: uuid.UUID, 
-    page: int = 1, 
-    limit: int = 20, 
-    analysis_id: Optional[uuid.UUID] = None,
+    analysis_id: Optional[uuid.UUID] = None, 
     paper_id: Optional[uuid.UUID] = None
-) -> Tuple[List[models.Report], int]:
-    """获取报告列表"""
-    # 构建查询
-    query = db.query(models.Report).join(
-        models.Analysis, models.Report.analysis_id == models.Analysis.id
-    ).join(
-        models.Paper, models.Analysis.paper_id == models.Paper.id
-    ).filter(models.Paper.user_id == user_id)
+) -> Select:
+    """构建报告列表查询"""
+    stmt = select(models.Report).options(
+        pagination_utils.schema_columns(models.Report, schemas.Report)
+    ).where(models.Report.user_id == user_id)
     
     # 应用过滤条件
     if analysis_id:
-        query = query.filter(models.Report.analysis_id == analysis_id)
+        stmt = stmt.where(models.Report.analysis_id == analysis_id)
     
     if paper_id:
-        query = query.filter(models.Analysis.paper_id == paper_id)
+        stmt = stmt.join(
+            models.Analysis, models.Report.analysis_id == models.Analysis.id
+        ).where(models.Analysis.paper_id == paper_id)
     
-    # 计算总数
-    total = query.count()
+    return stmt.order_by(models.Report.created_at.desc(), models.Report.id.desc())
+
+async def get_reports_async(
+    db: AsyncSession, 
+    user_id: uuid.UUID, 
+    page: int = 1, 
+    limit: int = 20, 
+    analysis_id: Optional[uuid.UUID] = None, 
+    paper_id: Optional[uuid.UUID] = None, 
+    total_mode: schemas.TotalMode = schemas.TotalMode.cached
+) -> pagination_utils.OffsetPage:
+    """获取报告列表，总数按total_mode获取（异步）"""
+    stmt = _reports_statement(user_id, analysis_id, paper_id)
     
     # 应用分页
-    query = query.order_by(models.Report.created_at.desc())
-    query = query.offset((page - 1) * limit).limit(limit)
+    reports = (await db.scalars(pagination_utils.page_statement(stmt, page, limit))).all()
+    
+    # 获取总数
+    total, total_estimated = await count_service.get_total_async(
+        db, user_id, "reports", stmt, {"analysis_id": analysis_id, "paper_id": paper_id}, total_mode
+    )
     
-    return query.all(), total
+    return pagination_utils.offset_page(reports, limit, total, total_estimated)
 
-def get_report(db: Session, report_id: uuid.UUID, user_id: uuid.UUID):
-    """获取报告详情"""
-    return db.query(models.Report).join(
-        models.Analysis, models.Report.analysis_id == models.Analysis.id
-    ).join(
-        models.Paper, models.Analysis.paper_id == models.Paper.id
-    ).filter(
+async def get_reports_page_async(
+    db: AsyncSession, 
+    user_id: uuid.UUID, 
+    limit: int = 20, 
+    cursor: Optional[str] = None, 
+    analysis_id: Optional[uuid.UUID] = None, 
+    paper_id: Optional[uuid.UUID] = None, 
+    total_mode: schemas.TotalMode = schemas.TotalMode.none
+) -> pagination_utils.KeysetPage:
+    """
+    按游标获取报告列表（异步）
+    
+    按(created_at, id)倒序分页，默认不统计总数，翻页深度不影响查询代价。游标格式不正确时抛出ValueError。
+    """
+    base_stmt = _reports_statement(user_id, analysis_id, paper_id)
+    stmt = pagination_utils.keyset_statement(
+        base_stmt, 
+        models.Report.created_at, 
+        models.Report.id, 
+        limit, 
+        cursor
+    )
+    reports = (await db.scalars(stmt)).all()
+    
+    # 获取总数（默认不统计）
+    total, total_estimated = await count_service.get_total_async(
+        db, user_id, "reports", base_stmt, {"analysis_id": analysis_id, "paper_id": paper_id}, total_mode
+    )
+    
+    return pagination_utils.keyset_page(reports, limit, cursor, "created_at", total, total_estimated)
+
+def _report_statement(report_id: uuid.UUID, user_id: uuid.UUID) -> Select:
+    """构建报告详情查询"""
+    return select(models.Report).where(
         models.Report.id == report_id,
-        models.Paper.user_id == user_id
-    ).first()
+        models.Report.user_id == user_id
+    )
+
+async def get_report_async(db: AsyncSession, report_id: uuid.UUID, user_id: uuid.UUID):
+    """获取报告详情（异步）"""
+    return (await db.scalars(_report_statement(report_id, user_id))).first()
+
+def _apply_report_update(db_report: models.Report, report_update: schemas.ReportUpdate):
+    """将更新内容应用到报告记录"""
+    update_data = report_update.dict(exclude_unset=True)
+    for key, value in update_data.items():
+        setattr(db_report, key, value)
+    
+    db_report.updated_at = datetime.utcnow()
 
-def update_report(db: Session, report_id: uuid.UUID, user_id: uuid.UUID, report_update: schemas.ReportUpdate):
-    """更新报告信息"""
-    db_report = get_report(db, report_id, user_id)
+async def update_report_async(db: AsyncSession, report_id: uuid.UUID, user_id: uuid.UUID, report_update: schemas.ReportUpdate):
+    """更新报告信息（异步）"""
+    db_report = await get_report_async(db, report_id, user_id)
     
     if not db_report:
         return None
     
     # 更新报告信息
-    update_data = report_update.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_report, key, value)
+    _apply_report_update(db_report, report_update)
     
-    db_report.updated_at = datetime.utcnow()
+    await db.commit()
+    await db.refresh(db_report)
     
-    db.commit()
-    db.refresh(db_report)
+    await invalidate_report_shares_async(db, report_id)
     
     return db_report
 
-def share_report(db: Session, report_id: uuid.UUID, share_create: schemas.ShareCreate):
-    """分享报告"""
-    # 获取报告
-    db_report = db.query(models.Report).filter(models.Report.id == report_id).first()
+def _share_cache_key(code: str) -> str:
+    """分享解析结果的缓存键"""
+    return f"share:{code}"
+
+def _share_url(code: str) -> str:
+    """构建分享链接URL"""
+    return f"{config.SHARE_BASE_URL.rstrip('/')}/{code}"
+
+def _to_share_schema(db_share: models.ShareLink) -> schemas.ShareLink:
+    """转换分享链接响应"""
+    return schemas.ShareLink(
+        id=db_share.id,
+        code=db_share.code,
+        report_id=db_share.report_id,
+        share_url=_share_url(db_share.code),
+        access_type=db_share.access_type,
+        recipients=db_share.recipients,
+        created_at=db_share.created_at,
+        expires_at=db_share.expires_at,
+        is_active=db_share.is_active
+    )
+
+def _build_share_link(report_id: uuid.UUID, user_id: uuid.UUID, code: str, share_create: schemas.ShareCreate) -> models.ShareLink:
+    """构建分享链接记录"""
+    return models.ShareLink(
+        code=code,
+        report_id=report_id,
+        created_by=user_id,
+        access_type=share_create.access_type,
+        recipients=share_create.recipients,
+        created_at=datetime.utcnow(),
+        expires_at=share_create.expires_at,
+        is_active=True
+    )
+
+def _share_code_statement(code: str) -> Select:
+    """构建分享码查重查询"""
+    return select(models.ShareLink.id).where(models.ShareLink.code == code)
+
+async def share_report_async(db: AsyncSession, report_id: uuid.UUID, user_id: uuid.UUID, share_create: schemas.ShareCreate):
+    """分享报告（异步）"""
+    # 生成唯一分享码，冲突时重新生成
+    code = secrets.token_urlsafe(9)
+    while await db.scalar(_share_code_statement(code)):
+        code = secrets.token_urlsafe(9)
     
-    if not db_report:
+    db_share = _build_share_link(report_id, user_id, code, share_create)
+    
+    db.add(db_share)
+    await db.commit()
+    await db.refresh(db_share)
+    
+    return _to_share_schema(db_share)
+
+def _share_links_statement(report_id: uuid.UUID) -> Select:
+    """构建报告分享链接查询"""
+    return select(models.ShareLink).where(
+        models.ShareLink.report_id == report_id
+    ).order_by(models.ShareLink.created_at.desc())
+
+async def get_share_links_async(db: AsyncSession, report_id: uuid.UUID):
+    """获取报告的分享链接（异步）"""
+    share_links = (await db.scalars(_share_links_statement(report_id))).all()
+    
+    return [_to_share_schema(share) for share in share_links]
+
+def _share_link_statement(report_id: uuid.UUID, share_id: uuid.UUID) -> Select:
+    """构建分享链接查询"""
+    return select(models.ShareLink).where(
+        models.ShareLink.id == share_id,
+        models.ShareLink.report_id == report_id
+    )
+
+async def revoke_share_link_async(db: AsyncSession, report_id: uuid.UUID, share_id: uuid.UUID):
+    """撤销分享链接（异步）"""
+    db_share = (await db.scalars(_share_link_statement(report_id, share_id))).first()
+    
+    if not db_share:
+        return False
+    
+    db_share.is_active = False
+    await db.commit()
+    
+    await cache.delete_async(_share_cache_key(db_share.code))
+    
+    return True
+
+def _active_share_codes_statement(report_id: uuid.UUID) -> Select:
+    """构建报告有效分享码查询"""
+    return select(models.ShareLink.code).where(
+        models.ShareLink.report_id == report_id,
+        models.ShareLink.is_active == True
+    )
+
+def invalidate_report_shares(db: Session, report_id: uuid.UUID):
+    """报告变更后清除其分享解析缓存"""
+    codes = db.scalars(_active_share_codes_statement(report_id)).all()
+    cache.delete(*[_share_cache_key(code) for code in codes])
+
+async def invalidate_report_shares_async(db: AsyncSession, report_id: uuid.UUID):
+    """报告变更后清除其分享解析缓存（异步）"""
+    codes = (await db.scalars(_active_share_codes_statement(report_id))).all()
+    await invalidate_share_codes_async(codes)
+
+def _paper_share_codes_statement(paper_id: uuid.UUID) -> Select:
+    """构建论文下全部报告的有效分享码查询"""
+    return select(models.ShareLink.code).join(
+        models.Report, models.ShareLink.report_id == models.Report.id
+    ).join(
+        models.Analysis, models.Report.analysis_id == models.Analysis.id
+    ).where(
+        models.Analysis.paper_id == paper_id,
+        models.ShareLink.is_active == True
+    )
+
+async def get_paper_share_codes_async(db: AsyncSession, paper_id: uuid.UUID) -> List[str]:
+    """获取论文下全部报告的有效分享码，删除论文前读取，提交后清除缓存（异步）"""
+    return list((await db.scalars(_paper_share_codes_statement(paper_id))).all())
+
+async def invalidate_share_codes_async(codes: List[str]):
+    """清除分享码的解析缓存（异步）"""
+    await cache.delete_async(*[_share_cache_key(code) for code in codes])
+
+async def _get_cached_share(code: str) -> Optional[schemas.ResolvedShare]:
+    """从缓存读取分享解析结果"""
+    cached = await cache.get_json_async(_share_cache_key(code))
+    if cached is None:
+        return None
+    return schemas.ResolvedShare.parse_obj(cached)
+
+def _resolve_statement(code: str) -> Select:
+    """构建分享码解析查询，只解析链接分享（指定收件人的分享无法通过分享码校验访问者）"""
+    return select(models.ShareLink, models.Report).join(
+        models.Report, models.ShareLink.report_id == models.Report.id
+    ).where(
+        models.ShareLink.code == code,
+        models.ShareLink.is_active == True,
+        models.ShareLink.access_type == schemas.ShareType.link.value
+    )
+
+async def _cache_share(row, now: datetime) -> Optional[schemas.ResolvedShare]:
+    """构建分享解析结果并写入缓存，缓存随分享过期"""
+    if not row:
         return None
     
-    # 更新分享信息
-    share_id = uuid.uuid4()
-    share_code = str(share_id)[:8]
-    share_url = f"https://paperal.com/s/{share_code}"
-    
-    # 更新报告的分享信息
-    if not db_report.shared_with:
-        db_report.shared_with = []
-    
-    db_report.shared_with.append({
-        "id": str(share_id),
-        "type": share_create.access_type,
-        "created_at": datetime.utcnow().isoformat(),
-        "expires_at": share_create.expires_at.isoformat() if share_create.expires_at else None,
-        "recipients": share_create.recipients,
-        "url": share_url
-    })
-    
-    db.commit()
-    
-    # 返回分享信息
-    return schemas.Share(
-        id=share_id,
-        share_url=share_url,
-        access_type=share_create.access_type,
-        expires_at=share_create.expires_at
+    db_share, db_report = row
+    share = schemas.ResolvedShare(
+        share_id=db_share.id,
+        code=db_share.code,
+        access_type=db_share.access_type,
+        expires_at=db_share.expires_at,
+        report=schemas.SharedReport.from_orm(db_report)
     )
+    
+    ttl = config.SHARE_CACHE_TTL_SECONDS
+    if db_share.expires_at:
+        ttl = min(ttl, int((db_share.expires_at - now).total_seconds()))
+    await cache.set_json_async(_share_cache_key(db_share.code), share.dict(), ttl)
+    
+    return share
 
-def add_comment(db: Session, report_id: uuid.UUID, user_id: uuid.UUID, content: str):
-    """添加评论"""
-    # 创建评论
-    db_comment = models.Comment(
+async def _record_share_access(share: Optional[schemas.ResolvedShare], now: datetime) -> Optional[schemas.ResolvedShare]:
+    """检查分享是否过期并记录一次访问，非链接分享（含修复前写入的缓存）不予解析"""
+    if not share or share.access_type != schemas.ShareType.link or (share.expires_at and share.expires_at <= now):
+        return None
+    
+    await counter_service.increment_report_access_async(share.report.id)
+    
+    return share
+
+async def resolve_share_async(db: AsyncSession, code: str) -> Optional[schemas.ResolvedShare]:
+    """
+    解析分享码并记录一次访问（异步）
+    
+    按唯一索引查找分享码，结果缓存在Redis中，热门分享不会每次访问都查询数据库。
+    缓存在分享过期时同时过期，撤销或报告变更时主动清除。
+    """
+    now = datetime.utcnow()
+    
+    share = await _get_cached_share(code)
+    if share is None:
+        share = await _cache_share((await db.execute(_resolve_statement(code))).first(), now)
+    
+    return await _record_share_access(share, now)
+
+def _parent_comment_statement(report_id: uuid.UUID, parent_id: uuid.UUID) -> Select:
+    """构建父评论查询"""
+    return select(models.Comment.id, models.Comment.parent_id).where(
+        models.Comment.id == parent_id,
+        models.Comment.report_id == report_id
+    )
+
+def _build_comment(report_id: uuid.UUID, user_id: uuid.UUID, content: str, parent_id: Optional[uuid.UUID]) -> models.Comment:
+    """构建评论记录"""
+    return models.Comment(
         report_id=report_id,
         user_id=user_id,
         content=content,
         created_at=datetime.utcnow(),
+        parent_id=parent_id,
         is_resolved=False
     )
+
+async def add_comment_async(
+    db: AsyncSession, 
+    report_id: uuid.UUID, 
+    user_id: uuid.UUID, 
+    content: str, 
+    parent_id: Optional[uuid.UUID] = None
+):
+    """添加评论（异步）"""
+    # 回复统一挂在顶层评论下，评论串只有两层
+    if parent_id:
+        parent = (await db.execute(_parent_comment_statement(report_id, parent_id))).first()
+    
+        if not parent:
+            return None
+    
+        parent_id = parent.parent_id or parent.id
+    
+    # 创建评论
+    db_comment = _build_comment(report_id, user_id, content, parent_id)
     
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+    await db.commit()
+    await db.refresh(db_comment)
     
     return db_comment
 
-def get_comments(db: Session, report_id: uuid.UUID):
-    """获取报告评论"""
-    return db.query(models.Comment).filter(
-        models.Comment.report_id == report_id
-    ).order_by(models.Comment.created_at).all()
+def _comments_statement(report_id: uuid.UUID, limit: int, cursor: Optional[str]) -> Select:
+    """构建评论分页查询，多取一条用于判断是否有下一页"""
+    stmt = select(models.Comment).options(
+        selectinload(models.Comment.replies)
+    ).where(
+        models.Comment.report_id == report_id,
+        models.Comment.parent_id.is_(None)
+    )
+    
+    if cursor:
+        created_at, comment_id = pagination_utils.decode_cursor(cursor, (datetime, uuid.UUID))
+        stmt = stmt.where(
+            tuple_(models.Comment.created_at, models.Comment.id) > tuple_(created_at, comment_id)
+        )
+    
+    return stmt.order_by(models.Comment.created_at, models.Comment.id).limit(limit + 1)
+
+def _comments_page(comments: List[models.Comment], limit: int) -> Tuple[List[models.Comment], Optional[str]]:
+    """截取当前页并生成下一页游标"""
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        last = comments[-1]
+        next_cursor = pagination_utils.encode_cursor(last.created_at, last.id)
+    
+    return comments, next_cursor
+
+async def get_comments_async(
+    db: AsyncSession, 
+    report_id: uuid.UUID, 
+    limit: int = 20, 
+    cursor: Optional[str] = None
+) -> Tuple[List[models.Comment], Optional[str]]:
+    """
+    获取报告评论（异步）
+    
+    按(created_at, id)游标分页读取顶层评论，当前页的全部回复通过一次批量查询加载。
+    返回评论列表和下一页游标。
+    """
+    comments = (await db.scalars(_comments_statement(report_id, limit, cursor))).all()
+    
+    return _comments_page(comments, limit)
 
 def generate_report(db: Session, report_id: uuid.UUID):
     """生成报告"""
@@ -175,25 +452,27 @@ def generate_report(db: Session, report_id: uuid.UUID):
     
     try:
         # 获取分析结果
-        analysis = db.query(models.Analysis).filter(models.Analysis.id == db_report.analysis_id).first()
-        
+        analysis = db.query(models.Analysis).options(
+            undefer(models.Analysis.result_data)
+        ).filter(models.Analysis.id == db_report.analysis_id).first()
+    
         if not analysis or not analysis.result_data:
             raise Exception("分析结果不存在")
-        
+    
         # 获取论文信息
         paper = db.query(models.Paper).filter(models.Paper.id == analysis.paper_id).first()
-        
+    
         if not paper:
             raise Exception("论文不存在")
-        
+    
         # 创建存储目录
         storage_path = os.path.join(config.STORAGE_PATH, "reports")
         os.makedirs(storage_path, exist_ok=True)
-        
+    
         # 生成文件名
         file_name = f"{report_id}.{db_report.format}"
         file_path = os.path.join(storage_path, file_name)
-        
+    
         # TODO: 实际生成报告文件
         # 这里只是模拟生成报告
         with open(file_path, "w") as f:
@@ -208,20 +487,22 @@ def generate_report(db: Session, report_id: uuid.UUID):
             f.write(f"## 潜在应用场景\n\n")
             for app in analysis.result_data.get('market_opportunities', {}).get('potential_applications', []):
                 f.write(f"- {app.get('name')}: 市场规模 {app.get('market_size')}, 增长率 {app.get('growth_rate')}\n")
-        
+    
         # 更新报告状态
         db_report.status = "completed"
         db_report.file_path = file_path
         db_report.updated_at = datetime.utcnow()
-        
+    
         db.commit()
         db.refresh(db_report)
-        
+    
+        invalidate_report_shares(db, report_id)
+    
         return db_report
     
     except Exception as e:
         # 更新状态为失败
         db_report.status = "failed"
         db.commit()
-        
+    
         return None
\ No newline at end of file
@@ -0,0 +1,154 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Float, cast, literal, or_, select, text, update, Select
+from sqlalchemy.dialects.postgresql import ARRAY
+from starlette.concurrency import run_in_threadpool
+from pgvector.sqlalchemy import Vector
+import uuid
+from typing import List, Optional
+
+from models import models, schemas
+from core import config
+from utils import embedding_utils, pagination_utils
+
+# 单次补齐任务最多处理的批数，避免任务长时间占用worker
+MAX_BATCHES_PER_SWEEP = 20
+
+def _pending_statement(batch_size: int) -> Select:
+    """构建待生成向量的论文查询，跳过其他worker正在处理的行"""
+    return select(
+        models.Paper.id,
+        models.Paper.title,
+        models.Paper.authors,
+        models.Paper.metadata_
+    ).where(
+        models.Paper.embedding.is_(None)
+    ).limit(batch_size).with_for_update(skip_locked=True)
+
+def embed_pending(db: Session, batch_size: int = 64) -> int:
+    """为尚无向量的论文批量生成向量，返回处理的论文数"""
+    embedded = 0
+    for _ in range(MAX_BATCHES_PER_SWEEP):
+        rows = db.execute(_pending_statement(batch_size)).all()
+        if not rows:
+            break
+    
+        vectors = embedding_utils.embed_texts([
+            embedding_utils.paper_text(title, authors, metadata)
+            for _, title, authors, metadata in rows
+        ])
+        db.execute(update(models.Paper), [
+            {"id": row.id, "embedding": vector, "embedding_id": config.EMBEDDING_MODEL}
+            for row, vector in zip(rows, vectors)
+        ])
+        db.commit()
+    
+        embedded += len(rows)
+        if len(rows) < batch_size:
+            break
+    
+    return embedded
+
+def _visible_condition(user_id: uuid.UUID):
+    """用户可见的论文：自己的论文和公开论文"""
+    return or_(models.Paper.user_id == user_id, models.Paper.is_public.is_(True))
+
+def _source_statement(paper_id: uuid.UUID, user_id: uuid.UUID) -> Select:
+    """查询源论文是否可见、是否已生成向量"""
+    return select(models.Paper.embedding.is_not(None)).where(
+        models.Paper.id == paper_id,
+        _visible_condition(user_id)
+    )
+
+def _nearest_statement(user_id: uuid.UUID, target, limit: int, exclude_id: Optional[uuid.UUID] = None) -> Select:
+    """
+    构建按余弦距离排序的近邻查询
+    
+    ORDER BY直接使用 embedding <=> 目标向量，才能走HNSW索引；可见性过滤在索引扫描之后进行，
+    因此需要VECTOR_SEARCH_EF_SEARCH大于返回数量。
+    """
+    distance = models.Paper.embedding.cosine_distance(target)
+    stmt = select(models.Paper, distance.label("distance")).options(
+        pagination_utils.schema_columns(models.Paper, schemas.Paper)
+    ).where(
+        models.Paper.embedding.is_not(None),
+        _visible_condition(user_id)
+    )
+    
+    if exclude_id:
+        stmt = stmt.where(models.Paper.id != exclude_id)
+    
+    return stmt.order_by(distance).limit(limit)
+
+def _similar_statement(paper_id: uuid.UUID, user_id: uuid.UUID, limit: int) -> Select:
+    """构建相似论文查询，源论文的向量在数据库中读取"""
+    source = select(models.Paper.embedding).where(models.Paper.id == paper_id).scalar_subquery()
+    return _nearest_statement(user_id, source, limit, exclude_id=paper_id)
+
+def _query_vector(vector: List[float]):
+    """以float8[]传参再转换为vector，asyncpg无需注册vector类型"""
+    return cast(literal(vector, ARRAY(Float)), Vector(config.EMBEDDING_DIM))
+
+def _ef_search_statement():
+    """设置当前事务的HNSW候选数"""
+    return text(f"SET LOCAL hnsw.ef_search = {int(config.VECTOR_SEARCH_EF_SEARCH)}")
+
+def _similarity_result(row) -> schemas.PaperSimilarity:
+    """将近邻查询结果行转换为响应模型，相似度为1减余弦距离"""
+    paper, distance = row
+    return schemas.PaperSimilarity(**schemas.Paper.from_orm(paper).dict(), similarity=1 - distance)
+
+def get_similar_papers(
+    db: Session, 
+    paper_id: uuid.UUID, 
+    user_id: uuid.UUID, 
+    limit: int = 10
+) -> Optional[List[schemas.PaperSimilarity]]:
+    """
+    获取与指定论文最相似的论文，范围为用户自己的论文和公开论文
+    
+    论文不存在或不可见时返回None，尚未生成向量时返回空列表。
+    """
+    has_embedding = db.scalar(_source_statement(paper_id, user_id))
+    if has_embedding is None:
+        return None
+    if not has_embedding:
+        return []
+    
+    db.execute(_ef_search_statement())
+    rows = db.execute(_similar_statement(paper_id, user_id, limit)).all()
+    return [_similarity_result(row) for row in rows]
+
+async def get_similar_papers_async(
+    db: AsyncSession, 
+    paper_id: uuid.UUID, 
+    user_id: uuid.UUID, 
+    limit: int = 10
+) -> Optional[List[schemas.PaperSimilarity]]:
+    """获取与指定论文最相似的论文（异步）"""
+    has_embedding = await db.scalar(_source_statement(paper_id, user_id))
+    if has_embedding is None:
+        return None
+    if not has_embedding:
+        return []
+    
+    await db.execute(_ef_search_statement())
+    rows = (await db.execute(_similar_statement(paper_id, user_id, limit))).all()
+    return [_similarity_result(row) for row in rows]
+
+def semantic_search(db: Session, user_id: uuid.UUID, query: str, limit: int = 10) -> List[schemas.PaperSimilarity]:
+    """按语义检索用户自己的论文和公开论文"""
+    vector = embedding_utils.embed_texts([query])[0]
+    
+    db.execute(_ef_search_statement())
+    rows = db.execute(_nearest_statement(user_id, _query_vector(vector), limit)).all()
+    return [_similarity_result(row) for row in rows]
+
+async def semantic_search_async(db: AsyncSession, user_id: uuid.UUID, query: str, limit: int = 10) -> List[schemas.PaperSimilarity]:
+    """按语义检索用户自己的论文和公开论文（异步）"""
+    # 生成向量是CPU密集操作，放到线程池，避免阻塞事件循环
+    vector = (await run_in_threadpool(embedding_utils.embed_texts, [query]))[0]
+    
+    await db.execute(_ef_search_statement())
+    rows = (await db.execute(_nearest_statement(user_id, _query_vector(vector), limit))).all()
+    return [_similarity_result(row) for row in rows]
@@ -1,27 +1,77 @@
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, Select
 from datetime import datetime
 import uuid
+from typing import Optional
 
 from models import models, schemas
+from core import config, cache
 
 def get_subscription(db: Session, subscription_id: uuid.UUID):
     """获取订阅"""
     return db.query(models.Subscription).filter(models.Subscription.id == subscription_id).first()
 
-def get_active_subscription(db: Session, user_id: uuid.UUID):
-    """获取用户的活跃订阅"""
+def _active_subscription_statement(user_id: uuid.UUID) -> Select:
+    """构建用户活跃订阅查询"""
     now = datetime.utcnow()
-    return db.query(models.Subscription).filter(
+    return select(models.Subscription).where(
         models.Subscription.user_id == user_id,
         models.Subscription.status == "active",
         (models.Subscription.end_date.is_(None) | (models.Subscription.end_date > now))
-    ).first()
+    )
+
+async def get_active_subscription_async(db: AsyncSession, user_id: uuid.UUID):
+    """获取用户的活跃订阅（异步）"""
+    return (await db.scalars(_active_subscription_statement(user_id))).first()
+
+def _plan_cache_key(user_id: uuid.UUID) -> str:
+    return f"subscription_plan:{user_id}"
+
+async def _cached_plan(user_id: uuid.UUID) -> Optional[schemas.SubscriptionPlan]:
+    """读取缓存的订阅计划，订阅已到期时视为未命中"""
+    cached = await cache.get_json_async(_plan_cache_key(user_id))
+    if cached is None:
+        return None
+    plan = schemas.SubscriptionPlan.parse_obj(cached)
+    if plan.end_date is not None and plan.end_date <= datetime.utcnow():
+        return None
+    return plan
+
+async def _cache_plan(user_id: uuid.UUID, subscription: Optional[models.Subscription]) -> schemas.SubscriptionPlan:
+    """缓存活跃订阅的计划、功能和用量上限，没有活跃订阅时同样缓存"""
+    if subscription is None:
+        plan = schemas.SubscriptionPlan()
+    else:
+        plan = schemas.SubscriptionPlan(
+            plan_type=subscription.plan_type,
+            end_date=subscription.end_date,
+            features=subscription.features or {},
+            usage_limits=subscription.usage_limits or {}
+        )
+    await cache.set_json_async(_plan_cache_key(user_id), plan.dict(), config.QUOTA_SUBSCRIPTION_CACHE_SECONDS)
+    return plan
 
-def get_user_subscriptions(db: Session, user_id: uuid.UUID):
-    """获取用户的所有订阅"""
-    return db.query(models.Subscription).filter(
+async def get_subscription_plan_async(db: AsyncSession, user_id: uuid.UUID) -> schemas.SubscriptionPlan:
+    """获取用户当前的订阅计划，优先读缓存（异步）"""
+    plan = await _cached_plan(user_id)
+    if plan is None:
+        plan = await _cache_plan(user_id, await get_active_subscription_async(db, user_id))
+    return plan
+
+def invalidate_subscription_plan(user_id: uuid.UUID):
+    """订阅变更后删除缓存的订阅计划"""
+    cache.delete(_plan_cache_key(user_id))
+
+def _user_subscriptions_statement(user_id: uuid.UUID) -> Select:
+    """构建用户订阅历史查询"""
+    return select(models.Subscription).where(
         models.Subscription.user_id == user_id
-    ).order_by(models.Subscription.start_date.desc()).all()
+    ).order_by(models.Subscription.start_date.desc())
+
+async def get_user_subscriptions_async(db: AsyncSession, user_id: uuid.UUID):
+    """获取用户的所有订阅（异步）"""
+    return (await db.scalars(_user_subscriptions_statement(user_id))).all()
 
 def create_subscription(db: Session, subscription_create: schemas.SubscriptionCreate):
     """创建订阅"""
@@ -39,6 +89,8 @@ def create_subscription(db: Session, subscription_create: schemas.SubscriptionCr
     db.commit()
     db.refresh(db_subscription)
     
+    invalidate_subscription_plan(db_subscription.user_id)
+    
     return db_subscription
 
 def update_subscription(db: Session, subscription_id: uuid.UUID, subscription_update: schemas.SubscriptionUpdate):
@@ -58,6 +110,8 @@ def update_subscription(db: Session, subscription_id: uuid.UUID, subscription_up
     db.commit()
     db.refresh(db_subscription)
     
+    invalidate_subscription_plan(db_subscription.user_id)
+    
     return db_subscription
 
 def cancel_subscription(db: Session, subscription_id: uuid.UUID):
@@ -73,4 +127,6 @@ def cancel_subscription(db: Session, subscription_id: uuid.UUID):
     db.commit()
     db.refresh(db_subscription)
     
+    invalidate_subscription_plan(db_subscription.user_id)
+    
     return db_subscription
\ No newline at end of file
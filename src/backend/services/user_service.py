@@ -1,27 +1,33 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, Select
 from datetime import datetime
 import uuid
-import secrets
-import string
+from typing import Tuple
 
 from models import models, schemas
 from core import security
+from core.auth_cache import invalidate_api_key_async, invalidate_user_async
+from services import counter_service
 
-def get_user(db: Session, user_id: uuid.UUID):
-    """获取用户"""
-    return db.query(models.User).filter(models.User.id == user_id).first()
+def _user_statement(user_id: uuid.UUID) -> Select:
+    """构建用户查询"""
+    return select(models.User).where(models.User.id == user_id)
 
-def get_user_by_email(db: Session, email: str):
-    """通过邮箱获取用户"""
-    return db.query(models.User).filter(models.User.email == email).first()
+def _user_by_email_statement(email: str) -> Select:
+    """构建按邮箱查询用户的语句"""
+    return select(models.User).where(models.User.email == email)
 
-def create_user(db: Session, user_create: schemas.UserCreate):
-    """创建用户"""
-    # 创建密码哈希
-    hashed_password = security.get_password_hash(user_create.password)
-    
-    # 创建用户
-    db_user = models.User(
+async def get_user_async(db: AsyncSession, user_id: uuid.UUID):
+    """获取用户（异步）"""
+    return (await db.scalars(_user_statement(user_id))).first()
+
+async def get_user_by_email_async(db: AsyncSession, email: str):
+    """通过邮箱获取用户（异步）"""
+    return (await db.scalars(_user_by_email_statement(email))).first()
+
+def _build_user(user_create: schemas.UserCreate, hashed_password: str) -> models.User:
+    """构建用户记录，hashed_password为已计算的密码哈希"""
+    return models.User(
         email=user_create.email,
         password_hash=hashed_password,
         name=user_create.name,
@@ -30,129 +36,147 @@ def create_user(db: Session, user_create: schemas.UserCreate):
         created_at=datetime.utcnow(),
         is_active=True
     )
+
+async def create_user_async(db: AsyncSession, user_create: schemas.UserCreate):
+    """创建用户（异步）"""
+    db_user = _build_user(user_create, await security.get_password_hash_async(user_create.password))
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
-def update_user(db: Session, user_id: uuid.UUID, user_update: schemas.UserUpdate):
-    """更新用户信息"""
-    db_user = get_user(db, user_id)
-    
-    if not db_user:
-        return None
-    
-    # 更新用户信息
+def _apply_user_update(db_user: models.User, user_update: schemas.UserUpdate):
+    """将更新内容应用到用户记录"""
     update_data = user_update.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_user, key, value)
     
     db_user.updated_at = datetime.utcnow()
+
+async def update_user_async(db: AsyncSession, user_id: uuid.UUID, user_update: schemas.UserUpdate):
+    """更新用户信息（异步）"""
+    db_user = await get_user_async(db, user_id)
     
-    db.commit()
-    db.refresh(db_user)
+    if not db_user:
+        return None
+    
+    # 更新用户信息
+    _apply_user_update(db_user, user_update)
+    
+    await db.commit()
+    await invalidate_user_async(user_id)
+    await db.refresh(db_user)
     
     return db_user
 
-def update_password(db: Session, user_id: uuid.UUID, new_password: str):
-    """更新用户密码"""
-    db_user = get_user(db, user_id)
+async def update_password_async(db: AsyncSession, user_id: uuid.UUID, new_password: str):
+    """更新用户密码（异步）"""
+    db_user = await get_user_async(db, user_id)
     
     if not db_user:
         return None
     
     # 更新密码哈希
-    db_user.password_hash = security.get_password_hash(new_password)
+    db_user.password_hash = await security.get_password_hash_async(new_password)
     db_user.updated_at = datetime.utcnow()
     
-    db.commit()
+    await db.commit()
+    await invalidate_user_async(user_id)
     
     return True
 
-def update_last_login(db: Session, user_id: uuid.UUID):
-    """更新最后登录时间"""
-    db_user = get_user(db, user_id)
-    
-    if not db_user:
-        return None
-    
-    db_user.last_login_at = datetime.utcnow()
-    
-    db.commit()
+async def update_last_login_async(user_id: uuid.UUID):
+    """更新最后登录时间（写后缓冲，定期批量落库）"""
+    await counter_service.record_user_login_async(user_id)
     
     return True
 
-def authenticate_user(db: Session, email: str, password: str):
-    """验证用户"""
-    user = get_user_by_email(db, email)
+async def authenticate_user_async(db: AsyncSession, email: str, password: str):
+    """验证用户（异步）"""
+    user = await get_user_by_email_async(db, email)
     
     if not user:
         return False
     
-    if not security.verify_password(password, user.password_hash):
+    if not await security.verify_password_async(password, user.password_hash):
         return False
     
     return user
 
-def get_user_api_keys(db: Session, user_id: uuid.UUID):
-    """获取用户API密钥"""
-    return db.query(models.APIKey).filter(models.APIKey.user_id == user_id).all()
+def _api_keys_statement(user_id: uuid.UUID) -> Select:
+    """构建用户API密钥查询"""
+    return select(models.APIKey).where(models.APIKey.user_id == user_id)
 
-def create_api_key(db: Session, user_id: uuid.UUID, api_key_create: schemas.APIKeyBase):
-    """创建API密钥"""
-    # 生成随机API密钥
-    alphabet = string.ascii_letters + string.digits
-    key_value = ''.join(secrets.choice(alphabet) for _ in range(32))
-    
-    # 创建密钥哈希
-    key_hash = security.get_password_hash(key_value)
+async def get_user_api_keys_async(db: AsyncSession, user_id: uuid.UUID):
+    """获取用户API密钥（异步）"""
+    return (await db.scalars(_api_keys_statement(user_id))).all()
+
+def _build_api_key(user_id: uuid.UUID, api_key_create: schemas.APIKeyBase) -> Tuple[models.APIKey, str]:
+    """生成API密钥，返回(密钥记录, 密钥值)"""
+    key_value, key_prefix, key_hash = security.generate_api_key()
     
-    # 创建API密钥
     db_api_key = models.APIKey(
         user_id=user_id,
         key_name=api_key_create.key_name,
+        key_prefix=key_prefix,
         key_hash=key_hash,
         permissions=api_key_create.permissions,
         created_at=datetime.utcnow(),
         is_active=True
     )
     
-    db.add(db_api_key)
-    db.commit()
-    db.refresh(db_api_key)
-    
-    # 返回带有密钥值的响应
-    api_key_response = schemas.APIKeyWithValue(
+    return db_api_key, key_value
+
+def _to_api_key_with_value(db_api_key: models.APIKey, key_value: str) -> schemas.APIKeyWithValue:
+    """返回带有密钥值的响应"""
+    return schemas.APIKeyWithValue(
         id=db_api_key.id,
         user_id=db_api_key.user_id,
         key_name=db_api_key.key_name,
+        key_prefix=db_api_key.key_prefix,
         permissions=db_api_key.permissions,
         created_at=db_api_key.created_at,
         expires_at=db_api_key.expires_at,
         is_active=db_api_key.is_active,
         key_value=key_value
     )
+
+async def create_api_key_async(db: AsyncSession, user_id: uuid.UUID, api_key_create: schemas.APIKeyBase):
+    """创建API密钥（异步）"""
+    db_api_key, key_value = _build_api_key(user_id, api_key_create)
+    
+    db.add(db_api_key)
+    await db.commit()
+    await db.refresh(db_api_key)
     
-    return api_key_response
+    return _to_api_key_with_value(db_api_key, key_value)
 
-def delete_api_key(db: Session, user_id: uuid.UUID, api_key_id: str):
-    """删除API密钥"""
+def _api_key_statement(user_id: uuid.UUID, api_key_id: str) -> Select:
+    """构建API密钥查询，ID格式不正确时抛出ValueError"""
+    api_key_uuid = uuid.UUID(api_key_id)
+    
+    return select(models.APIKey).where(
+        models.APIKey.id == api_key_uuid,
+        models.APIKey.user_id == user_id
+    )
+
+async def delete_api_key_async(db: AsyncSession, user_id: uuid.UUID, api_key_id: str):
+    """删除API密钥（异步）"""
     try:
-        api_key_uuid = uuid.UUID(api_key_id)
+        stmt = _api_key_statement(user_id, api_key_id)
     except ValueError:
         return False
     
-    db_api_key = db.query(models.APIKey).filter(
-        models.APIKey.id == api_key_uuid,
-        models.APIKey.user_id == user_id
-    ).first()
+    db_api_key = (await db.scalars(stmt)).first()
     
     if not db_api_key:
         return False
     
-    db.delete(db_api_key)
-    db.commit()
+    await db.delete(db_api_key)
+    await db.commit()
+    if db_api_key.key_prefix:
+        await invalidate_api_key_async(db_api_key.key_prefix)
     
-    return True
\ No newline at end of file
+    return True
@@ -0,0 +1,21 @@
+from tasks.celery_app import celery_app
+from database import SessionLocal
+from core import config
+from services import archive_service
+
+@celery_app.task(name="archive_cold_payloads")
+def archive_cold_payloads():
+    """
+    归档较早的分析原文（raw_analysis）和论文正文，压缩后转存到存储后端
+    """
+    db = SessionLocal()
+    try:
+        analyses = archive_service.archive_raw_analyses(db, config.ARCHIVE_AFTER_DAYS, config.ARCHIVE_BATCH_SIZE)
+        papers = archive_service.archive_extracted_texts(db, config.ARCHIVE_AFTER_DAYS, config.ARCHIVE_BATCH_SIZE)
+        return {"status": "success", "analyses": analyses, "papers": papers}
+    except Exception as e:
+        db.rollback()
+        print(f"归档分析原文、论文正文失败: {e}")
+        raise
+    finally:
+        db.close()
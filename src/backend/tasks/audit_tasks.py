@@ -0,0 +1,21 @@
+from tasks.celery_app import celery_app
+from database import SessionLocal
+from core import config
+from services import audit_service
+
+@celery_app.task(name="maintain_audit_partitions")
+def maintain_audit_partitions():
+    """
+    维护审计日志分区：提前创建之后几个月的分区，删除超出保留期的分区
+    """
+    db = SessionLocal()
+    try:
+        created = audit_service.ensure_partitions(db, config.AUDIT_LOG_PARTITIONS_AHEAD)
+        dropped = audit_service.drop_expired_partitions(db, config.AUDIT_LOG_RETENTION_DAYS)
+        return {"status": "success", "created": created, "dropped": dropped}
+    except Exception as e:
+        db.rollback()
+        print(f"维护审计日志分区失败: {e}")
+        raise
+    finally:
+        db.close()
\ No newline at end of file
@@ -5,7 +5,8 @@ from core import config
 celery_app = Celery(
     "paperal",
     broker=config.CELERY_BROKER_URL,
-    backend=config.CELERY_RESULT_BACKEND
+    backend=config.CELERY_RESULT_BACKEND,
+    include=["tasks.analysis_tasks", "tasks.report_tasks", "tasks.counter_tasks", "tasks.embedding_tasks", "tasks.audit_tasks", "tasks.archive_tasks", "tasks.quota_tasks"]
 )
 
 # 配置Celery
@@ -15,6 +16,33 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    beat_schedule={
+        # 写后缓冲的计数器按固定间隔批量落库
+        "flush-counters": {
+            "task": "flush_counters",
+            "schedule": config.WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+        },
+        # 后台补齐论文向量
+        "embed-pending-papers": {
+            "task": "embed_pending_papers",
+            "schedule": config.EMBEDDING_SWEEP_INTERVAL_SECONDS,
+        },
+        # 审计日志分区维护（幂等，每小时执行）
+        "maintain-audit-partitions": {
+            "task": "maintain_audit_partitions",
+            "schedule": 3600.0,
+        },
+        # 冷数据归档（分批执行，未处理完的留到下次）
+        "archive-cold-payloads": {
+            "task": "archive_cold_payloads",
+            "schedule": config.ARCHIVE_INTERVAL_SECONDS,
+        },
+        # 月度用量从Redis落库（Redis数据丢失时先从数据库恢复）
+        "reconcile-usage": {
+            "task": "reconcile_usage",
+            "schedule": config.QUOTA_RECONCILE_INTERVAL_SECONDS,
+        },
+    },
 )
 
 # 自动发现任务
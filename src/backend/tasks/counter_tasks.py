@@ -0,0 +1,23 @@
+import logging
+
+from tasks.celery_app import celery_app
+from database import SessionLocal
+from services import counter_service
+
+logger = logging.getLogger(__name__)
+
+@celery_app.task(name="flush_counters")
+def flush_counters():
+    """
+    落库写后缓冲的计数器与时间戳
+    """
+    db = SessionLocal()
+    try:
+        flushed = counter_service.flush_all(db)
+        return {"status": "success", "flushed": flushed}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"计数器落库失败: {e}")
+        raise
+    finally:
+        db.close()
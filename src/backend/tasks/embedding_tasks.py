@@ -0,0 +1,19 @@
+from tasks.celery_app import celery_app
+from database import SessionLocal
+from services import similarity_service
+
+@celery_app.task(name="embed_pending_papers")
+def embed_pending_papers():
+    """
+    为尚无向量的论文生成向量（新上传、标题或摘要变更后）
+    """
+    db = SessionLocal()
+    try:
+        embedded = similarity_service.embed_pending(db)
+        return {"status": "success", "embedded": embedded}
+    except Exception as e:
+        db.rollback()
+        print(f"生成论文向量失败: {e}")
+        raise
+    finally:
+        db.close()
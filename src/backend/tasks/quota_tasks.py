@@ -0,0 +1,19 @@
+from tasks.celery_app import celery_app
+from database import SessionLocal
+from services import quota_service
+
+@celery_app.task(name="reconcile_usage")
+def reconcile_usage():
+    """
+    将Redis中有变化的月度用量写入usage_counters，Redis数据丢失时先从数据库恢复
+    """
+    db = SessionLocal()
+    try:
+        result = quota_service.reconcile_usage(db)
+        return {"status": "success", **result}
+    except Exception as e:
+        db.rollback()
+        print(f"用量落库失败: {e}")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,186 @@
+import os
+from email.utils import formatdate
+from typing import Iterator, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
+
+from core import config
+from utils import storage_utils
+
+# 报告格式对应的MIME类型
+REPORT_MEDIA_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "html": "text/html; charset=utf-8",
+}
+
+class RangeNotSatisfiable(Exception):
+    """请求的Range无法满足"""
+
+def make_etag(stat_result: os.stat_result) -> str:
+    """
+    生成强ETag（纳秒修改时间-文件大小）
+
+    使用纳秒精度，同一秒内重新生成、大小不变的文件也会得到新的ETag。
+    X-Accel-Redirect模式下Nginx返回自己的ETag，带该ETag的条件请求由Nginx判断。
+    """
+    return '"%x-%x"' % (stat_result.st_mtime_ns, stat_result.st_size)
+
+def parse_range(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单一字节范围的Range头，返回闭区间(start, end)
+
+    不支持的格式或多段范围返回None，按完整内容响应。
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+
+    start_str, end_str = (part.strip() for part in spec.split("-", 1))
+    try:
+        if start_str:
+            start = int(start_str)
+            end = int(end_str) if end_str else file_size - 1
+        else:
+            # 后缀范围：最后N个字节
+            suffix_length = int(end_str)
+            if suffix_length == 0:
+                raise RangeNotSatisfiable()
+            start = max(file_size - suffix_length, 0)
+            end = file_size - 1
+    except ValueError:
+        return None
+
+    if start >= file_size:
+        raise RangeNotSatisfiable()
+    if start > end:
+        return None
+
+    return start, min(end, file_size - 1)
+
+def iter_file_range(file_path: str, start: int, end: int, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """按块读取文件的指定范围，不在内存中缓存整个文件"""
+    chunk_size = chunk_size or config.DOWNLOAD_CHUNK_SIZE
+    remaining = end - start + 1
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    """判断If-None-Match/If-Range头是否匹配ETag"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+def file_response(
+    request: Request,
+    file_path: str,
+    filename: str,
+    media_type: str,
+    cache_control: str
+) -> Response:
+    """
+    发送本地文件，支持ETag条件请求与Range断点续传
+
+    配置了DOWNLOAD_ACCEL_REDIRECT_PREFIX时只返回X-Accel-Redirect头，
+    由Nginx使用sendfile发送文件并处理Range；否则分块流式发送。
+    文件不在STORAGE_PATH下时按不存在处理。
+    """
+    storage_key = storage_utils.local_storage_key(file_path)
+    if storage_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在"
+        )
+
+    try:
+        stat_result = os.stat(file_path)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在"
+        )
+
+    etag = make_etag(stat_result)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": storage_utils.content_disposition(filename),
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if config.DOWNLOAD_ACCEL_REDIRECT_PREFIX:
+        headers["X-Accel-Redirect"] = config.DOWNLOAD_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + quote(storage_key)
+        return Response(headers=headers, media_type=media_type)
+
+    file_size = stat_result.st_size
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or _etag_matches(if_range, etag):
+        try:
+            byte_range = parse_range(request.headers.get("range"), file_size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{file_size}", "ETag": etag}
+            )
+
+    if byte_range is None:
+        start, end = 0, file_size - 1
+        status_code = status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+
+    headers["Content-Length"] = str(max(end - start + 1, 0))
+
+    if request.method == "HEAD" or file_size == 0:
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+
+    return StreamingResponse(
+        iter_file_range(file_path, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
+
+def report_file_response(request: Request, report) -> Response:
+    """发送报告文件，对象存储时重定向到预签名URL"""
+    if not report.file_path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="报告文件尚未生成"
+        )
+
+    report_format = report.format or "pdf"
+    media_type = REPORT_MEDIA_TYPES.get(report_format, "application/octet-stream")
+    filename = f"{report.title or report.id}.{report_format}"
+
+    if report.is_public:
+        cache_control = f"public, max-age={config.PUBLIC_REPORT_CACHE_SECONDS}"
+    else:
+        cache_control = "private, no-cache"
+
+    if storage_utils.is_object_storage():
+        url = storage_utils.generate_presigned_url(report.file_path, filename=filename, media_type=media_type)
+        return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT, headers={"Cache-Control": "no-store"})
+
+    return file_response(request, report.file_path, filename, media_type, cache_control)
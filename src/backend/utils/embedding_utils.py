@@ -0,0 +1,45 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+from core import config
+
+# 模型在进程内首次使用时加载，之后复用
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """
+    获取句向量模型，只在CPU上运行
+    
+    sentence_transformers会导入torch，启动慢且占用内存较多，只在首次生成向量时导入。
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(config.EMBEDDING_MODEL, device="cpu")
+    return _model
+
+def paper_text(title: Optional[str], authors: Optional[List[str]], metadata: Optional[Dict[str, Any]]) -> str:
+    """
+    拼接用于生成论文向量的文本
+    
+    使用标题、作者和摘要，不使用正文：模型只读取开头几百个词，正文开头多为版权和排版信息。
+    """
+    parts = [title or ""]
+    if authors:
+        parts.append(", ".join(authors))
+    if metadata and metadata.get("abstract"):
+        parts.append(metadata["abstract"])
+    return "\n".join(part for part in parts if part)
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """批量生成归一化的句向量"""
+    vectors = get_model().encode(
+        texts,
+        batch_size=config.EMBEDDING_BATCH_SIZE,
+        normalize_embeddings=True,
+        show_progress_bar=False
+    )
+    return [vector.tolist() for vector in vectors]
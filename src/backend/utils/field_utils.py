@@ -0,0 +1,85 @@
+from typing import Any, Callable, Dict, Optional, Type
+
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_DICT, SHAPE_MAPPING
+
+FIELDS_DESCRIPTION = (
+    "只返回指定字段（逗号分隔，如 id,title,status）；字典类型的字段可用点号选择其中的键，"
+    "如 result_data.technical_feasibility（只支持一级）。id总是返回"
+)
+
+# 传给pydantic的include，叶子为...表示整个字段
+FieldSet = Dict[str, Any]
+
+def _is_dict_field(schema: Type[BaseModel], name: str) -> bool:
+    field = schema.__fields__[name]
+    return field.shape in (SHAPE_DICT, SHAPE_MAPPING)
+
+def _add_path(node: FieldSet, name: str, key: Optional[str] = None) -> None:
+    """加入字段name，或字典字段name中的键key"""
+    if key is None:
+        node[name] = ...
+        return
+    child = node.setdefault(name, {})
+    if child is not ...:
+        # 未选择整个字段时才按键选择
+        child[key] = ...
+
+def parse_fields(fields: str, schema: Type[BaseModel]) -> FieldSet:
+    """解析fields参数为pydantic的include，字段不存在时抛出ValueError"""
+    include: FieldSet = {}
+    for path in fields.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        keys = path.split(".")
+        name = keys[0]
+        if name not in schema.__fields__:
+            raise ValueError(f"不支持的字段: {name}")
+        if len(keys) > 1 and not _is_dict_field(schema, name):
+            raise ValueError(f"字段{name}不支持选择子字段")
+        if not all(keys) or len(keys) > 2:
+            raise ValueError(f"字段格式不正确: {path}")
+        _add_path(include, *keys)
+    
+    if "id" in schema.__fields__:
+        include["id"] = ...
+    return include
+
+def includes(fields: Optional[FieldSet], *keys: str) -> bool:
+    """判断是否需要返回某个字段（或字典字段中的键），用于跳过不需要的加载"""
+    node = fields
+    for key in keys:
+        if node is None or node is ...:
+            return True
+        if key not in node:
+            return False
+        node = node[key]
+    return True
+
+def fields_param(schema: Type[BaseModel]) -> Callable[..., Optional[FieldSet]]:
+    """构建fields查询参数的依赖，按响应数据的模型校验字段名，无效时返回400"""
+    def dependency(fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)) -> Optional[FieldSet]:
+        if not fields:
+            return None
+        try:
+            return parse_fields(fields, schema)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    
+    return dependency
+
+def select_fields(response: BaseModel, fields: Optional[FieldSet]):
+    """
+    只保留响应data中的指定字段，data为列表时作用于每一项
+    
+    未指定fields时原样返回响应模型，由ORJSONResponse直接序列化。
+    """
+    if fields is None:
+        return response
+    data_include = {"__all__": fields} if isinstance(response.data, list) else fields
+    return response.dict(include={"success": ..., "data": data_include, "meta": ...})
@@ -0,0 +1,211 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import Select, func, inspect, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.interfaces import LoaderOption
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from starlette.datastructures import URL
+
+def encode_cursor(*values: Any) -> str:
+    """将排序键编码为不透明游标"""
+    serialized = []
+    for value in values:
+        if isinstance(value, datetime):
+            serialized.append({"t": value.isoformat()})
+        elif isinstance(value, uuid.UUID):
+            serialized.append({"u": str(value)})
+        else:
+            serialized.append(value)
+    raw = json.dumps(serialized, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def _matches(value: Any, expected: type) -> bool:
+    """游标中的值是否为排序列的类型（bool不视为int，时间须为不带时区的UTC时间，与数据库列一致）"""
+    if isinstance(value, bool) and expected is not bool:
+        return False
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return False
+    return isinstance(value, expected)
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """
+    解码游标，types为各值应有的类型（调用方按排序列给出）
+    
+    格式不正确或与排序列的类型不符时抛出ValueError（接口返回400），不会带着错误类型的参数执行查询。
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        serialized = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(serialized, list):
+            raise ValueError()
+        values = []
+        for value in serialized:
+            if isinstance(value, dict) and "t" in value:
+                values.append(datetime.fromisoformat(value["t"]))
+            elif isinstance(value, dict) and "u" in value:
+                values.append(uuid.UUID(value["u"]))
+            else:
+                values.append(value)
+    except (ValueError, TypeError, KeyError, UnicodeError, json.JSONDecodeError):
+        raise ValueError("无效的分页游标")
+    
+    if len(values) != len(types) or not all(_matches(value, expected) for value, expected in zip(values, types)):
+        raise ValueError("无效的分页游标")
+    return values
+
+def cursor_link(url: URL, cursor: Optional[str]) -> Optional[str]:
+    """构建指向指定游标页的链接"""
+    if not cursor:
+        return None
+    return str(url.remove_query_params("page").include_query_params(cursor=cursor))
+
+def count_statement(stmt: Select) -> Select:
+    """构建统计查询结果总数的语句，直接替换查询列，不经子查询读取整行"""
+    return stmt.with_only_columns(func.count(), maintain_column_froms=True).order_by(None)
+
+def schema_columns(model, schema) -> LoaderOption:
+    """列表查询只加载列表模型中用到的列，其余列（正文、分析结果等大字段）不从数据库读取"""
+    column_attrs = inspect(model).column_attrs
+    return load_only(*[
+        getattr(model, name) for name in schema.__fields__ if name in column_attrs
+    ])
+
+def page_statement(stmt: Select, page: int, limit: int) -> Select:
+    """按页码截取查询结果，多取一条用于判断是否有下一页"""
+    return stmt.offset((page - 1) * limit).limit(limit + 1)
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) 查询，参数按原查询正常绑定"""
+    inherit_cache = False
+    
+    def __init__(self, stmt: Select):
+        self.statement = stmt
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+def plan_root(plan: Any) -> Dict[str, Any]:
+    """取执行计划的根节点（asyncpg返回JSON字符串，psycopg2返回已解析的列表）"""
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+class OffsetPage(NamedTuple):
+    """页码分页结果"""
+    items: List[Any]
+    has_more: bool
+    total: Optional[int] = None
+    total_estimated: bool = False
+
+# 游标方向：向后翻页（更旧的记录）/向前翻页（更新的记录）
+NEXT = "n"
+PREV = "p"
+
+class KeysetPage(NamedTuple):
+    """游标分页结果"""
+    items: List[Any]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+    total: Optional[int] = None
+    total_estimated: bool = False
+
+def keyset_cursor(item: Any, sort_attr: str, direction: str = NEXT) -> str:
+    """以记录的(排序键, id)生成游标"""
+    return encode_cursor(direction, getattr(item, sort_attr), item.id)
+
+def _decode_keyset_cursor(cursor: str, sort_type: type) -> List[Any]:
+    """解码游标，返回[方向, 排序键, id]，排序键须为sort_type类型"""
+    values = decode_cursor(cursor, (str, sort_type, uuid.UUID))
+    if values[0] not in (NEXT, PREV):
+        raise ValueError("无效的分页游标")
+    return values
+
+def keyset_statement(stmt: Select, sort_column, id_column, limit: int, cursor: Optional[str] = None) -> Select:
+    """
+    构建按(排序键, id)倒序的游标分页查询
+    
+    通过行值比较从游标位置继续读取，代价与翻页深度无关。多取一条用于判断是否还有更多。
+    向前翻页时按正序读取，由keyset_page翻转回倒序。
+    """
+    direction = NEXT
+    if cursor:
+        direction, sort_value, id_value = _decode_keyset_cursor(cursor, sort_column.type.python_type)
+        key = tuple_(sort_column, id_column)
+        if direction == NEXT:
+            stmt = stmt.where(key < tuple_(sort_value, id_value))
+        else:
+            stmt = stmt.where(key > tuple_(sort_value, id_value))
+    
+    if direction == NEXT:
+        order_by = (sort_column.desc(), id_column.desc())
+    else:
+        order_by = (sort_column.asc(), id_column.asc())
+    
+    return stmt.order_by(None).order_by(*order_by).limit(limit + 1)
+
+def keyset_page(
+    rows: List[Any], 
+    limit: int, 
+    cursor: Optional[str], 
+    sort_attr: str, 
+    total: Optional[int] = None, 
+    total_estimated: bool = False
+) -> KeysetPage:
+    """截取keyset_statement的查询结果并生成前后页游标"""
+    # 游标已由keyset_statement按排序列的类型校验，这里只取方向
+    direction = _decode_keyset_cursor(cursor, object)[0] if cursor else NEXT
+    has_more = len(rows) > limit
+    items = list(rows[:limit])
+    
+    if direction == PREV:
+        items.reverse()
+    
+    if not items:
+        return KeysetPage(items, None, None, total, total_estimated)
+    
+    # 向后翻页：还有更多时才有下一页，带游标时才有上一页；向前翻页反之
+    has_next = has_more if direction == NEXT else True
+    has_prev = bool(cursor) if direction == NEXT else has_more
+    
+    return KeysetPage(
+        items,
+        keyset_cursor(items[-1], sort_attr, NEXT) if has_next else None,
+        keyset_cursor(items[0], sort_attr, PREV) if has_prev else None,
+        total,
+        total_estimated
+    )
+
+def offset_page(rows: List[Any], limit: int, total: Optional[int] = None, total_estimated: bool = False) -> OffsetPage:
+    """截取page_statement的查询结果"""
+    return OffsetPage(list(rows[:limit]), len(rows) > limit, total, total_estimated)
+
+def offset_page_cursors(result: OffsetPage, page: int, sort_attr: str) -> KeysetPage:
+    """为页码分页的结果生成前后页游标，便于客户端切换到游标分页"""
+    if not result.items:
+        return KeysetPage(result.items, None, None)
+    
+    return KeysetPage(
+        result.items,
+        keyset_cursor(result.items[-1], sort_attr, NEXT) if result.has_more else None,
+        keyset_cursor(result.items[0], sort_attr, PREV) if page > 1 else None
+    )
+
+def page_number_links(url: URL, result: OffsetPage, page: int) -> Dict[str, Optional[str]]:
+    """构建只支持页码分页的列表（如按相关度排序的检索结果）的前后页链接"""
+    return {
+        "next": str(url.include_query_params(page=page + 1)) if result.has_more else None,
+        "prev": str(url.include_query_params(page=page - 1)) if page > 1 else None
+    }
+
+def pagination_links(url: URL, page: KeysetPage) -> Dict[str, Optional[str]]:
+    """构建分页元数据中的前后页链接"""
+    return {
+        "next": cursor_link(url, page.next_cursor),
+        "prev": cursor_link(url, page.prev_cursor)
+    }
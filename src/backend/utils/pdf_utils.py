@@ -30,13 +30,19 @@ def extract_pdf_info(file_path: str) -> Dict[str, Any]:
             # 尝试提取出版信息
             publication_info = extract_publication_info(text)
             
+            # 尝试提取摘要
+            abstract = extract_abstract(text)
+            
             return {
                 "title": title,
                 "authors": authors,
                 "doi": doi,
                 "publication_info": publication_info,
+                "abstract": abstract,
                 "page_count": len(reader.pages),
-                "metadata": {k: str(v) for k, v in metadata.items()} if metadata else {}
+                "metadata": {k: str(v) for k, v in metadata.items()} if metadata else {},
+                # PostgreSQL文本不允许NUL字符
+                "text": text.replace("\x00", "")
             }
     except Exception as e:
         print(f"PDF信息提取失败: {e}")
@@ -106,6 +112,19 @@ def extract_doi(text: str) -> Optional[str]:
     
     return None
 
+def extract_abstract(text: str) -> Optional[str]:
+    """
+    从文本中提取摘要
+    """
+    # 摘要通常位于Abstract/摘要标题之后、引言或关键词之前
+    abstract_pattern = r'(?is)(?:abstract|摘\s*要)[:：.]?\s*(.+?)(?:\n\s*(?:keywords|index terms|关键词|1\.?\s*introduction|i\.\s*introduction|引\s*言)|$)'
+    match = re.search(abstract_pattern, text[:10000])  # 只在前10000个字符中搜索
+    if match:
+        abstract = " ".join(match.group(1).split())
+        return abstract[:5000] or None
+    
+    return None
+
 def extract_publication_info(text: str) -> Dict[str, Any]:
     """
     从文本中提取出版信息
@@ -0,0 +1,127 @@
+import os
+import re
+from typing import Iterator, Optional
+from urllib.parse import quote
+
+import boto3
+from botocore.exceptions import ClientError
+
+from core import config
+
+_s3_client = None
+
+def is_object_storage() -> bool:
+    """是否使用对象存储（S3）"""
+    return config.STORAGE_TYPE == "s3"
+
+def get_s3_client():
+    """获取S3客户端（进程内复用）"""
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client(
+            "s3",
+            region_name=config.AWS_REGION,
+            aws_access_key_id=config.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=config.AWS_SECRET_ACCESS_KEY
+        )
+    return _s3_client
+
+def local_storage_key(file_path: str) -> Optional[str]:
+    """本地文件相对STORAGE_PATH的路径（/分隔），文件不在STORAGE_PATH下时返回None"""
+    storage_root = os.path.realpath(config.STORAGE_PATH)
+    real_path = os.path.realpath(file_path)
+    if not real_path.startswith(storage_root + os.sep):
+        return None
+    return os.path.relpath(real_path, storage_root).replace(os.sep, "/")
+
+def get_object_key(file_path: str) -> str:
+    """将存储路径转换为对象存储键"""
+    storage_root = os.path.abspath(config.STORAGE_PATH)
+    abs_path = os.path.abspath(file_path)
+    if abs_path.startswith(storage_root + os.sep):
+        return os.path.relpath(abs_path, storage_root).replace(os.sep, "/")
+    # 已经是对象键
+    return file_path.lstrip("/")
+
+def generate_presigned_url(
+    file_path: str,
+    filename: Optional[str] = None,
+    media_type: Optional[str] = None,
+    expires_in: Optional[int] = None
+) -> str:
+    """生成对象存储的预签名下载URL"""
+    params = {"Bucket": config.S3_BUCKET, "Key": get_object_key(file_path)}
+    if filename:
+        params["ResponseContentDisposition"] = content_disposition(filename)
+    if media_type:
+        params["ResponseContentType"] = media_type
+
+    return get_s3_client().generate_presigned_url(
+        "get_object",
+        Params=params,
+        ExpiresIn=expires_in or config.PRESIGNED_URL_EXPIRE_SECONDS
+    )
+
+# 引号内文件名不能出现的字符：非ASCII、控制字符、引号和反斜杠
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^\x20-\x7e]|["\\]')
+
+def content_disposition(filename: str, disposition: str = "attachment") -> str:
+    """
+    构建Content-Disposition头
+
+    filename为替换掉引号、反斜杠和非ASCII字符后的ASCII文件名，供不支持RFC 6266的客户端使用；
+    filename*为RFC 5987编码的完整文件名，客户端优先使用。
+    """
+    fallback = _UNSAFE_FILENAME_CHARS.sub("_", filename)
+    return f"{disposition}; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+def file_exists(file_path: str) -> bool:
+    """检查存储中的文件是否存在"""
+    if is_object_storage():
+        try:
+            get_s3_client().head_object(Bucket=config.S3_BUCKET, Key=get_object_key(file_path))
+            return True
+        except ClientError:
+            return False
+    return os.path.isfile(file_path)
+
+def iter_file_chunks(file_path: str, chunk_size: Optional[int] = None) -> Iterator[bytes]:
+    """按块读取存储中的文件"""
+    chunk_size = chunk_size or config.DOWNLOAD_CHUNK_SIZE
+
+    if is_object_storage():
+        response = get_s3_client().get_object(Bucket=config.S3_BUCKET, Key=get_object_key(file_path))
+        body = response["Body"]
+        try:
+            for chunk in body.iter_chunks(chunk_size):
+                yield chunk
+        finally:
+            body.close()
+        return
+
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            yield chunk
+
+def write_bytes(file_path: str, data: bytes):
+    """写入整个文件（覆盖已有文件）"""
+    if is_object_storage():
+        get_s3_client().put_object(Bucket=config.S3_BUCKET, Key=get_object_key(file_path), Body=data)
+        return
+
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as f:
+        f.write(data)
+
+def read_bytes(file_path: str) -> bytes:
+    """读取整个文件"""
+    if is_object_storage():
+        response = get_s3_client().get_object(Bucket=config.S3_BUCKET, Key=get_object_key(file_path))
+        body = response["Body"]
+        try:
+            return body.read()
+        finally:
+            body.close()
+
+    with open(file_path, "rb") as f:
+        return f.read()
@@ -0,0 +1,62 @@
+import zipfile
+from datetime import datetime
+from typing import Iterable, Iterator, NamedTuple
+
+class ZipEntry(NamedTuple):
+    """待写入压缩包的条目"""
+    name: str
+    modified: datetime
+    chunks: Iterable[bytes]
+    compress_type: int = zipfile.ZIP_DEFLATED
+
+class _StreamBuffer:
+    """
+    只写、不可定位的输出缓冲区
+
+    zipfile检测到输出不可定位时会改用数据描述符记录大小和CRC，
+    因此压缩包可以边生成边发送，无需写入磁盘。
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def stream_zip(entries: Iterable[ZipEntry]) -> Iterator[bytes]:
+    """
+    流式生成ZIP压缩包
+
+    逐条目、逐块写入，每写入一块就输出已生成的字节，内存占用与条目大小无关。
+    """
+    buffer = _StreamBuffer()
+
+    with zipfile.ZipFile(buffer, mode="w") as zf:
+        for entry in entries:
+            info = zipfile.ZipInfo(entry.name, date_time=entry.modified.timetuple()[:6])
+            info.compress_type = entry.compress_type
+
+            with zf.open(info, mode="w", force_zip64=True) as f:
+                for chunk in entry.chunks:
+                    f.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+
+            data = buffer.drain()
+            if data:
+                yield data
+
+    # 中央目录
+    data = buffer.drain()
+    if data:
+        yield data